@@ -0,0 +1,264 @@
+"""Alertas de prazos de todos os processos abertos (fila de prioridade).
+
+Cada marco vigiado (limite da conformidade, fim da consulta pública, DIA) de
+cada processo fica num min-heap ordenado pela data em que o alerta deve
+disparar: N dias úteis antes do prazo, no calendário do processo. Verificar
+os alertas pendentes só olha para o topo do heap, sem percorrer os processos.
+
+Quando as suspensões (ou outras entradas) de um processo mudam, o recálculo
+é incremental (IncrementalWorkflow) e só os marcos cuja data mudou ganham uma
+nova entrada; as entradas antigas ficam invalidadas por versão e são
+descartadas quando chegam ao topo (o heap é compactado se acumular lixo).
+
+Os alertas seguem para um destino ("sink") com um método emit(alert):
+LogSink (logger "aia.alerts") e FileSink (JSON Lines) servem para testes e
+uso local.
+
+Uso: python alerts.py [--db registo_aia.sqlite3] [--lead 5] [--output alertas.jsonl] [--once]
+"""
+import argparse
+from datetime import date
+import heapq
+import itertools
+import json
+import logging
+import sys
+import threading
+import time
+
+from engine import IncrementalWorkflow, as_business_calendar, get_business_calendar, milestones_for
+
+logger = logging.getLogger("aia.alerts")
+
+# Marcos vigiados: nó do workflow -> designação no alerta
+ALERT_MILESTONES = {
+    "conformidade": "Limite Conformidade",
+    "cp_end": "Fim Consulta Pública",
+    "dia": "Emissão da DIA",
+}
+
+DEFAULT_LEAD_DAYS = 5  # dias úteis de antecedência
+
+
+def alert_date(due_date, lead_days, calendar):
+    """Dia útil que fica ``lead_days`` dias úteis antes de due_date (due_date se lead_days <= 0)."""
+    return as_business_calendar(calendar).subtract_business_days(due_date, lead_days)
+
+
+class LogSink:
+    """Escreve cada alerta como uma linha JSON no logger "aia.alerts" (nível WARNING)."""
+
+    def __init__(self, log=logger):
+        self.log = log
+
+    def emit(self, alert):
+        self.log.warning(json.dumps(alert, default=str, ensure_ascii=False))
+
+
+class FileSink:
+    """Acrescenta cada alerta a um ficheiro JSON Lines."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def emit(self, alert):
+        line = json.dumps(alert, default=str, ensure_ascii=False)
+        with self._lock, open(self.path, "a", encoding="utf-8") as fh:
+            fh.write(line + "\n")
+
+
+class _Tracked:
+    """Estado de um processo no agendador: workflow incremental, calendário e datas vigiadas."""
+
+    __slots__ = ("workflow", "calendar", "dates")
+
+    def __init__(self, calendar):
+        self.workflow = IncrementalWorkflow()
+        self.calendar = calendar
+        self.dates = {}
+
+
+class AlertScheduler:
+    """Agenda alertas para os marcos de todos os processos.
+
+    ``sink`` recebe cada alerta (dicionário com process, milestone, label,
+    due_date, alert_date e business_days_left). ``today`` é a função que dá
+    a data corrente (substituível nos testes). run_pending() dispara os
+    alertas vencidos; start() faz o mesmo numa thread em segundo plano.
+    Um prazo já ultrapassado quando chega a sua vez não gera alerta.
+    """
+
+    def __init__(self, sink=None, lead_days=DEFAULT_LEAD_DAYS, milestones=ALERT_MILESTONES, today=date.today):
+        self.sink = sink or LogSink()
+        self.lead_days = lead_days
+        self.milestones = dict(milestones)
+        self.today = today
+        self._heap = []          # (data do alerta, prazo, processo, nó, versão)
+        self._versions = {}      # (processo, nó) -> versão em vigor
+        self._counter = itertools.count(1)  # versões nunca se repetem (nem após disparo ou remoção)
+        self._processes = {}     # processo -> _Tracked
+        self._registry_version = None  # versão do registo na última sincronização
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __len__(self):
+        """Nº de alertas agendados (entradas válidas)."""
+        return len(self._versions)
+
+    # --- processos ---
+
+    def set_process(self, name, start_date, suspensions=(), milestones_config=None, pea_date=None,
+                    regime=150, holidays_set=None):
+        """Acrescenta ou atualiza um processo; devolve os marcos cujo alerta foi reagendado."""
+        milestones_config = milestones_for(regime, milestones_config)
+        calendar = as_business_calendar(holidays_set)
+        with self._lock:
+            tracked = self._processes.get(name)
+            if tracked is None or tracked.calendar is not calendar:
+                tracked = self._processes[name] = _Tracked(calendar)
+            tracked.workflow.compute(start_date, suspensions, milestones_config, pea_date, calendar)
+            dates = tracked.workflow.dates
+            changed = []
+            for node in self.milestones:
+                if node in tracked.workflow.recomputed and tracked.dates.get(node) != dates[node]:
+                    tracked.dates[node] = dates[node]
+                    self._schedule(name, node, dates[node], calendar)
+                    changed.append(node)
+            return changed
+
+    def sync_registry(self, registry):
+        """Agenda os processos de um ProcessRegistry e larga os que lá já não estão; devolve quantos há."""
+        # Versão lida antes dos processos: uma escrita a meio volta a ser vista na próxima verificação
+        self._registry_version = registry.version()
+        processes = registry.processes()
+        for p in processes:
+            self.set_process(p["name"], p["start_date"], p["suspensions"], p["milestones_config"], p["pea_date"],
+                             p["regime"], get_business_calendar(p.get("municipality"), p.get("tolerance") or ()))
+        names = {p["name"] for p in processes}
+        for name in [name for name in self._processes if name not in names]:
+            self.remove_process(name)
+        return len(processes)
+
+    def sync_if_changed(self, registry):
+        """sync_registry só se o registo mudou desde a última sincronização (por esta ou
+        outra ligação, ex.: a app ou a CLI); devolve se sincronizou."""
+        if registry.version() == self._registry_version:
+            return False
+        self.sync_registry(registry)
+        return True
+
+    def remove_process(self, name):
+        with self._lock:
+            tracked = self._processes.pop(name, None)
+            if tracked is None:
+                return False
+            for node in tracked.dates:
+                self._versions.pop((name, node), None)
+            self._compact_if_needed()
+            return True
+
+    def _schedule(self, name, node, due_date, calendar):
+        version = next(self._counter)
+        self._versions[(name, node)] = version
+        fire = alert_date(due_date, self.lead_days, calendar)
+        heapq.heappush(self._heap, (fire, due_date, name, node, version))
+        self._compact_if_needed()
+
+    def _compact_if_needed(self):
+        # Entradas invalidadas ficam no heap até ao topo; reconstrói se forem a maioria
+        if len(self._heap) > 64 and len(self._heap) > 2 * len(self._versions):
+            self._heap = [entry for entry in self._heap if self._versions.get((entry[2], entry[3])) == entry[4]]
+            heapq.heapify(self._heap)
+
+    # --- disparo ---
+
+    def next_alert_date(self):
+        """Data do próximo alerta agendado (ou None)."""
+        with self._lock:
+            while self._heap and self._versions.get((self._heap[0][2], self._heap[0][3])) != self._heap[0][4]:
+                heapq.heappop(self._heap)
+            return self._heap[0][0] if self._heap else None
+
+    def run_pending(self, today=None):
+        """Dispara (e devolve) os alertas com data até hoje, por ordem de data."""
+        today = today or self.today()
+        fired = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= today:
+                fire, due_date, name, node, version = heapq.heappop(self._heap)
+                if self._versions.get((name, node)) != version:
+                    continue
+                del self._versions[(name, node)]
+                if due_date < today:
+                    continue
+                calendar = self._processes[name].calendar
+                fired.append({
+                    "process": name, "milestone": node, "label": self.milestones[node],
+                    "due_date": due_date, "alert_date": fire,
+                    "business_days_left": calendar.business_days_between(today, due_date),
+                })
+        for alert in fired:
+            self.sink.emit(alert)
+        return fired
+
+    # --- execução em segundo plano ---
+
+    def start(self, interval=3600):
+        """Verifica os alertas de ``interval`` em ``interval`` segundos numa thread daemon."""
+        if self._thread is not None and self._thread.is_alive():
+            return self._thread
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, args=(interval,), name="aia-alerts", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def _loop(self, interval):
+        while not self._stop.is_set():
+            try:
+                self.run_pending()
+            except Exception:
+                logger.exception("Falha ao disparar alertas")
+            self._stop.wait(interval)
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Alertas dos prazos dos processos do registo.")
+    parser.add_argument("--db", default=None, help="Base de dados do registo (por defeito, AIA_REGISTRY_DB)")
+    parser.add_argument("--lead", type=int, default=DEFAULT_LEAD_DAYS, help="Dias úteis de antecedência")
+    parser.add_argument("--output", default=None, help="Ficheiro JSON Lines dos alertas (por defeito, o log)")
+    parser.add_argument("--interval", type=int, default=3600, help="Segundos entre verificações")
+    parser.add_argument("--once", action="store_true", help="Verifica uma só vez e termina")
+    args = parser.parse_args(argv)
+
+    from registry import DEFAULT_DB_PATH, ProcessRegistry
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    registry = ProcessRegistry(args.db or DEFAULT_DB_PATH)
+    scheduler = AlertScheduler(FileSink(args.output) if args.output else LogSink(), args.lead)
+    count = scheduler.sync_registry(registry)
+    print(f"{count} processos, {len(scheduler)} alertas agendados; próximo: {scheduler.next_alert_date()}",
+          file=sys.stderr)
+    if args.once:
+        fired = scheduler.run_pending()
+        print(f"{len(fired)} alertas disparados", file=sys.stderr)
+        return 0
+    # Volta a ler o registo só quando muda (e aí só os marcos alterados são reagendados)
+    try:
+        while True:
+            scheduler.run_pending()
+            time.sleep(args.interval)
+            scheduler.sync_if_changed(registry)
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
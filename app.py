@@ -1,11 +1,20 @@
+import io
+import os
+
 import streamlit as st
 import pandas as pd
 from datetime import date, timedelta
-import plotly.express as px
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-import tempfile
-import os
+
+import timing
+from cache import TTLCache, workflow_cache_key
+from engine import (
+    MILESTONES_DEFAULTS, MUNICIPAL_HOLIDAYS, TOLERANCE_DAYS, IncrementalWorkflow, SuspensionSet,
+    calendar_key, get_business_calendar, latest_start_date, max_suspension_days,
+)
+from ics import workflow_ics
+from registry import COMPLEMENTARY, MAIN, ProcessRegistry
+from report import create_pdf, fpdf_available
+from timing import stage
 
 # --- 1. CONFIGURAÇÃO DA PÁGINA ---
 st.set_page_config(
@@ -15,76 +24,8 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Tenta importar FPDF (para gerar PDF)
-try:
-    from fpdf import FPDF
-except ImportError:
-    FPDF = None
-
-# ==========================================
-# 2. MOTOR DE FERIADOS (DINÂMICO & ETERNO)
-# ==========================================
-
-def get_easter_date(year):
-    """Calcula o Domingo de Páscoa para qualquer ano (Algoritmo de Butcher)."""
-    a = year % 19
-    b = year // 100
-    c = year % 100
-    d = b // 4
-    e = b % 4
-    f = (b + 8) // 25
-    g = (b - f + 1) // 3
-    h = (19 * a + b - d - g + 15) % 30
-    i = c // 4
-    k = c % 4
-    l = (32 + 2 * e + 2 * i - h - k) % 7
-    m = (a + 11 * h + 22 * l) // 451
-    month = (h + l - 7 * m + 114) // 31
-    day = ((h + l - 7 * m + 114) % 31) + 1
-    return date(year, month, day)
-
-def get_holidays_for_year(year):
-    """Gera a lista de Feriados Nacionais para um ano (Sem Carnaval)."""
-    holidays = set()
-    
-    # Feriados Fixos (Portugal)
-    fixed_dates = [
-        (1, 1),   # Ano Novo
-        (4, 25),  # Dia da Liberdade
-        (5, 1),   # Dia do Trabalhador
-        (6, 10),  # Dia de Portugal
-        (8, 15),  # Assunção de Nossa Senhora
-        (10, 5),  # Implantação da República
-        (11, 1),  # Dia de Todos os Santos
-        (12, 1),  # Restauração da Independência
-        (12, 8),  # Imaculada Conceição
-        (12, 25)  # Natal
-    ]
-    for m, d in fixed_dates:
-        holidays.add(date(year, m, d))
-        
-    # Feriados Móveis
-    easter = get_easter_date(year)
-    good_friday = easter - timedelta(days=2)     # Sexta-Feira Santa
-    corpus_christi = easter + timedelta(days=60) # Corpo de Deus
-    
-    holidays.add(good_friday)
-    holidays.add(corpus_christi)
-    
-    # NOTA: O Carnaval NÃO é feriado nacional obrigatório e foi removido 
-    # para bater certo com a contagem do Excel da CCDR.
-    
-    return holidays
-
-def get_holidays_range(start_year, end_year):
-    """Gera feriados para um intervalo de anos."""
-    all_holidays = set()
-    for y in range(start_year, end_year + 1):
-        all_holidays.update(get_holidays_for_year(y))
-    return all_holidays
-
 # ==========================================
-# 3. DADOS LEGAIS E REFERÊNCIAS
+# 2. DADOS LEGAIS E REFERÊNCIAS
 # ==========================================
 
 COMMON_LAWS = {
@@ -108,411 +49,192 @@ SPECIFIC_LAWS = {
     "Infraestruturas": {"Lei 34/2015 (Estatuto Estradas)": "https://diariodarepublica.pt/dr/legislacao-consolidada/lei/2015-34585678"},
     "Outros": {}
 }
-
-# ==========================================
-# 4. MOTOR DE CÁLCULO
-# ==========================================
-
-def is_business_day(check_date, holidays_set):
-    if check_date.weekday() >= 5: return False # Sábado=5, Domingo=6
-    if check_date in holidays_set: return False
-    return True
-
-def add_business_days(start_date, num_days, holidays_set):
-    current_date = start_date
-    added_days = 0
-    while added_days < num_days:
-        current_date += timedelta(days=1)
-        if is_business_day(current_date, holidays_set):
-            added_days += 1
-    return current_date
-
-def is_suspended(current_date, suspensions):
-    for s in suspensions:
-        if s['start'] <= current_date <= s['end']:
-            return True
-    return False
-
-def calculate_deadline_rigorous(start_date, target_business_days, suspensions, holidays_set, return_log=False):
-    current_date = start_date
-    days_counted = 0
-    log = []
-    
-    if return_log:
-        log.append({"Data": current_date, "Dia Contado": 0, "Status": "Início"})
-
-    while days_counted < target_business_days:
-        current_date += timedelta(days=1)
-        
-        status = "Util"
-        # 1. Prioridade: Suspensão
-        if is_suspended(current_date, suspensions):
-            status = "Suspenso"
-        # 2. Fim de Semana
-        elif current_date.weekday() >= 5:
-            status = "Fim de Semana"
-        # 3. Feriado
-        elif current_date in holidays_set:
-            status = "Feriado"
-            
-        if status == "Util":
-            days_counted += 1
-            
-        if return_log:
-            log.append({"Data": current_date, "Dia Contado": days_counted if status == "Util" else "-", "Status": status})
-            
-    final_date = current_date
-    
-    # Ajuste CPA: Se terminar em Sábado/Domingo/Feriado, salta para o próximo útil
-    while final_date.weekday() >= 5 or final_date in holidays_set:
-         final_date += timedelta(days=1)
-    
-    if return_log:
-        return final_date, log
-    return final_date
-
-def calculate_workflow(start_date, suspensions, milestones_config, pea_date=None):
-    # Gera feriados para o ano atual e seguintes (margem de segurança)
-    holidays_set = get_holidays_range(start_date.year, start_date.year + 2)
-    
-    results = []
-    log_final = []
-    
-    # Lista de Etapas
-    steps = [
-        ("Data Reunião", milestones_config["reuniao"]),
-        ("Limite Conformidade", milestones_config["conformidade"]),
-        ("Envio PTF à AAIA", milestones_config["ptf"]),
-        ("Audiência de Interessados", milestones_config["audiencia"]),
-        ("Emissão da DIA (Decisão Final)", milestones_config["dia"])
-    ]
-    
-    conf_date_real = None 
-    
-    for nome, dias in steps:
-        final_date = None
-        
-        # --- LÓGICA ESPECIAL: CONFORMIDADE COM PEA ---
-        # Resolve o problema de ter de alterar manualmente "20" para "28".
-        if nome == "Limite Conformidade" and pea_date and suspensions:
-            # 1. Contar dias gastos até ao PEA
-            days_spent = 0
-            # Começa a contar do dia seguinte à instrução
-            temp_date = start_date
-            # Avança até ao dia ANTES do PEA
-            check_date = start_date + timedelta(days=1)
-            while check_date < pea_date:
-                if is_business_day(check_date, holidays_set):
-                    days_spent += 1
-                check_date += timedelta(days=1)
-            
-            # 2. Dias que sobraram dos 20 (ou do valor configurado)
-            remaining_days = dias - days_spent
-            if remaining_days < 0: remaining_days = 0
-            
-            # 3. Aplicar os dias restantes APÓS o fim da suspensão
-            last_susp_end = max([s['end'] for s in suspensions])
-            final_date = calculate_deadline_rigorous(last_susp_end, remaining_days, [], holidays_set)
-            
-            conf_date_real = final_date
-            
-        else:
-            # Cálculo Normal (Matemática Pura)
-            if dias == milestones_config["dia"]: 
-                final_date, log_data = calculate_deadline_rigorous(start_date, dias, suspensions, holidays_set, return_log=True)
-                log_final = log_data
-            else:
-                final_date = calculate_deadline_rigorous(start_date, dias, suspensions, holidays_set)
-            
-            if nome == "Limite Conformidade":
-                conf_date_real = final_date
-            
-        results.append({
-            "Etapa": nome, 
-            "Prazo Legal": f"{dias} dias úteis", 
-            "Data Prevista": final_date
-        })
-
-    # Marcos Complementares
-    complementary = []
-    gantt_data = {}
-    
-    if conf_date_real:
-        cp_duration = milestones_config.get("cp_duration", 30)
-        visit_days = milestones_config.get("visita", 15)
-        sectoral_days = milestones_config.get("setoriais", 75)
-
-        # Cálculos de datas derivadas
-        conf_date_theo = calculate_deadline_rigorous(start_date, milestones_config["conformidade"], [], holidays_set)
-        
-        # Início CP: 5 dias úteis APÓS Conformidade Real
-        cp_start = add_business_days(conf_date_real, 5, holidays_set)
-        
-        # Fim CP
-        cp_end = add_business_days(cp_start, cp_duration, holidays_set)
-        
-        # Pareceres Externos
-        external_ops = add_business_days(cp_start, 23, holidays_set)
-        
-        # Relatório CP
-        cp_report = add_business_days(cp_end, 7, holidays_set)
-        
-        # Visita
-        visit_date = add_business_days(cp_start, visit_days, holidays_set)
-        
-        # Pareceres Setoriais (Conta desde o início, com suspensões)
-        sectoral_date = calculate_deadline_rigorous(start_date, sectoral_days, suspensions, holidays_set)
-        
-        gantt_data = {
-            "cp_start": cp_start,
-            "cp_end": cp_end,
-            "visit": visit_date,
-            "sectoral": sectoral_date
-        }
-        
-        complementary = [
-            {"Etapa": "1. Limite Conformidade (Ref. Teórica)", "Ref": "Sem suspensões", "Data": conf_date_theo},
-            {"Etapa": "1. Limite Conformidade (Real)", "Ref": "Com suspensões", "Data": conf_date_real},
-            {"Etapa": "2. Início Consulta Pública", "Ref": "Conf + 5 dias", "Data": cp_start},
-            {"Etapa": "3. Fim Consulta Pública", "Ref": f"Início CP + {cp_duration} dias", "Data": cp_end},
-            {"Etapa": "4. Data para Pareceres Externos", "Ref": "Início CP + 23 dias", "Data": external_ops},
-            {"Etapa": "5. Envio do Relatório da CP", "Ref": "Fim CP + 7 dias", "Data": cp_report},
-            {"Etapa": "6. Visita Técnica", "Ref": f"Início CP + {visit_days} dias", "Data": visit_date},
-            {"Etapa": "7. Pareceres Setoriais", "Ref": f"Dia {sectoral_days} Global", "Data": sectoral_date},
-        ]
-
-    total_susp = sum([(s['end'] - s['start']).days + 1 for s in suspensions])
-    
-    return results, complementary, total_susp, log_final, gantt_data
-
 # ==========================================
-# 5. GERADOR DE PDF
+# 3. CACHE DE RESULTADOS (PARTILHADA ENTRE SESSÕES)
 # ==========================================
-def create_pdf(project_name, typology, sector, regime, start_date, milestones, complementary, suspensions, total_susp, gantt_data):
-    if FPDF is None: return None
-    class PDF(FPDF):
-        def header(self):
-            self.set_font('Arial', 'B', 10)
-            self.set_text_color(30, 58, 138)
-            self.cell(0, 10, 'CCDR CENTRO - AUTORIDADE DE AIA', 0, 1, 'C')
-            self.line(10, 20, 200, 20)
-            self.ln(10)
-        def footer(self):
-            self.set_y(-15)
-            self.set_font('Arial', 'I', 8)
-            self.set_text_color(128, 128, 128)
-            self.cell(0, 10, f'Pagina {self.page_no()}', 0, 0, 'C')
-
-    pdf = PDF()
-    pdf.add_page()
-    
-    pdf.set_font("Arial", "B", 16)
-    pdf.set_text_color(15, 23, 42)
-    safe_title = f"Relatorio de Prazos: {project_name}"
-    pdf.multi_cell(0, 10, safe_title.encode('latin-1', 'replace').decode('latin-1'), align='L')
-    pdf.ln(5)
-
-    # 1. Enquadramento
-    pdf.set_fill_color(241, 245, 249)
-    pdf.set_font("Arial", "B", 11)
-    pdf.cell(0, 8, "1. Enquadramento e Legislacao", 0, 1, 'L', 1)
-    pdf.ln(2)
-    
-    pdf.set_font("Arial", "B", 10)
-    pdf.cell(40, 6, "Tipologia:", 0, 0)
-    pdf.set_font("Arial", "", 10)
-    pdf.multi_cell(0, 6, typology.encode('latin-1','replace').decode('latin-1'))
-    pdf.set_font("Arial", "B", 10)
-    pdf.cell(40, 6, "Setor:", 0, 0)
-    pdf.set_font("Arial", "", 10)
-    pdf.cell(0, 6, sector.encode('latin-1','replace').decode('latin-1'), 0, 1)
-    pdf.ln(2)
-    
-    # 2. Resumo
-    pdf.set_font("Arial", "B", 11)
-    pdf.cell(0, 8, "2. Resumo", 0, 1, 'L', 1)
-    pdf.ln(2)
-    pdf.set_font("Arial", "", 10)
-    pdf.cell(50, 6, "Regime:", 0, 0)
-    pdf.cell(0, 6, f"{regime}", 0, 1)
-    pdf.cell(50, 6, "Data de Instrucao:", 0, 0)
-    pdf.cell(0, 6, start_date.strftime('%d/%m/%Y'), 0, 1)
-    pdf.cell(50, 6, "Total Suspensao:", 0, 0)
-    pdf.cell(0, 6, f"{total_susp} dias", 0, 1)
-    pdf.ln(5)
-
-    # 3. Cronograma Oficial
-    pdf.set_font("Arial", "B", 11)
-    pdf.cell(0, 8, "3. Cronograma Oficial (Fases Principais)", 0, 1, 'L', 1)
-    pdf.ln(2)
-    
-    pdf.set_font("Arial", "B", 9)
-    pdf.set_fill_color(226, 232, 240)
-    pdf.cell(90, 8, "Etapa", 1, 0, 'L', 1)
-    pdf.cell(40, 8, "Prazo Legal", 1, 0, 'C', 1)
-    pdf.cell(40, 8, "Data Prevista", 1, 1, 'C', 1)
-    
-    pdf.set_font("Arial", "", 9)
-    pdf.ln()
-    pdf.cell(90, 8, "Entrada / Instrucao", 1, 0, 'L')
-    pdf.cell(40, 8, "Dia 0", 1, 0, 'C')
-    pdf.cell(40, 8, start_date.strftime('%d/%m/%Y'), 1, 1, 'C')
-    pdf.ln()
-    
-    for m in milestones:
-        pdf.cell(90, 8, m["Etapa"].encode('latin-1','replace').decode('latin-1'), 1)
-        pdf.cell(40, 8, str(m["Prazo Legal"]), 1, 0, 'C')
-        pdf.cell(40, 8, m["Data Prevista"].strftime('%d/%m/%Y'), 1, 0, 'C')
-        pdf.ln()
-
-    # 4. Prazos Complementares
-    if complementary:
-        pdf.ln(5)
-        pdf.set_font("Arial", "B", 11)
-        pdf.cell(0, 8, "4. Prazos Complementares e Setoriais", 0, 1, 'L', 1)
-        pdf.set_font("Arial", "", 9)
-        
-        pdf.set_font("Arial", "B", 9)
-        pdf.cell(90, 8, "Etapa", 1, 0, 'L', 1)
-        pdf.cell(40, 8, "Referencia", 1, 0, 'C', 1)
-        pdf.cell(40, 8, "Data Prevista", 1, 1, 'C', 1)
-        pdf.ln()
-        
-        pdf.set_font("Arial", "", 9)
-        for c in complementary:
-            pdf.cell(90, 8, c["Etapa"].encode('latin-1','replace').decode('latin-1'), 1)
-            pdf.cell(40, 8, c["Ref"].encode('latin-1','replace').decode('latin-1'), 1)
-            pdf.cell(40, 8, c["Data"].strftime('%d/%m/%Y'), 1)
-            pdf.ln()
-
-    # 5. Suspensões
-    if suspensions:
-        pdf.ln(5)
-        pdf.set_font("Arial", "B", 11)
-        pdf.cell(0, 8, "Registo de Suspensoes", 0, 1, 'L', 1)
-        pdf.set_font("Arial", "", 9)
-        for s in suspensions:
-            dur = (s['end'] - s['start']).days + 1
-            pdf.cell(0, 6, f"- {s['start'].strftime('%d/%m/%Y')} a {s['end'].strftime('%d/%m/%Y')} ({dur} dias)", 0, 1)
-            pdf.ln()
-
-    # 6. Cronograma Visual
-    pdf.add_page()
-    pdf.set_font("Arial", "B", 12)
-    pdf.cell(0, 10, "5. Cronograma Visual (Gantt)", 0, 1)
-    
-    try:
-        tasks = []
-        start_dates = []
-        end_dates = []
-        colors = []
-        
-        last = start_date
-        for m in milestones:
-            end = m["Data Prevista"]
-            start = last if last < end else end
-            tasks.append(m["Etapa"])
-            start_dates.append(start)
-            end_dates.append(end)
-            colors.append('skyblue')
-            last = end
-            
-        for s in suspensions:
-            tasks.append("Suspensão")
-            start_dates.append(s['start'])
-            end_dates.append(s['end'])
-            colors.append('salmon')
-            
-        if gantt_data:
-            tasks.append("Consulta Pública")
-            start_dates.append(gantt_data['cp_start'])
-            end_dates.append(gantt_data['cp_end'])
-            colors.append('lightgreen')
-
-        fig, ax = plt.subplots(figsize=(10, 6))
-        for i, task in enumerate(tasks):
-            start_num = mdates.date2num(start_dates[i])
-            end_num = mdates.date2num(end_dates[i])
-            duration = end_num - start_num
-            if duration < 1: duration = 1
-            ax.barh(task, duration, left=start_num, color=colors[i], align='center', edgecolor='grey')
-            
-        ax.xaxis_date()
-        ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
-        plt.xticks(rotation=45)
-        plt.grid(axis='x', linestyle='--', alpha=0.5)
-        plt.tight_layout()
-        
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as tmpfile:
-            plt.savefig(tmpfile.name, dpi=100)
-            tmp_filename = tmpfile.name
-            
-        pdf.image(tmp_filename, x=10, y=30, w=190)
-        plt.close(fig)
-        os.unlink(tmp_filename)
-        
-    except Exception as e:
-        pdf.ln(5)
-        pdf.set_font("Arial", "I", 10)
-        pdf.cell(0, 10, f"Erro no grafico: {str(e)}", 0, 1)
 
-    return pdf.output(dest='S').encode('latin-1')
+RESULTS_CACHE_SIZE = 256
+RESULTS_CACHE_TTL = 3600  # segundos
+
+@st.cache_resource
+def get_results_cache():
+    return TTLCache(maxsize=RESULTS_CACHE_SIZE, ttl=RESULTS_CACHE_TTL)
+
+# Endpoint Prometheus (/metrics) com os tempos por etapa: AIA_METRICS_PORT=9108
+# (só em 127.0.0.1; AIA_METRICS_HOST=0.0.0.0 expõe-no nas outras interfaces)
+METRICS_PORT = os.environ.get("AIA_METRICS_PORT")
+METRICS_HOST = os.environ.get("AIA_METRICS_HOST", "127.0.0.1")
+
+@st.cache_resource
+def start_metrics_endpoint(port, host):
+    timing.set_enabled(True)
+    return timing.start_metrics_server(port, host)
+
+if METRICS_PORT:
+    start_metrics_endpoint(int(METRICS_PORT), METRICS_HOST)
+
+# Registo persistente de processos (SQLite; ficheiro em AIA_REGISTRY_DB)
+@st.cache_resource
+def get_registry():
+    return ProcessRegistry()
+
+@st.cache_data(max_entries=2, show_spinner=False)
+def registry_portfolio_bars(version):
+    """Barras do Gantt de carteira dos processos gravados (recalculadas quando o registo muda)."""
+    from gantt import build_portfolio_bars
+    return build_portfolio_bars(get_registry().processes())
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def upload_portfolio_bars(data, ext):
+    """Barras do Gantt de carteira de um ficheiro carregado (em cache pelo conteúdo)."""
+    from gantt import build_portfolio_bars
+    from portfolio import read_portfolio
+    return build_portfolio_bars(read_portfolio(io.StringIO(data.decode("utf-8-sig"), newline=""), ext))
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def inverse_queries(target, business_days, start_date, suspension_start, suspensions, calendar):
+    """(instrução mais tardia, suspensão máxima) para a data-alvo; em cache pelas entradas
+    (``suspensions`` como tuplo de (início, fim), ``calendar`` como calendar_key)."""
+    suspensions = [{'start': start, 'end': end} for start, end in suspensions]
+    business_calendar = get_business_calendar(*calendar)
+    latest = latest_start_date(target, business_days, suspensions, business_calendar)
+    max_susp = max_suspension_days(start_date, business_days, target, suspension_start, suspensions, business_calendar)
+    return latest, max_susp
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def process_calendar(name, result_key, suspensions, _result):
+    """Calendário .ics do processo, em cache pelo nome, pelo resultado (result.key()) e pelas suspensões."""
+    return workflow_ics(name, _result, [{'start': start, 'end': end} for start, end in suspensions])
+
+def load_process(name):
+    """Repõe na barra lateral as entradas de um processo gravado (callback do botão Carregar)."""
+    process = get_registry().get_process(name)
+    if process is None:
+        return
+    config, k = process["milestones_config"], str(process["regime"])
+    st.session_state.update({
+        "proj_name": process["name"], "start_date": process["start_date"], "regime": process["regime"],
+        "pea_date": process["pea_date"], "cp_duration": config["cp_duration"], "visita": config["visita"],
+        f"r{k}": config["reuniao"], f"c{k}": config["conformidade"], f"p{k}": config["ptf"],
+        f"a{k}": config["audiencia"], f"s{k}": config["setoriais"], f"d{k}": config["dia"],
+    })
+    if process["typology"] in TIPOLOGIAS_INFO:
+        st.session_state.typology = process["typology"]
+    if process["sector"] in SPECIFIC_LAWS:
+        st.session_state.sector = process["sector"]
+    if process["municipality"] is None or process["municipality"] in MUNICIPAL_HOLIDAYS:
+        st.session_state.municipality = process["municipality"]
+    st.session_state.tolerance = [t for t in process["tolerance"] if t in TOLERANCE_DAYS]
+    st.session_state.suspensions_universal = process["suspensions"]
+
+def init_sidebar_state():
+    """Valores iniciais dos campos da barra lateral (uma vez por sessão).
+
+    Os widgets com chave não recebem ``value=``: o valor vem só de
+    st.session_state, também quando load_process o repõe.
+    """
+    defaults = {"proj_name": "Novo Projeto AIA", "start_date": date.today(), "pea_date": None,
+                "cp_duration": 30, "visita": 15}
+    for regime, config in MILESTONES_DEFAULTS.items():
+        k = str(regime)
+        defaults.update({f"r{k}": config["reuniao"], f"c{k}": config["conformidade"], f"p{k}": config["ptf"],
+                         f"a{k}": config["audiencia"], f"s{k}": config["setoriais"], f"d{k}": config["dia"]})
+    for key, value in defaults.items():
+        if key not in st.session_state:
+            st.session_state[key] = value
+
+def compute_results(workflow, start_date, suspensions, milestones_config, pea_date, calendar):
+    """Workflow e tabelas dos separadores 1 a 3 (o que fica em cache).
+
+    ``workflow`` é o IncrementalWorkflow da sessão: entre alterações às
+    suspensões só são recalculados os marcos afetados. ``calendar`` é o
+    calendário partilhado do concelho (ou o nacional).
+    """
+    result = workflow.compute(start_date, suspensions, milestones_config, pea_date=pea_date, holidays_set=calendar)
+
+    with stage("tabelas"):
+        tables = _build_tables(result, suspensions)
+
+    return {"result": result, **tables}
+
+def _build_tables(result, suspensions):
+    """DataFrames dos separadores 1 a 3, construídos por colunas a partir do WorkflowResult."""
+    main = [(None, "Entrada / Instrução", "Dia 0", result.start_date)] + result.main_rows()
+    df_main = pd.DataFrame({
+        "Etapa": [row[1] for row in main],
+        "Prazo Legal": [row[2] for row in main],
+        "Data Prevista": [row[3].strftime("%d-%m-%Y") for row in main],
+    })
+
+    complementary = result.complementary_rows()
+    df_comp = pd.DataFrame({
+        "Etapa": [row[1] for row in complementary],
+        "Ref": [row[2] for row in complementary],
+        "Data": [row[3].strftime("%d-%m-%Y") for row in complementary],
+    })
+
+    bars = [(task, start, end, "Fase Principal") for task, start, end in result.phase_bars()]
+    bars.append(("Consulta Pública", *result.cp_period(), "Consulta Pública"))
+    bars += [("Suspensão", s['start'], s['end'], "Suspensão") for s in suspensions]
+    df_gantt = pd.DataFrame(bars, columns=["Task", "Start", "Finish", "Resource"])
+
+    return {"df_main": df_main, "df_comp": df_comp, "df_gantt": df_gantt}
 
 # ==========================================
-# 6. INTERFACE DO UTILIZADOR
+# 4. INTERFACE DO UTILIZADOR
 # ==========================================
 
 st.title("🌿 Analista EIA - RJAIA Completo")
 st.markdown("Ferramenta de cálculo de prazos de acordo com o **RJAIA** e **Simplex Ambiental**.")
 
-if FPDF is None:
+if not fpdf_available():
     st.error("⚠️ Aviso: A biblioteca 'fpdf' não está instalada. A geração de PDF não funcionará.")
 
 # --- SIDEBAR ---
+init_sidebar_state()
 with st.sidebar:
     st.header("📂 Dados do Processo")
-    proj_name = st.text_input("Nome do Projeto", "Novo Projeto AIA")
-    start_date = st.date_input("Data de Instrução (Dia 0)", date.today())
+    proj_name = st.text_input("Nome do Projeto", key="proj_name")
+    start_date = st.date_input("Data de Instrução (Dia 0)", key="start_date")
     
     st.markdown("---")
     st.subheader("⚖️ Enquadramento")
     
-    selected_typology = st.selectbox("Tipologia do Projeto", list(TIPOLOGIAS_INFO.keys()))
-    selected_sector = st.selectbox("Setor de Atividade", list(SPECIFIC_LAWS.keys()))
+    selected_typology = st.selectbox("Tipologia do Projeto", list(TIPOLOGIAS_INFO.keys()), key="typology")
+    selected_sector = st.selectbox("Setor de Atividade", list(SPECIFIC_LAWS.keys()), key="sector")
+    municipality = st.selectbox(
+        "Concelho (feriado municipal)", [None] + sorted(MUNICIPAL_HOLIDAYS),
+        format_func=lambda x: "Só feriados nacionais" if x is None else x, key="municipality"
+    )
+    tolerance = st.multiselect("Tolerâncias de ponto", list(TOLERANCE_DAYS), key="tolerance",
+                               help="Dias sem atendimento a descontar como feriados.")
+    business_calendar = get_business_calendar(municipality, tolerance)
     
     regime_option = st.radio(
         "Selecione o Prazo Global:",
         (150, 90),
-        format_func=lambda x: f"{x} Dias Úteis (AIA {'Geral' if x==150 else 'Simplificado/SIR'})"
+        format_func=lambda x: f"{x} Dias Úteis (AIA {'Geral' if x==150 else 'Simplificado/SIR'})",
+        key="regime"
     )
     
     with st.expander("⚙️ Definições Avançadas de Prazos", expanded=False):
         st.caption("Valores ajustam-se automaticamente ao Regime (Simplex ou Geral).")
         
-        if regime_option == 150:
-            # Defaults 150 dias (RJAIA Geral)
-            d_reuniao = st.number_input("Reunião", value=9, key="r150")
-            d_conf = st.number_input("Conformidade", value=30, key="c150")
-            d_ptf = st.number_input("Envio PTF", value=85, key="p150")
-            d_aud = st.number_input("Audiência", value=100, key="a150")
-            d_setoriais = st.number_input("Pareceres Setoriais (Dia Global)", value=75, key="s150")
-            d_dia = st.number_input("Decisão Final (DIA)", value=150, disabled=True, key="d150")
-        else:
-            # Defaults 90 dias (Padrões Legais/Excel "Com Suspensão")
-            # 65 dias para PTF, 70 para Audiência, 60 para Setoriais, 20 para Conformidade
-            d_reuniao = st.number_input("Reunião", value=9, key="r90")
-            d_conf = st.number_input("Conformidade", value=20, key="c90")  
-            d_ptf = st.number_input("Envio PTF", value=65, key="p90")      
-            d_aud = st.number_input("Audiência", value=70, key="a90")      
-            d_setoriais = st.number_input("Pareceres Setoriais (Dia Global)", value=60, key="s90")
-            d_dia = st.number_input("Decisão Final (DIA)", value=90, disabled=True, key="d90")
+        # Defaults por regime (150: RJAIA Geral; 90: Padrões Legais/Excel "Com Suspensão"), em init_sidebar_state
+        k = str(regime_option)
+        d_reuniao = st.number_input("Reunião", step=1, key=f"r{k}")
+        d_conf = st.number_input("Conformidade", step=1, key=f"c{k}")
+        d_ptf = st.number_input("Envio PTF", step=1, key=f"p{k}")
+        d_aud = st.number_input("Audiência", step=1, key=f"a{k}")
+        d_setoriais = st.number_input("Pareceres Setoriais (Dia Global)", step=1, key=f"s{k}")
+        d_dia = st.number_input("Decisão Final (DIA)", step=1, disabled=True, key=f"d{k}")
         
         st.markdown("**Prazos Complementares:**")
-        d_cp_duration = st.number_input("Duração Consulta Pública (dias)", value=30)
-        d_visita = st.number_input("Dia da Visita (após Início CP)", value=15)
+        d_cp_duration = st.number_input("Duração Consulta Pública (dias)", step=1, key="cp_duration")
+        d_visita = st.number_input("Dia da Visita (após Início CP)", step=1, key="visita")
         
         st.markdown("**Suspensão Específica:**")
-        pea_date = st.date_input("Data do PEA (se aplicável)", value=None, help="Preencha se houve Pedido de Elementos Adicionais na fase de Conformidade (trava o relógio).")
+        pea_date = st.date_input("Data do PEA (se aplicável)", help="Preencha se houve Pedido de Elementos Adicionais na fase de Conformidade (trava o relógio).", key="pea_date")
             
         milestones_config = {
             "reuniao": d_reuniao, "conformidade": d_conf, "ptf": d_ptf,
@@ -531,8 +253,11 @@ with st.sidebar:
         new_start = c1.date_input("Início Suspensão")
         new_end = c2.date_input("Fim Suspensão")
         if st.form_submit_button("Adicionar"):
-            st.session_state.suspensions_universal.append({'start': new_start, 'end': new_end})
-            st.rerun()
+            if new_end < new_start:
+                st.error("O fim da suspensão não pode ser anterior ao início.")
+            else:
+                st.session_state.suspensions_universal.append({'start': new_start, 'end': new_end})
+                st.rerun()
     
     if st.session_state.suspensions_universal:
         st.write("**Suspensões Ativas:**")
@@ -543,80 +268,281 @@ with st.sidebar:
                 del st.session_state.suspensions_universal[i]
                 st.rerun()
 
+    st.markdown("---")
+    with st.expander("💾 Registo de Processos", expanded=False):
+        registry = get_registry()
+        if st.button("Guardar processo atual"):
+            _, recomputed = registry.save_process(
+                proj_name, start_date, regime_option, st.session_state.suspensions_universal,
+                milestones_config, pea_date, selected_typology, selected_sector, municipality, tolerance
+            )
+            st.success("Processo gravado." if recomputed else "Processo gravado (datas sem alterações).")
+        saved_names = [p["name"] for p in registry.list_processes()]
+        if saved_names:
+            load_name = st.selectbox("Processo gravado", saved_names)
+            st.button("Carregar", on_click=load_process, args=(load_name,))
+
 # ==========================================
-# 7. CÁLCULO E RESULTADOS
+# 5. CÁLCULO E RESULTADOS
 # ==========================================
 
-milestones, complementary, total_susp, log_dia, gantt_data = calculate_workflow(
-    start_date, 
-    st.session_state.suspensions_universal, 
-    milestones_config,
-    pea_date=pea_date
-)
+results_cache = get_results_cache()
+if "workflow" not in st.session_state:
+    st.session_state.workflow = IncrementalWorkflow()
+workflow = st.session_state.workflow
+suspensions = SuspensionSet(st.session_state.suspensions_universal)
+cache_key = workflow_cache_key(start_date, regime_option, milestones_config, pea_date, suspensions,
+                               calendar_key(municipality, tolerance))
+computed = []  # fica vazio se o resultado vier da cache partilhada (o workflow da sessão não corre)
 
-final_dia_date = milestones[-1]["Data Prevista"]
+def compute_now():
+    computed.append(True)
+    return compute_results(workflow, start_date, suspensions, milestones_config, pea_date, business_calendar)
+
+with stage("resultados"):
+    results = results_cache.get_or_compute(cache_key, compute_now)
+result = results["result"]
+log_dia = result.log
+
+with st.sidebar:
+    with st.expander("📊 Cache de Resultados", expanded=False):
+        cache_stats = results_cache.stats()
+        st.caption(
+            f"Acertos: {cache_stats['hits']} · Falhas: {cache_stats['misses']} · "
+            f"Entradas: {cache_stats['size']}/{cache_stats['maxsize']} · Validade: {cache_stats['ttl']} s"
+        )
+        if not computed:
+            st.caption("Resultado da cache: sem recálculo nesta execução.")
+        elif workflow.recomputed or workflow.reused:
+            st.caption(
+                f"Último cálculo: {len(workflow.reused)} marcos reaproveitados, {len(workflow.recomputed)} recalculados"
+                + (f" ({', '.join(workflow.recomputed)})" if workflow.reused else "")
+            )
+
+final_dia_date = result.date_of("dia")
 
 # --- DASHBOARD ---
 st.divider()
 c1, c2, c3, c4 = st.columns(4)
 c1.metric("Regime", f"{regime_option} Dias")
 c2.metric("Início", start_date.strftime("%d/%m/%Y"))
-c3.metric("Suspensões", f"{total_susp} dias")
+c3.metric("Suspensões", f"{result.total_susp} dias")
 c4.metric("Previsão DIA", final_dia_date.strftime("%d/%m/%Y"))
 
 # --- ABAS ---
-tab1, tab2, tab3, tab4 = st.tabs(["📋 Prazos Principais", "📑 Complementares", "📅 Gantt", "⚖️ Legislação"])
+tab1, tab2, tab3, tab_sim, tab_inv, tab_reg, tab4 = st.tabs(["📋 Prazos Principais", "📑 Complementares", "📅 Gantt", "🎲 Simulação", "🎯 Cenários Inversos", "🗂️ Registo", "⚖️ Legislação"])
 
 with tab1:
-    df_main = pd.DataFrame(milestones)
-    row0 = pd.DataFrame([{"Etapa": "Entrada / Instrução", "Prazo Legal": "Dia 0", "Data Prevista": start_date}])
-    df_main = pd.concat([row0, df_main], ignore_index=True)
-    df_main["Data Prevista"] = pd.to_datetime(df_main["Data Prevista"]).dt.strftime("%d-%m-%Y")
-    st.dataframe(df_main, use_container_width=True, hide_index=True)
+    st.dataframe(results["df_main"], use_container_width=True, hide_index=True)
+
+    # Registo diário da contagem da DIA (calculado só quando pedido)
+    if st.toggle("Mostrar registo de contagem (DIA)"):
+        log_status = st.multiselect("Filtrar por estado", list(log_dia.STATUSES), placeholder="Todos")
+        log_status = log_status or None
+        log_rows = log_dia.count(log_status)
+        page_size = 50
+        n_pages = max((log_rows + page_size - 1) // page_size, 1)
+        c1, c2 = st.columns([0.3, 0.7])
+        log_page = c1.number_input("Página", min_value=1, max_value=n_pages, value=1) - 1
+        c2.caption(f"{log_rows} dias · " + " · ".join(f"{k}: {v}" for k, v in log_dia.status_counts().items()))
+        st.dataframe(log_dia.to_dataframe(log_status, page=log_page, size=page_size), use_container_width=True, hide_index=True)
+        csv_buffer = io.StringIO()
+        log_dia.to_csv(csv_buffer, log_status)
+        st.download_button("Exportar CSV", csv_buffer.getvalue(), "registo_contagem_dia.csv", "text/csv")
 
 with tab2:
-    if complementary:
-        df_comp = pd.DataFrame(complementary)
-        df_comp["Data"] = pd.to_datetime(df_comp["Data"]).dt.strftime("%d-%m-%Y")
-        st.dataframe(df_comp, use_container_width=True, hide_index=True)
+    st.dataframe(results["df_comp"], use_container_width=True, hide_index=True)
 
 with tab3:
-    # Gantt Plotly
-    data_gantt = []
-    last = start_date
-    for m in milestones:
-        end = m["Data Prevista"]
-        start = last if last < end else end
-        data_gantt.append(dict(Task=m["Etapa"], Start=start, Finish=end, Resource="Fase Principal"))
-        last = end
-    
-    if gantt_data:
-        data_gantt.append(dict(Task="Consulta Pública", Start=gantt_data['cp_start'], Finish=gantt_data['cp_end'], Resource="Consulta Pública"))
-        
-    for s in st.session_state.suspensions_universal:
-        data_gantt.append(dict(Task="Suspensão", Start=s['start'], Finish=s['end'], Resource="Suspensão"))
-        
-    fig = px.timeline(pd.DataFrame(data_gantt), x_start="Start", x_end="Finish", y="Task", color="Resource",
-                      color_discrete_map={"Fase Principal": "#2E86C1", "Suspensão": "#E74C3C", "Consulta Pública": "#27AE60", "Outros": "#F1C40F"})
-    st.plotly_chart(fig, use_container_width=True)
+    gantt_view = st.radio("Vista", ["Processo atual", "Carteira"], horizontal=True, label_visibility="collapsed")
+    if gantt_view == "Processo atual":
+        # Gantt Plotly (importado só quando o gráfico é desenhado)
+        import plotly.express as px
+        with stage("plotly.gantt"):
+            fig = px.timeline(results["df_gantt"], x_start="Start", x_end="Finish", y="Task", color="Resource",
+                              color_discrete_map={"Fase Principal": "#2E86C1", "Suspensão": "#E74C3C", "Consulta Pública": "#27AE60", "Outros": "#F1C40F"})
+        st.plotly_chart(fig, use_container_width=True)
+    else:
+        # Carteira: barras em colunas; só a fatia visível (processos x datas) vai para o browser
+        from gantt import portfolio_figure
+        c1, c2 = st.columns([0.3, 0.7])
+        gantt_source = c1.radio("Origem", ["Registo", "Ficheiro"], horizontal=True)
+        bars = None
+        if gantt_source == "Ficheiro":
+            upload = c2.file_uploader("Carteira (CSV, JSON ou JSON Lines)", type=["csv", "json", "jsonl"])
+            if upload is not None:
+                try:
+                    bars = upload_portfolio_bars(upload.getvalue(), os.path.splitext(upload.name)[1].lower())
+                except ValueError as e:
+                    st.error(f"Carteira inválida: {e}")
+        else:
+            bars = registry_portfolio_bars(get_registry().version())
+
+        if bars is None or not len(bars):
+            st.caption("Sem processos para mostrar (grave processos no registo ou carregue uma carteira).")
+        else:
+            n_processes = bars.n_processes
+            first_date, last_date = bars.date_range()
+            c1, c2, c3 = st.columns([0.35, 0.45, 0.2])
+            if n_processes > 1:
+                row_range = c1.slider("Processos", 0, n_processes, (0, min(n_processes, 500)))
+            else:
+                row_range = (0, n_processes)
+            date_window = (first_date, last_date)
+            if first_date < last_date:
+                date_window = c2.slider("Janela de datas", first_date, last_date, date_window, format="DD/MM/YYYY")
+            gantt_mode = c3.selectbox("Traço", ["Automático", "Barras (WebGL)", "Agregado"])
+            visible = bars.window(row_range[0], row_range[1], *date_window)
+            with stage("plotly.gantt_carteira"):
+                fig = portfolio_figure(visible, aggregate={"Automático": None, "Barras (WebGL)": False, "Agregado": True}[gantt_mode])
+            st.plotly_chart(fig, use_container_width=True)
+            st.caption(f"{len(visible)} barras · processos {row_range[0] + 1} a {row_range[1]} de {n_processes}")
+
+with tab_sim:
+    # Monte Carlo: motor vetorizado (numpy) importado só quando usado
+    from simulation import DEFAULT_PEA_MODEL, DEFAULT_SUSPENSION_MODEL, PERCENTILES, simulate_workflow, summarize_dates
+    st.caption("Distribuição das datas sob suspensões e PEA incertos (dias de calendário desde a instrução).")
+    with st.form("sim_form"):
+        c1, c2, c3 = st.columns(3)
+        n_scenarios = c1.number_input("Nº de cenários", min_value=100, max_value=100000, value=10000, step=1000)
+        susp_count = c2.number_input("Máx. suspensões", min_value=0, max_value=10, value=DEFAULT_SUSPENSION_MODEL["count"])
+        susp_prob = c3.slider("Prob. de cada suspensão", 0.0, 1.0, DEFAULT_SUSPENSION_MODEL["probability"])
+        c1, c2 = st.columns(2)
+        susp_window = c1.slider("Início da suspensão (dia)", 0, 300, (DEFAULT_SUSPENSION_MODEL["start_min"], DEFAULT_SUSPENSION_MODEL["start_max"]))
+        susp_dur = c2.slider("Duração da suspensão (mín./máx.)", 1, 365, (DEFAULT_SUSPENSION_MODEL["dur_min"], DEFAULT_SUSPENSION_MODEL["dur_max"]))
+        c1, c2, c3 = st.columns(3)
+        pea_prob = c1.slider("Prob. de PEA", 0.0, 1.0, DEFAULT_PEA_MODEL["probability"])
+        pea_window = c2.slider("Data do PEA (dia)", 0, 60, (DEFAULT_PEA_MODEL["day_min"], DEFAULT_PEA_MODEL["day_max"]))
+        pea_dur = c3.slider("Duração do PEA (mín./máx.)", 1, 365, (DEFAULT_PEA_MODEL["dur_min"], DEFAULT_PEA_MODEL["dur_max"]))
+        run_sim = st.form_submit_button("Simular")
+
+    if run_sim:
+        suspension_model = {
+            "count": int(susp_count), "probability": susp_prob,
+            "start_min": susp_window[0], "start_max": susp_window[1],
+            "dur_min": susp_dur[0], "dur_mode": (susp_dur[0] + susp_dur[1]) // 2, "dur_max": susp_dur[1],
+        }
+        pea_model = {
+            "probability": pea_prob, "day_min": pea_window[0], "day_max": pea_window[1],
+            "dur_min": pea_dur[0], "dur_mode": (pea_dur[0] + pea_dur[1]) // 2, "dur_max": pea_dur[1],
+        }
+        sim = simulate_workflow(start_date, milestones_config, int(n_scenarios), suspension_model, pea_model,
+                                business_calendar=business_calendar)
+        st.session_state.sim_results = sim
+
+    if "sim_results" in st.session_state:
+        import plotly.express as px
+        sim = st.session_state.sim_results
+        rows = []
+        for label, key in (("Emissão da DIA", "dia"), ("Início Consulta Pública", "cp_start"), ("Fim Consulta Pública", "cp_end")):
+            summary = summarize_dates(sim[key])
+            rows.append({"Marco": label, **{f"P{p}": summary[p].strftime("%d-%m-%Y") for p in PERCENTILES}})
+        st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+        fig_sim = px.histogram(pd.DataFrame({"Data da DIA": sim["dia"]}), x="Data da DIA", nbins=60)
+        st.plotly_chart(fig_sim, use_container_width=True)
+
+with tab_inv:
+    st.caption("Que margem existe para cumprir uma data-alvo? (pesquisa binária sobre o motor de prazos)")
+    inverse_steps = {
+        "Emissão da DIA (Decisão Final)": "dia", "Audiência de Interessados": "audiencia",
+        "Envio PTF à AAIA": "ptf", "Limite Conformidade": "conformidade",
+        "Pareceres Setoriais": "setoriais", "Data Reunião": "reuniao",
+    }
+    c1, c2, c3 = st.columns(3)
+    inv_step = c1.selectbox("Etapa", list(inverse_steps.keys()))
+    inv_days = milestones_config[inverse_steps[inv_step]]
+    inv_target = c2.date_input("Data-alvo", final_dia_date, key="inv_target")
+    inv_susp_start = c3.date_input("Início da nova suspensão", max(date.today(), start_date), key="inv_susp")
+
+    latest, max_susp = inverse_queries(inv_target, inv_days, start_date, inv_susp_start,
+                                       tuple((s['start'], s['end']) for s in suspensions),
+                                       calendar_key(municipality, tolerance))
+
+    c1, c2 = st.columns(2)
+    c1.metric("Instrução mais tardia", latest.strftime("%d/%m/%Y") if latest else "Impossível")
+    if max_susp is None:
+        c2.metric("Suspensão máxima", "Prazo já falha")
+    elif max_susp == float("inf"):
+        c2.metric("Suspensão máxima", "Sem limite")
+    else:
+        c2.metric("Suspensão máxima", f"{max_susp} dias")
+        if max_susp > 0:
+            st.caption(f"Suspensão de {inv_susp_start.strftime('%d/%m/%Y')} até "
+                       f"{(inv_susp_start + timedelta(days=max_susp - 1)).strftime('%d/%m/%Y')} (inclusive).")
+    st.caption(f"Prazo de {inv_days} dias úteis, com as suspensões ativas; sem a regra especial do PEA.")
+
+with tab_reg:
+    # Prazos de todos os processos gravados (consulta pelo índice de datas, sem recalcular)
+    registry = get_registry()
+    c1, c2 = st.columns([0.3, 0.7])
+    horizon = c1.number_input("Próximos dias úteis", min_value=1, max_value=250, value=10)
+    only_main = c2.checkbox("Só etapas principais", value=False)
+    upcoming = registry.upcoming_deadlines(int(horizon), kinds=(MAIN,) if only_main else (MAIN, COMPLEMENTARY))
+    if upcoming:
+        st.dataframe(pd.DataFrame([
+            {"Data": u["due_date"].strftime("%d-%m-%Y"), "Processo": u["process"], "Etapa": u["label"]} for u in upcoming
+        ]), use_container_width=True, hide_index=True)
+    else:
+        st.caption("Sem prazos neste intervalo.")
+
+    saved = registry.list_processes()
+    if saved:
+        st.write("**Processos gravados:**")
+        st.dataframe(pd.DataFrame([
+            {"Processo": p["name"], "Regime": p["regime"], "Início": p["start_date"].strftime("%d-%m-%Y"),
+             "Previsão DIA": p["dia"].strftime("%d-%m-%Y") if p["dia"] else "-", "Atualizado": p["updated_at"]}
+            for p in saved
+        ]), use_container_width=True, hide_index=True)
 
 with tab4:
     st.write("**Transversal:**")
     for k, v in COMMON_LAWS.items(): st.markdown(f"- [{k}]({v})")
     
 st.markdown("---")
+st.download_button(
+    "📅 Exportar calendário (.ics)",
+    process_calendar(proj_name, result.key(), tuple((s['start'], s['end']) for s in st.session_state.suspensions_universal),
+                     result),
+    "prazos_aia.ics", "text/calendar",
+    help="Marcos, prazos complementares e suspensões como eventos de dia inteiro (Outlook, Google Calendar).",
+)
 if st.button("Gerar Relatório PDF"):
+    pdf_timings = {}
     pdf_bytes = create_pdf(
         proj_name, 
         selected_typology, 
         selected_sector, 
         f"Regime {regime_option} Dias", 
-        start_date, 
-        milestones, 
-        complementary, 
+        result, 
         st.session_state.suspensions_universal, 
-        total_susp,
-        gantt_data
+        timings=pdf_timings
     )
     if pdf_bytes:
         st.download_button("Descarregar PDF", pdf_bytes, "relatorio_aia.pdf", "application/pdf")
+        if pdf_timings["cache"]:
+            st.caption("Relatório servido da cache.")
+        else:
+            st.caption(f"Gráfico: {pdf_timings['grafico'] * 1000:.0f} ms · Montagem PDF: {pdf_timings['pdf'] * 1000:.0f} ms")
+
+# --- DIAGNÓSTICO (tempos por etapa) ---
+with st.sidebar:
+    with st.expander("⏱️ Diagnóstico", expanded=False):
+        # Só mostra ou esconde o painel nesta sessão: a medição é do processo inteiro
+        # (AIA_TIMING=1 ou AIA_METRICS_PORT) e não muda com o painel de um utilizador
+        show_timing = st.toggle("Mostrar tempos por etapa", key="timing_visible")
+        if show_timing and not timing.enabled():
+            st.caption("Medição desligada (arranque com AIA_TIMING=1 ou AIA_METRICS_PORT).")
+        elif show_timing:
+            timing_stats = timing.snapshot()
+            if timing_stats:
+                st.dataframe(pd.DataFrame([
+                    {"Etapa": name, "N": t["count"], "Última (ms)": round(t["last_s"] * 1000, 2),
+                     "Média (ms)": round(t["total_s"] / t["count"] * 1000, 2), "Máx. (ms)": round(t["max_s"] * 1000, 2)}
+                    for name, t in timing_stats.items()
+                ]), use_container_width=True, hide_index=True)
+                st.caption("Tempos agregados do processo (todas as sessões); resultados em cache não voltam a medir o cálculo.")
+                c1, c2 = st.columns(2)
+                c1.download_button("Métricas", timing.render_prometheus(), "metrics.txt", "text/plain")
+                c2.button("Limpar", on_click=timing.reset)
+            else:
+                st.caption("Sem medições ainda.")
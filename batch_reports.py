@@ -0,0 +1,108 @@
+"""Relatórios PDF em lote para uma carteira, num pool de processos, escritos num ZIP.
+
+O matplotlib e o fpdf são CPU-bound e presos ao GIL, por isso cada relatório
+é gerado num processo à parte. Os PDFs entram no ZIP à medida que ficam
+prontos; só há em memória os que estão em curso.
+
+Uso: python batch_reports.py carteira.csv relatorios.zip [--workers N]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+import unicodedata
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from engine import compute_workflow, get_business_calendar, milestones_for
+from portfolio import iter_portfolio
+from report import create_pdf, fpdf_available
+
+
+def _slug(text):
+    text = unicodedata.normalize("NFKD", str(text)).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^A-Za-z0-9]+", "_", text).strip("_")[:60] or "processo"
+
+
+def render_process_report(index, process):
+    """Gera o PDF de um processo (corre num processo do pool). Devolve (nome_ficheiro, bytes)."""
+    config = milestones_for(process["regime"], process.get("milestones_config"))
+    result = compute_workflow(
+        process["start_date"], process["suspensions"], config, process["pea_date"],
+        get_business_calendar(process.get("municipality"), process.get("tolerance") or ()),
+    )
+    name = process.get("name") or f"Processo {index + 1}"
+    pdf_bytes = create_pdf(
+        name,
+        process.get("typology") or "-",
+        process.get("sector") or "-",
+        f"Regime {process['regime']} Dias",
+        result,
+        process["suspensions"],
+    )
+    if pdf_bytes is None:
+        raise RuntimeError("A geração de PDF requer a biblioteca 'fpdf' (pip install fpdf).")
+    return f"{index + 1:05d}_{_slug(name)}.pdf", pdf_bytes
+
+
+def generate_reports_zip(processes, output, workers=None, progress=None):
+    """Gera os relatórios de `processes` (iterável) para o ZIP `output` (caminho ou ficheiro).
+
+    `progress(concluidos, nome_ficheiro)` é chamado após cada relatório escrito.
+    Devolve o número de relatórios gerados.
+    """
+    # Verificado antes de abrir o ZIP e o pool (cada worker devolveria None)
+    if not fpdf_available():
+        raise RuntimeError("A geração de PDF requer a biblioteca 'fpdf' (pip install fpdf).")
+    workers = workers or os.cpu_count() or 1
+    max_pending = workers * 2
+    done = 0
+    with zipfile.ZipFile(output, "w", compression=zipfile.ZIP_DEFLATED) as zf, \
+            ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+
+        def drain(return_when):
+            nonlocal done, pending
+            finished, pending = wait(pending, return_when=return_when)
+            for future in finished:
+                filename, pdf_bytes = future.result()
+                zf.writestr(filename, pdf_bytes)
+                done += 1
+                if progress:
+                    progress(done, filename)
+
+        for index, process in enumerate(processes):
+            pending.add(pool.submit(render_process_report, index, process))
+            # Limita os relatórios em curso para manter a memória constante
+            if len(pending) >= max_pending:
+                drain(FIRST_COMPLETED)
+        while pending:
+            drain(FIRST_COMPLETED)
+    return done
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Relatórios PDF em lote para uma carteira de processos AIA.")
+    parser.add_argument("portfolio", help="Carteira em CSV, JSON ou JSON Lines")
+    parser.add_argument("output", help="Ficheiro ZIP de saída")
+    parser.add_argument("--workers", type=int, default=None, help="Nº de processos (por defeito, nº de CPUs)")
+    args = parser.parse_args(argv)
+
+    t_start = time.perf_counter()
+
+    def progress(done, filename):
+        print(f"\r{done} relatórios ({filename})", end="", file=sys.stderr, flush=True)
+
+    try:
+        total = generate_reports_zip(iter_portfolio(args.portfolio), args.output, args.workers, progress)
+    except (RuntimeError, ValueError) as e:
+        print(f"\nErro: {e}", file=sys.stderr)
+        return 1
+    elapsed = time.perf_counter() - t_start
+    print(f"\n{total} relatórios em {elapsed:.1f} s ({total / elapsed if elapsed else 0:.1f}/s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
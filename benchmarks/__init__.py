@@ -0,0 +1 @@
+"""Benchmarks do motor de prazos (executar a partir da raiz do repositório)."""
@@ -0,0 +1,60 @@
+"""Histórico de resultados dos benchmarks (um ficheiro JSON Lines por suite)."""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def _git_revision():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(RESULTS_DIR), timeout=10)
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def last_record(suite):
+    """Último registo guardado para a suite (ou None)."""
+    path = os.path.join(RESULTS_DIR, f"{suite}.jsonl")
+    if not os.path.exists(path):
+        return None
+    last = None
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            if line.strip():
+                last = json.loads(line)
+    return last
+
+
+def record(suite, metrics):
+    """Acrescenta um registo à suite e devolve o registo anterior (para comparação)."""
+    previous = last_record(suite)
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    entry = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "revision": _git_revision(),
+        "python": sys.version.split()[0],
+        "machine": platform.node(),
+        "metrics": metrics,
+    }
+    with open(os.path.join(RESULTS_DIR, f"{suite}.jsonl"), "a", encoding="utf-8") as fh:
+        fh.write(json.dumps(entry) + "\n")
+    return previous
+
+
+def compare(metrics, previous, tolerance=0.25):
+    """Métricas (tempos) que pioraram mais do que `tolerance` face ao registo anterior."""
+    if not previous:
+        return {}
+    regressions = {}
+    for name, value in metrics.items():
+        old = previous["metrics"].get(name)
+        if isinstance(value, (int, float)) and isinstance(old, (int, float)) and old > 0:
+            if value > old * (1 + tolerance):
+                regressions[name] = (old, value)
+    return regressions
@@ -0,0 +1,260 @@
+"""Verificações do agendador de alertas (alerts.AlertScheduler) contra um modelo simples.
+
+O modelo guarda, sem heap nem versões, o alerta pendente de cada marco e
+recalcula as datas de raiz (compute_workflow). Cada caso aleatório junta,
+atualiza (suspensões novas, calendário diferente, muitas alterações seguidas
+ao mesmo processo, para forçar a compactação) e remove processos enquanto
+os dias passam, e compara dia a dia os alertas disparados, os marcos
+reagendados, o nº de alertas agendados e o próximo alerta. À parte, grava e
+apaga processos por uma ligação ao registo SQLite e verifica que um
+agendador sincronizado por outra ligação vê as alterações.
+
+Sai com código 1 se houver divergências; o resumo fica em
+benchmarks/results/alert_checks.jsonl.
+
+Uso: python -m benchmarks.alert_checks [--cases N] [--seed S]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+from datetime import date, timedelta
+
+import engine
+from alerts import ALERT_MILESTONES, AlertScheduler
+from benchmarks._results import record
+from benchmarks.differential import Checker, random_calendar, random_suspensions
+from registry import ProcessRegistry
+
+SIMULATED_DAYS = 500
+
+
+class _NullSink:
+    def emit(self, alert):
+        pass
+
+
+def _alert_date(due_date, lead_days, calendar):
+    """Data do alerta recuando dia a dia (independente do índice usado por alerts.alert_date)."""
+    fire = due_date
+    while lead_days > 0:
+        fire -= timedelta(days=1)
+        if calendar.is_business_day(fire):
+            lead_days -= 1
+    return fire
+
+
+def _due_dates(process, calendar):
+    config = process.get("milestones_config") or engine.MILESTONES_DEFAULTS[process["regime"]]
+    result = engine.compute_workflow(process["start_date"], process["suspensions"], config,
+                                     process["pea_date"], calendar)
+    return {node: result.date_of(node) for node in ALERT_MILESTONES}
+
+
+def _random_process(rng, day0):
+    start = day0 - timedelta(days=rng.randrange(-30, 300))
+    return {
+        "start_date": start,
+        "regime": rng.choice([150, 90]),
+        "pea_date": start + timedelta(days=rng.randrange(0, 45)) if rng.random() < 0.4 else None,
+        "suspensions": random_suspensions(rng, start, rng.choice([0, 0, 1, 2, 3])),
+        "calendar": random_calendar(rng),
+    }
+
+
+def _random_update(rng, process):
+    """Cópia do processo com outra suspensão, outras suspensões, outro calendário ou igual."""
+    updated = dict(process)
+    kind = rng.random()
+    if kind < 0.45:
+        updated["suspensions"] = process["suspensions"] + random_suspensions(rng, process["start_date"], 1)
+    elif kind < 0.7:
+        updated["suspensions"] = random_suspensions(rng, process["start_date"], rng.randrange(0, 3))
+    elif kind < 0.85:
+        updated["calendar"] = random_calendar(rng)
+    return updated
+
+
+class _Model:
+    """Alertas esperados: um pendente por marco, reagendado quando a data do marco muda."""
+
+    def __init__(self, lead_days):
+        self.lead_days = lead_days
+        self.processes = {}  # processo -> (chave do calendário, datas)
+        self.pending = {}    # (processo, nó) -> (data do alerta, prazo, calendário)
+
+    def set_process(self, name, process):
+        key = process["calendar"]
+        calendar = engine.get_business_calendar(*key)
+        old_key, old = self.processes.get(name, (None, {}))
+        if old_key != key:
+            old = {}  # calendário novo: todos os marcos voltam a ser agendados
+        dates = _due_dates(process, calendar)
+        changed = [node for node in ALERT_MILESTONES if old.get(node) != dates[node]]
+        for node in changed:
+            self.pending[(name, node)] = (_alert_date(dates[node], self.lead_days, calendar), dates[node], calendar)
+        self.processes[name] = (key, dates)
+        return changed
+
+    def remove_process(self, name):
+        self.processes.pop(name, None)
+        for key in [key for key in self.pending if key[0] == name]:
+            del self.pending[key]
+
+    def run_pending(self, today):
+        fired = []
+        for (name, node), (fire, due, calendar) in list(self.pending.items()):
+            if fire <= today:
+                del self.pending[(name, node)]
+                if due >= today:
+                    fired.append((name, node, due, fire, calendar.business_days_between(today, due)))
+        return sorted(fired)
+
+    def next_alert_date(self):
+        return min((fire for fire, _, _ in self.pending.values()), default=None)
+
+
+def _check_state(checker, scheduler, model, context):
+    checker.check("agendados", len(scheduler) == len(model.pending),
+                  (context, len(scheduler), len(model.pending)))
+    checker.check("proximo_alerta", scheduler.next_alert_date() == model.next_alert_date(),
+                  (context, scheduler.next_alert_date(), model.next_alert_date()))
+    # Depois de cada alteração o lixo do heap fica limitado (compactação)
+    checker.check("compactacao", len(scheduler._heap) <= max(64, 2 * len(scheduler)),
+                  (context, len(scheduler._heap), len(scheduler)))
+
+
+def simulate(rng, checker, first_year, last_year):
+    """Um caso: processos juntados, atualizados e removidos ao longo de SIMULATED_DAYS dias."""
+    day0 = date(first_year, 1, 1) + timedelta(days=rng.randrange((date(last_year, 12, 31) - date(first_year, 1, 1)).days))
+    lead_days = rng.choice([0, 1, 5, 5, 10])
+    scheduler = AlertScheduler(_NullSink(), lead_days, today=lambda: day0)
+    model = _Model(lead_days)
+    processes = {}
+    events = {}
+    for i in range(rng.randrange(1, 7)):
+        name = f"P{i}"
+        events.setdefault(day0 + timedelta(days=rng.choice([0, 0, rng.randrange(SIMULATED_DAYS)])), []).append(("set", name))
+        for _ in range(rng.choice([0, 1, 2, 4])):
+            events.setdefault(day0 + timedelta(days=rng.randrange(SIMULATED_DAYS)), []).append(("update", name))
+        if rng.random() < 0.2:
+            events.setdefault(day0 + timedelta(days=rng.randrange(SIMULATED_DAYS)), []).append(("churn", name))
+        if rng.random() < 0.25:
+            events.setdefault(day0 + timedelta(days=rng.randrange(SIMULATED_DAYS)), []).append(("remove", name))
+
+    def apply_set(name, process):
+        municipality, tolerance = process["calendar"]
+        changed = scheduler.set_process(name, process["start_date"], process["suspensions"], None,
+                                        process["pea_date"], process["regime"],
+                                        engine.get_business_calendar(municipality, tolerance))
+        expected = model.set_process(name, process)
+        processes[name] = process
+        checker.check("reagendamento", changed == expected, (name, process, changed, expected))
+
+    for offset in range(SIMULATED_DAYS):
+        today = day0 + timedelta(days=offset)
+        for action, name in events.get(today, ()):
+            if action == "set":
+                apply_set(name, _random_process(rng, day0))
+            elif action == "remove":
+                removed = scheduler.remove_process(name)
+                checker.check("remocao", removed == (name in processes), (name, removed))
+                model.remove_process(name)
+                processes.pop(name, None)
+            elif name in processes and action == "update":
+                apply_set(name, _random_update(rng, processes[name]))
+            elif name in processes:
+                # Muitas alterações seguidas ao mesmo processo: entradas invalidadas acumulam-se
+                original = processes[name]
+                for _ in range(rng.randrange(20, 60)):
+                    apply_set(name, _random_update(rng, original))
+                    _check_state(checker, scheduler, model, (today, name))
+                apply_set(name, original)
+            _check_state(checker, scheduler, model, (today, action, name))
+        fired = sorted((a["process"], a["milestone"], a["due_date"], a["alert_date"], a["business_days_left"])
+                       for a in scheduler.run_pending(today))
+        expected = model.run_pending(today)
+        checker.check("disparo", fired == expected, (today, fired, expected))
+    checker.check("remocao", set(scheduler._processes) == set(model.processes),
+                  (sorted(scheduler._processes), sorted(model.processes)))
+
+
+def _registry_dates(scheduler):
+    return {name: dict(tracked.dates) for name, tracked in scheduler._processes.items()}
+
+
+def _expected_dates(registry):
+    return {p["name"]: _due_dates(p, engine.get_business_calendar(p.get("municipality"), p.get("tolerance") or ()))
+            for p in registry.processes()}
+
+
+def resync(rng, checker, path):
+    """Escritas por uma ligação ao registo; o agendador lê por outra e tem de as ver."""
+    writer, reader = ProcessRegistry(path), ProcessRegistry(path)
+    try:
+        day0 = date(2020, 1, 1) + timedelta(days=rng.randrange(7000))
+        scheduler = AlertScheduler(_NullSink(), today=lambda: day0)
+        checker.check("ressincronizacao", scheduler.sync_if_changed(reader), "primeira sincronização")
+        names = []
+        for step in range(rng.randrange(3, 12)):
+            before = reader.version()
+            choice = rng.random()
+            if names and choice < 0.25:
+                name = names.pop(rng.randrange(len(names)))
+                writer.delete_process(name)
+            else:
+                if names and choice < 0.6:
+                    name = rng.choice(names)  # atualização (outras suspensões)
+                else:
+                    name = f"R{step}"
+                    names.append(name)
+                process = _random_process(rng, day0)
+                municipality, tolerance = process["calendar"]
+                writer.save_process(name, process["start_date"], process["regime"], process["suspensions"],
+                                    pea_date=process["pea_date"], municipality=municipality, tolerance=tolerance)
+            checker.check("versao_registo", reader.version() != before, (step, before, reader.version()))
+            checker.check("ressincronizacao", scheduler.sync_if_changed(reader), (step, "escrita não vista"))
+            checker.check("ressincronizacao", _registry_dates(scheduler) == _expected_dates(writer),
+                          (step, _registry_dates(scheduler), _expected_dates(writer)))
+            checker.check("ressincronizacao", not scheduler.sync_if_changed(reader), (step, "sincronização sem escritas"))
+        for name in names:
+            writer.delete_process(name)
+        scheduler.sync_if_changed(reader)
+        checker.check("ressincronizacao", len(scheduler) == 0 and not scheduler._processes,
+                      ("registo vazio", len(scheduler)))
+    finally:
+        writer.close()
+        reader.close()
+
+
+def run(cases, seed, first_year, last_year):
+    rng = random.Random(seed)
+    checker = Checker()
+    for _ in range(cases):
+        simulate(rng, checker, first_year, last_year)
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(max(1, cases // 10)):
+            resync(rng, checker, os.path.join(tmp, f"registo_{i}.sqlite3"))
+    return checker
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=None, help="Semente (por defeito, aleatória)")
+    parser.add_argument("--first-year", type=int, default=1990)
+    parser.add_argument("--last-year", type=int, default=2060)
+    args = parser.parse_args(argv)
+
+    seed = args.seed if args.seed is not None else random.randrange(2 ** 32)
+    checker = run(args.cases, seed, args.first_year, args.last_year)
+    for name in sorted(checker.cases):
+        print(f"{name:<22} {checker.cases[name]:>7} casos  {checker.failures.get(name, 0):>5} falhas")
+    print(f"semente: {seed}")
+    record("alert_checks", {"seed": seed, "cases": checker.cases, "failures": checker.failures})
+    return 1 if checker.failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
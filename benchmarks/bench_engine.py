@@ -0,0 +1,134 @@
+"""Benchmarks do motor de prazos: motor atual contra a implementação de referência.
+
+Varre horizontes (dias úteis), número de suspensões, os dois regimes, com e sem
+PEA e tamanhos de carteira. Os tempos ficam em benchmarks/results/engine.jsonl e
+são comparados com a execução anterior para assinalar regressões.
+
+Uso: python -m benchmarks.bench_engine [--quick] [--repeat N] [--no-reference]
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+import engine
+from benchmarks import reference
+from benchmarks._results import compare, record
+from benchmarks.differential import random_process
+
+START = date(2025, 3, 3)
+HORIZONS = [10, 50, 150, 500, 2000]
+SUSPENSION_COUNTS = [0, 1, 10, 100, 500]
+PORTFOLIO_SIZES = [100, 1000, 10000]
+
+
+def best_of(fn, repeat):
+    """Melhor tempo (s) de `repeat` execuções de fn()."""
+    best = None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - t
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def spread_suspensions(count, start, span_days, seed=0):
+    """`count` suspensões curtas distribuídas pelos primeiros span_days dias após start."""
+    rng = random.Random(seed)
+    suspensions = []
+    for _ in range(count):
+        s = start + timedelta(days=rng.randrange(1, max(span_days, 2)))
+        suspensions.append({'start': s, 'end': s + timedelta(days=rng.randrange(0, 5))})
+    return suspensions
+
+
+def bench_deadlines(horizons, counts, repeat, with_reference):
+    metrics = {}
+    calendar = engine.get_business_calendar()
+    calendar.extend_to(date(START.year + 20, 12, 31))  # mede os saltos, não o carregamento de feriados
+    ref_holidays = reference.get_holidays_range(START.year, START.year + 20)
+    for horizon in horizons:
+        span = horizon * 7 // 5
+        for count in counts:
+            suspensions = spread_suspensions(count, START, span)
+            key = f"deadline_h{horizon}_s{count}"
+            metrics[f"{key}_engine_s"] = best_of(
+                lambda: engine.calculate_deadline_rigorous(START, horizon, suspensions, calendar), repeat)
+            if with_reference:
+                metrics[f"{key}_reference_s"] = best_of(
+                    lambda: reference.calculate_deadline_rigorous(START, horizon, suspensions, ref_holidays), repeat)
+    return metrics
+
+
+def bench_workflow(counts, repeat, with_reference):
+    metrics = {}
+    for regime in (150, 90):
+        config = engine.MILESTONES_DEFAULTS[regime]
+        for with_pea in (False, True):
+            pea_date = START + timedelta(days=20) if with_pea else None
+            for count in counts:
+                suspensions = spread_suspensions(count, START, 300)
+                key = f"workflow_r{regime}_{'pea' if with_pea else 'nopea'}_s{count}"
+                metrics[f"{key}_engine_s"] = best_of(
+                    lambda: engine.calculate_workflow(START, suspensions, config, pea_date), repeat)
+                if with_reference:
+                    metrics[f"{key}_reference_s"] = best_of(
+                        lambda: reference.calculate_workflow(START, suspensions, config, pea_date), repeat)
+    return metrics
+
+
+def bench_portfolio(sizes, repeat):
+    metrics = {}
+    try:
+        import portfolio
+    except ImportError:
+        return metrics
+    rng = random.Random(0)
+    for size in sizes:
+        processes = [random_process(rng, 2020, 2030) for _ in range(size)]
+
+        def loop():
+            for p in processes:
+                engine.calculate_workflow(p["start_date"], p["suspensions"],
+                                          engine.MILESTONES_DEFAULTS[p["regime"]], p["pea_date"])
+
+        metrics[f"portfolio_n{size}_loop_s"] = best_of(loop, repeat)
+        metrics[f"portfolio_n{size}_numpy_s"] = best_of(lambda: portfolio.calculate_portfolio(processes), repeat)
+    return metrics
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="Varrimento reduzido")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--no-reference", action="store_true", help="Não medir a implementação de referência")
+    args = parser.parse_args(argv)
+
+    horizons = HORIZONS[:3] if args.quick else HORIZONS
+    counts = SUSPENSION_COUNTS[:3] if args.quick else SUSPENSION_COUNTS
+    sizes = PORTFOLIO_SIZES[:2] if args.quick else PORTFOLIO_SIZES
+    with_reference = not args.no_reference
+
+    metrics = {}
+    metrics.update(bench_deadlines(horizons, counts, args.repeat, with_reference))
+    metrics.update(bench_workflow(counts, args.repeat, with_reference))
+    metrics.update(bench_portfolio(sizes, max(1, args.repeat // 2)))
+    metrics = {name: round(value, 6) for name, value in metrics.items()}
+
+    for name, value in metrics.items():
+        line = f"{name:<44} {value * 1000:10.3f} ms"
+        ref = metrics.get(name.replace("_engine_s", "_reference_s")) if name.endswith("_engine_s") else None
+        if ref:
+            line += f"  (x{ref / value:.1f} vs referência)"
+        if name.endswith("_reference_s"):
+            continue
+        print(line)
+
+    previous = record("engine", metrics)
+    for name, (old, new) in compare(metrics, previous).items():
+        print(f"REGRESSÃO {name}: {old * 1000:.3f} ms -> {new * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
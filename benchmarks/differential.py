@@ -0,0 +1,262 @@
+"""Testes diferenciais: cada caminho rápido contra a implementação de referência.
+
+Gera casos aleatórios (com semente, para serem reproduzíveis) ao longo de
+décadas de datas e compara resultado a resultado. Sai com código 1 se houver
+divergências; o resumo fica em benchmarks/results/differential.jsonl.
+
+Uso: python -m benchmarks.differential [--cases N] [--seed S] [--first-year A] [--last-year B]
+"""
+import argparse
+import random
+import sys
+from datetime import date, timedelta
+
+import engine
+from benchmarks import reference
+from benchmarks._results import record
+
+HORIZON_YEARS = 10  # calendário de referência largo, para comparar com o calendário sem horizonte
+
+
+def random_suspensions(rng, start, count, spread=400, max_len=90):
+    """Suspensões aleatórias (podem sobrepor-se e vir desordenadas) perto de start."""
+    suspensions = []
+    for _ in range(count):
+        s = start + timedelta(days=rng.randrange(-30, spread))
+        suspensions.append({'start': s, 'end': s + timedelta(days=rng.randrange(0, max_len))})
+    return suspensions
+
+
+def random_process(rng, first_year, last_year, max_susp=8):
+    """Processo aleatório no formato de calculate_portfolio."""
+    start = date(first_year, 1, 1) + timedelta(days=rng.randrange((date(last_year, 12, 31) - date(first_year, 1, 1)).days))
+    regime = rng.choice([150, 90])
+    return {
+        "start_date": start,
+        "regime": regime,
+        "pea_date": start + timedelta(days=rng.randrange(0, 45)) if rng.random() < 0.4 else None,
+        "suspensions": random_suspensions(rng, start, rng.choice([0, 0, 1, 2, 3, rng.randrange(0, max_susp + 1)])),
+    }
+
+
+def random_calendar(rng):
+    """Concelho e tolerâncias aleatórios (metade das vezes, só o calendário nacional)."""
+    if rng.random() < 0.5:
+        return None, ()
+    municipality = rng.choice([None] + sorted(engine.MUNICIPAL_HOLIDAYS))
+    return municipality, tuple(t for t in sorted(engine.TOLERANCE_DAYS) if rng.random() < 0.3)
+
+
+def local_holidays(municipality, tolerance, first_year, last_year):
+    """Feriados municipais e tolerâncias de [first_year, last_year], com a Páscoa da fórmula independente."""
+    rules = ([engine.MUNICIPAL_HOLIDAYS[municipality]] if municipality else []) + [engine.TOLERANCE_DAYS[t] for t in tolerance]
+    days = set()
+    for year in range(first_year, last_year + 1):
+        for rule in rules:
+            if isinstance(rule, int):
+                days.add(reference.get_easter_date_meeus(year) + timedelta(days=rule))
+            else:
+                days.add(date(year, *rule))
+    return days
+
+
+def _rejects(fn, *args):
+    try:
+        fn(*args)
+    except ValueError:
+        return True
+    return False
+
+
+def _inverted(rng, start):
+    """Suspensão com o fim antes do início."""
+    s = start + timedelta(days=rng.randrange(0, 300))
+    return {'start': s, 'end': s - timedelta(days=rng.randrange(1, 30))}
+
+
+def _union_days(suspensions):
+    days = set()
+    for s in suspensions:
+        d = s['start']
+        while d <= s['end']:
+            days.add(d)
+            d += timedelta(days=1)
+    return len(days)
+
+
+class Checker:
+    def __init__(self, verbose=3):
+        self.cases = {}
+        self.failures = {}
+        self.verbose = verbose
+
+    def check(self, name, ok, detail):
+        self.cases[name] = self.cases.get(name, 0) + 1
+        if not ok:
+            self.failures[name] = self.failures.get(name, 0) + 1
+            if self.failures[name] <= self.verbose:
+                print(f"FALHA {name}: {detail}", file=sys.stderr)
+
+
+def run(cases, seed, first_year, last_year):
+    rng = random.Random(seed)
+    checker = Checker()
+    calendar = engine.get_business_calendar()
+    # Índice só em memória, para comparar com o do ficheiro em mmap (se estiver ativo)
+    in_memory = engine.BusinessCalendar()
+    # (consultas inversas recuam até ~2 anos antes do primeiro início)
+    ref_holidays = reference.get_holidays_range(first_year - 3, last_year + HORIZON_YEARS)
+
+    # Páscoa: algoritmo do motor contra uma fórmula independente
+    for year in range(max(first_year, 1583), last_year + 1):
+        checker.check("easter", engine.get_easter_date(year) == reference.get_easter_date_meeus(year), year)
+
+    for _ in range(cases):
+        process = random_process(rng, first_year, last_year)
+        start, suspensions = process["start_date"], process["suspensions"]
+        n = rng.randrange(0, 400)
+
+        # Índice de dias úteis
+        got = engine.add_business_days(start, n, calendar)
+        checker.check("add_business_days", got == reference.add_business_days(start, n, ref_holidays), (start, n))
+        # Recuo: n-ésimo dia útil antes (datas dos alertas), contra a contagem da referência
+        got = calendar.subtract_business_days(start, n)
+        ok = got == start if n == 0 else (
+            reference.is_business_day(got, ref_holidays) and got < start
+            and sum(1 for k in range((start - got).days) if reference.is_business_day(got + timedelta(days=k), ref_holidays)) == n)
+        checker.check("subtract_business_days", ok, (start, n))
+        other = start + timedelta(days=rng.randrange(-30, 600))
+        expected = sum(1 for k in range(1, (other - start).days + 1)
+                       if reference.is_business_day(start + timedelta(days=k), ref_holidays))
+        checker.check("business_days_between", calendar.business_days_between(start, other) == expected, (start, other))
+        checker.check("calendar_memory", calendar.business_days_between(start, other) == in_memory.business_days_between(start, other)
+                      and calendar.add_business_days(start, n) == in_memory.add_business_days(start, n), (start, other, n))
+
+        # Prazo com suspensões (salto de blocos) e registo diário
+        got = engine.calculate_deadline_rigorous(start, n, suspensions, calendar)
+        ref = reference.calculate_deadline_rigorous(start, n, suspensions, ref_holidays)
+        checker.check("deadline", got == ref, (start, n, suspensions))
+        if rng.random() < 0.2:
+            got_date, got_log = engine.calculate_deadline_rigorous(start, n, suspensions, calendar, return_log=True)
+            ref_date, ref_log = reference.calculate_deadline_rigorous(start, n, suspensions, ref_holidays, return_log=True)
+            checker.check("deadline_log", got_date == ref_date and list(got_log) == ref_log, (start, n, suspensions))
+
+        # Vários alvos numa só passagem
+        targets = [rng.randrange(0, 300) for _ in range(rng.randrange(1, 7))]
+        got = engine.calculate_deadlines(start, targets, suspensions, calendar)
+        ref = {t: reference.calculate_deadline_rigorous(start, t, suspensions, ref_holidays) for t in targets}
+        checker.check("multi_target", got == ref, (start, targets, suspensions))
+
+        # Conjunto de suspensões
+        susp_set = engine.SuspensionSet(suspensions)
+        probe = start + timedelta(days=rng.randrange(-40, 450))
+        checker.check("suspension_member", (probe in susp_set) == reference.is_suspended(probe, suspensions), (probe, suspensions))
+        checker.check("suspension_total", susp_set.total_days == _union_days(suspensions), suspensions)
+
+        # Workflow completo
+        config = engine.MILESTONES_DEFAULTS[process["regime"]]
+        got = engine.calculate_workflow(start, suspensions, config, process["pea_date"])
+        ref = reference.calculate_workflow(start, suspensions, config, process["pea_date"], horizon_years=HORIZON_YEARS)
+        same = got[0] == ref[0] and got[1] == ref[1] and got[4] == ref[4] and list(got[3]) == ref[3]
+        checker.check("workflow", same, process)
+
+        # Suspensão invertida: rejeitada com ValueError (não ignorada em silêncio)
+        if rng.random() < 0.1:
+            bad = suspensions + [_inverted(rng, start)]
+            ok = (_rejects(engine.SuspensionSet, bad)
+                  and _rejects(engine.calculate_deadline_rigorous, start, n, bad, calendar)
+                  and _rejects(engine.calculate_workflow, start, bad, config, process["pea_date"]))
+            checker.check("inverted_suspension", ok, bad)
+
+        # Workflow com calendário municipal (feriado do concelho e tolerâncias de ponto)
+        municipality, tolerance = random_calendar(rng)
+        if municipality or tolerance:
+            extra = local_holidays(municipality, tolerance, start.year, start.year + HORIZON_YEARS)
+            got = engine.calculate_workflow(start, suspensions, config, process["pea_date"],
+                                            engine.get_business_calendar(municipality, tolerance))
+            ref = reference.calculate_workflow(start, suspensions, config, process["pea_date"],
+                                               horizon_years=HORIZON_YEARS, extra_holidays=extra)
+            same = got[0] == ref[0] and got[1] == ref[1] and got[4] == ref[4] and list(got[3]) == ref[3]
+            checker.check("municipal_workflow", same, (municipality, tolerance, process))
+
+        # Recálculo incremental: sequência de alterações às suspensões e ao PEA
+        workflow = engine.IncrementalWorkflow()
+        current, pea_date = list(suspensions), process["pea_date"]
+        for step in range(4):
+            if step and current and rng.random() < 0.4:
+                current.pop(rng.randrange(len(current)))
+            elif step:
+                current += random_suspensions(rng, start, 1)
+            if step and rng.random() < 0.2:
+                pea_date = None if pea_date else start + timedelta(days=rng.randrange(0, 45))
+            got = workflow.update(start, current, config, pea_date)
+            ref = engine.calculate_workflow(start, current, config, pea_date)
+            same = got[:3] == ref[:3] and got[4] == ref[4] and list(got[3]) == list(ref[3])
+            checker.check("incremental", same, (start, current, pea_date, workflow.reused))
+
+        # Consultas inversas: x cumpre, x + 1 já não
+        target = start + timedelta(days=rng.randrange(30, 500))
+        latest = engine.latest_start_date(target, n, suspensions, calendar)
+        if latest is not None:
+            ok = (reference.calculate_deadline_rigorous(latest, n, suspensions, ref_holidays) <= target
+                  and reference.calculate_deadline_rigorous(latest + timedelta(days=1), n, suspensions, ref_holidays) > target)
+            checker.check("latest_start", ok, (target, n, suspensions))
+
+    # Motor de carteira (vetorizado), linha a linha
+    try:
+        import portfolio
+    except ImportError:
+        portfolio = None
+    if portfolio is not None:
+        processes = [random_process(rng, first_year, last_year) for _ in range(cases)]
+        # Carteira com vários calendários (agrupada por concelho dentro do motor)
+        for process in processes:
+            process["municipality"], process["tolerance"] = random_calendar(rng)
+            # Prazos configurados longos (anos): o calendário NumPy tem de cobrir a cadeia inteira
+            if rng.random() < 0.2:
+                scale = rng.choice([2, 4, 8])
+                process["milestones_config"] = {k: v * scale for k, v in engine.MILESTONES_DEFAULTS[process["regime"]].items()}
+        columns = portfolio.calculate_portfolio(processes)
+        main_keys = ["reuniao", "conformidade", "ptf", "audiencia", "dia"]
+        comp_keys = ["conf_teorica", "conf_real", "cp_start", "cp_end", "pareceres_externos", "relatorio_cp", "visita", "setoriais"]
+        for i, process in enumerate(processes):
+            ref = reference.calculate_workflow(process["start_date"], process["suspensions"],
+                                               process.get("milestones_config") or engine.MILESTONES_DEFAULTS[process["regime"]],
+                                               process["pea_date"],
+                                               horizon_years=HORIZON_YEARS,
+                                               extra_holidays=local_holidays(process["municipality"], process["tolerance"],
+                                                                             process["start_date"].year,
+                                                                             process["start_date"].year + HORIZON_YEARS))
+            got_main = [columns[k][i].astype(object) for k in main_keys]
+            got_comp = [columns[k][i].astype(object) for k in comp_keys]
+            same = got_main == [m["Data Prevista"] for m in ref[0]] and got_comp == [c["Data"] for c in ref[1]]
+            checker.check("portfolio", same, process)
+        for process in processes[:max(1, cases // 10)]:
+            bad = process["suspensions"] + [_inverted(rng, process["start_date"])]
+            text = ";".join(f"{s['start']}:{s['end']}" for s in bad)
+            ok = (_rejects(portfolio.calculate_portfolio, [dict(process, suspensions=bad)])
+                  and _rejects(portfolio.normalize_process, dict(process, suspensions=text)))
+            checker.check("inverted_suspension", ok, bad)
+
+    return checker
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=None, help="Semente (por defeito, aleatória)")
+    parser.add_argument("--first-year", type=int, default=1960)
+    parser.add_argument("--last-year", type=int, default=2080)
+    args = parser.parse_args(argv)
+
+    seed = args.seed if args.seed is not None else random.randrange(2 ** 32)
+    checker = run(args.cases, seed, args.first_year, args.last_year)
+    for name in sorted(checker.cases):
+        print(f"{name:<22} {checker.cases[name]:>7} casos  {checker.failures.get(name, 0):>5} falhas")
+    print(f"semente: {seed}")
+    record("differential", {"seed": seed, "cases": checker.cases, "failures": checker.failures})
+    return 1 if checker.failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
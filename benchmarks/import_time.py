@@ -0,0 +1,87 @@
+"""Tempo de importação dos módulos sem interface (cada medição num interpretador novo).
+
+Mede também o arranque a frio do calendário nacional (1990-2060): com o
+ficheiro em mmap e só em memória (AIA_CALENDAR_FILE="").
+
+Uso: python -m benchmarks.import_time [--runs N]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks._results import compare, record
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ["engine", "portfolio", "report"]
+HEAVY = ["streamlit", "pandas", "plotly", "matplotlib", "fpdf"]
+
+_PROBE = """
+import json, sys, time
+t = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - t
+print(json.dumps({{"seconds": elapsed, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+_CALENDAR_PROBE = """
+import json, time
+from datetime import date
+import engine
+t = time.perf_counter()
+calendar = engine.get_business_calendar()
+calendar.extend_to(date(1990, 1, 1))
+calendar.extend_to(date(2060, 12, 31))
+print(json.dumps({"seconds": time.perf_counter() - t}))
+"""
+
+
+def measure_calendar(runs, calendar_file=None):
+    """Melhor tempo (s) do primeiro calendário nacional; calendar_file="" desliga o ficheiro."""
+    env = dict(os.environ)
+    if calendar_file is not None:
+        env["AIA_CALENDAR_FILE"] = calendar_file
+    best = None
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", _CALENDAR_PROBE], capture_output=True, text=True,
+                             cwd=ROOT, env=env, check=True)
+        seconds = json.loads(out.stdout)["seconds"]
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+def measure(module, runs):
+    """Melhor tempo (s) de `import module` em `runs` interpretadores e módulos pesados carregados."""
+    best, heavy = None, []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", _PROBE.format(module=module, heavy=HEAVY)],
+                             capture_output=True, text=True, cwd=ROOT, check=True)
+        result = json.loads(out.stdout)
+        best = result["seconds"] if best is None else min(best, result["seconds"])
+        heavy = result["heavy"]
+    return best, heavy
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    metrics = {}
+    for module in MODULES:
+        seconds, heavy = measure(module, args.runs)
+        metrics[f"import_{module}_s"] = round(seconds, 6)
+        print(f"{module:<10} {seconds * 1000:8.2f} ms  pesados: {', '.join(heavy) or '-'}")
+    for label, calendar_file in (("mmap", None), ("memoria", "")):
+        seconds = measure_calendar(args.runs, calendar_file)
+        metrics[f"calendar_{label}_s"] = round(seconds, 6)
+        print(f"calendário ({label}) {seconds * 1000:8.2f} ms")
+
+    previous = record("import_time", metrics)
+    for name, (old, new) in compare(metrics, previous).items():
+        print(f"REGRESSÃO {name}: {old * 1000:.2f} ms -> {new * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
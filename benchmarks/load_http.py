@@ -0,0 +1,155 @@
+"""Gerador de carga local para o serviço HTTP (server.py).
+
+Abre `--concurrency` ligações keep-alive e envia pedidos a /workflow (um
+processo) ou /batch (lotes de `--batch-size`), medindo débito e latências.
+Com --spawn arranca o próprio servidor numa porta livre. Os resultados ficam
+em benchmarks/results/load_http.jsonl.
+
+Uso: python -m benchmarks.load_http [--spawn] [--endpoint workflow|batch] [--requests N] [--concurrency C]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+from benchmarks._results import compare, record
+from benchmarks.differential import random_process
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _payload(process):
+    return {
+        "start_date": process["start_date"].isoformat(), "regime": process["regime"],
+        "pea_date": process["pea_date"].isoformat() if process["pea_date"] else None,
+        "suspensions": [{"start": s["start"].isoformat(), "end": s["end"].isoformat()} for s in process["suspensions"]],
+    }
+
+
+def make_bodies(endpoint, count, batch_size, seed=0):
+    """Corpos JSON (bytes) dos pedidos, gerados antes da medição (reutilizados em ciclo)."""
+    rng = random.Random(seed)
+    bodies = []
+    for _ in range(min(count, 200)):
+        if endpoint == "batch":
+            body = {"processes": [_payload(random_process(rng, 2020, 2030)) for _ in range(batch_size)]}
+        else:
+            body = _payload(random_process(rng, 2020, 2030))
+        bodies.append(json.dumps(body).encode("utf-8"))
+    return bodies
+
+
+async def _client(host, port, path, bodies, pending, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while pending[0] > 0:
+            pending[0] -= 1
+            body = bodies[pending[0] % len(bodies)]
+            request = (f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                       f"Content-Length: {len(body)}\r\n\r\n").encode("latin-1") + body
+            t = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            status = int((await reader.readline()).split()[1])
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b""):
+                    break
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":")[1])
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - t)
+            if status != 200:
+                errors[0] += 1
+    finally:
+        writer.close()
+
+
+async def run_load(host, port, endpoint, requests, concurrency, bodies):
+    """Envia `requests` pedidos por `concurrency` ligações; devolve (segundos, latências ordenadas, erros)."""
+    pending, latencies, errors = [requests], [], [0]
+    t_start = time.perf_counter()
+    await asyncio.gather(*(_client(host, port, f"/{endpoint}", bodies, pending, latencies, errors)
+                           for _ in range(concurrency)))
+    return time.perf_counter() - t_start, sorted(latencies), errors[0]
+
+
+def _percentile(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p / 100))]
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for(host, port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Servidor não respondeu em {host}:{port}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--spawn", action="store_true", help="Arranca server.py numa porta livre")
+    parser.add_argument("--workers", type=int, default=None, help="Workers do servidor arrancado com --spawn")
+    parser.add_argument("--endpoint", choices=["workflow", "batch"], default="workflow")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.spawn:
+        args.port = _free_port()
+        cmd = [sys.executable, os.path.join(ROOT, "server.py"), "--host", args.host, "--port", str(args.port)]
+        if args.workers:
+            cmd += ["--workers", str(args.workers)]
+        server = subprocess.Popen(cmd, cwd=ROOT, stderr=subprocess.DEVNULL)
+    try:
+        _wait_for(args.host, args.port)
+        bodies = make_bodies(args.endpoint, args.requests, args.batch_size)
+        elapsed, latencies, errors = asyncio.run(
+            run_load(args.host, args.port, args.endpoint, args.requests, args.concurrency, bodies))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    suite = f"{args.endpoint}_c{args.concurrency}" + (f"_b{args.batch_size}" if args.endpoint == "batch" else "")
+    metrics = {
+        f"{suite}_rps": round(len(latencies) / elapsed, 1),
+        f"{suite}_p50_s": round(_percentile(latencies, 50), 6),
+        f"{suite}_p95_s": round(_percentile(latencies, 95), 6),
+        f"{suite}_p99_s": round(_percentile(latencies, 99), 6),
+        f"{suite}_errors": errors,
+    }
+    processes = len(latencies) * (args.batch_size if args.endpoint == "batch" else 1)
+    print(f"{len(latencies)} pedidos em {elapsed:.2f} s: {metrics[f'{suite}_rps']} pedidos/s, "
+          f"{processes / elapsed:.0f} processos/s, erros: {errors}")
+    print(f"latência p50 {metrics[f'{suite}_p50_s'] * 1000:.2f} ms · p95 {metrics[f'{suite}_p95_s'] * 1000:.2f} ms"
+          f" · p99 {metrics[f'{suite}_p99_s'] * 1000:.2f} ms")
+
+    previous = record("load_http", metrics)
+    # Só as latências contam como regressão (o débito sobe quando melhora)
+    latency = {name: value for name, value in metrics.items() if name.endswith("_s")}
+    for name, (old, new) in compare(latency, previous).items():
+        print(f"REGRESSÃO {name}: {old * 1000:.2f} ms -> {new * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""Implementação de referência: o motor dia-a-dia original, sem otimizações.
+
+Serve de oráculo para os testes diferenciais e de base de comparação nos
+benchmarks. Não alterar: qualquer caminho rápido tem de reproduzir estes
+resultados. A única adição é o parâmetro ``horizon_years`` de
+calculate_workflow (por defeito 2, como no original), para comparar com o
+calendário sem horizonte fixo.
+"""
+from datetime import date, timedelta
+
+
+def get_easter_date(year):
+    """Calcula o Domingo de Páscoa para qualquer ano (Algoritmo de Butcher)."""
+    a = year % 19
+    b = year // 100
+    c = year % 100
+    d = b // 4
+    e = b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i = c // 4
+    k = c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month = (h + l - 7 * m + 114) // 31
+    day = ((h + l - 7 * m + 114) % 31) + 1
+    return date(year, month, day)
+
+def get_holidays_for_year(year):
+    """Gera a lista de Feriados Nacionais para um ano (Sem Carnaval)."""
+    holidays = set()
+    
+    # Feriados Fixos (Portugal)
+    fixed_dates = [
+        (1, 1),   # Ano Novo
+        (4, 25),  # Dia da Liberdade
+        (5, 1),   # Dia do Trabalhador
+        (6, 10),  # Dia de Portugal
+        (8, 15),  # Assunção de Nossa Senhora
+        (10, 5),  # Implantação da República
+        (11, 1),  # Dia de Todos os Santos
+        (12, 1),  # Restauração da Independência
+        (12, 8),  # Imaculada Conceição
+        (12, 25)  # Natal
+    ]
+    for m, d in fixed_dates:
+        holidays.add(date(year, m, d))
+        
+    # Feriados Móveis
+    easter = get_easter_date(year)
+    good_friday = easter - timedelta(days=2)     # Sexta-Feira Santa
+    corpus_christi = easter + timedelta(days=60) # Corpo de Deus
+    
+    holidays.add(good_friday)
+    holidays.add(corpus_christi)
+    
+    # NOTA: O Carnaval NÃO é feriado nacional obrigatório e foi removido 
+    # para bater certo com a contagem do Excel da CCDR.
+    
+    return holidays
+
+def get_holidays_range(start_year, end_year):
+    """Gera feriados para um intervalo de anos."""
+    all_holidays = set()
+    for y in range(start_year, end_year + 1):
+        all_holidays.update(get_holidays_for_year(y))
+    return all_holidays
+
+
+def get_easter_date_meeus(year):
+    """Páscoa pelo algoritmo de Meeus/Jones/Butcher na forma de Gauss (verificação independente)."""
+    a = year % 4
+    b = year % 7
+    c = year % 19
+    k = year // 100
+    p = (13 + 8 * k) // 25
+    q = k // 4
+    m = (15 - p + k - q) % 30
+    n = (4 + k - q) % 7
+    d = (19 * c + m) % 30
+    e = (2 * a + 4 * b + 6 * d + n) % 7
+    day = 22 + d + e
+    # Exceções de Gauss
+    if d == 29 and e == 6:
+        return date(year, 4, 19)
+    if d == 28 and e == 6 and (11 * m + 11) % 30 < 19:
+        return date(year, 4, 18)
+    if day > 31:
+        return date(year, 4, day - 31)
+    return date(year, 3, day)
+
+
+def is_business_day(check_date, holidays_set):
+    if check_date.weekday() >= 5: return False # Sábado=5, Domingo=6
+    if check_date in holidays_set: return False
+    return True
+
+def add_business_days(start_date, num_days, holidays_set):
+    current_date = start_date
+    added_days = 0
+    while added_days < num_days:
+        current_date += timedelta(days=1)
+        if is_business_day(current_date, holidays_set):
+            added_days += 1
+    return current_date
+
+def is_suspended(current_date, suspensions):
+    for s in suspensions:
+        if s['start'] <= current_date <= s['end']:
+            return True
+    return False
+
+def calculate_deadline_rigorous(start_date, target_business_days, suspensions, holidays_set, return_log=False):
+    current_date = start_date
+    days_counted = 0
+    log = []
+    
+    if return_log:
+        log.append({"Data": current_date, "Dia Contado": 0, "Status": "Início"})
+
+    while days_counted < target_business_days:
+        current_date += timedelta(days=1)
+        
+        status = "Util"
+        # 1. Prioridade: Suspensão
+        if is_suspended(current_date, suspensions):
+            status = "Suspenso"
+        # 2. Fim de Semana
+        elif current_date.weekday() >= 5:
+            status = "Fim de Semana"
+        # 3. Feriado
+        elif current_date in holidays_set:
+            status = "Feriado"
+            
+        if status == "Util":
+            days_counted += 1
+            
+        if return_log:
+            log.append({"Data": current_date, "Dia Contado": days_counted if status == "Util" else "-", "Status": status})
+            
+    final_date = current_date
+    
+    # Ajuste CPA: Se terminar em Sábado/Domingo/Feriado, salta para o próximo útil
+    while final_date.weekday() >= 5 or final_date in holidays_set:
+         final_date += timedelta(days=1)
+    
+    if return_log:
+        return final_date, log
+    return final_date
+
+def calculate_workflow(start_date, suspensions, milestones_config, pea_date=None, horizon_years=2, extra_holidays=()):
+    # Gera feriados para o ano atual e seguintes (margem de segurança)
+    holidays_set = get_holidays_range(start_date.year, start_date.year + horizon_years)
+    holidays_set.update(extra_holidays)  # feriados municipais / tolerâncias de ponto (testes diferenciais)
+    
+    results = []
+    log_final = []
+    
+    # Lista de Etapas
+    steps = [
+        ("Data Reunião", milestones_config["reuniao"]),
+        ("Limite Conformidade", milestones_config["conformidade"]),
+        ("Envio PTF à AAIA", milestones_config["ptf"]),
+        ("Audiência de Interessados", milestones_config["audiencia"]),
+        ("Emissão da DIA (Decisão Final)", milestones_config["dia"])
+    ]
+    
+    conf_date_real = None 
+    
+    for nome, dias in steps:
+        final_date = None
+        
+        # --- LÓGICA ESPECIAL: CONFORMIDADE COM PEA ---
+        # Resolve o problema de ter de alterar manualmente "20" para "28".
+        if nome == "Limite Conformidade" and pea_date and suspensions:
+            # 1. Contar dias gastos até ao PEA
+            days_spent = 0
+            # Começa a contar do dia seguinte à instrução
+            temp_date = start_date
+            # Avança até ao dia ANTES do PEA
+            check_date = start_date + timedelta(days=1)
+            while check_date < pea_date:
+                if is_business_day(check_date, holidays_set):
+                    days_spent += 1
+                check_date += timedelta(days=1)
+            
+            # 2. Dias que sobraram dos 20 (ou do valor configurado)
+            remaining_days = dias - days_spent
+            if remaining_days < 0: remaining_days = 0
+            
+            # 3. Aplicar os dias restantes APÓS o fim da suspensão
+            last_susp_end = max([s['end'] for s in suspensions])
+            final_date = calculate_deadline_rigorous(last_susp_end, remaining_days, [], holidays_set)
+            
+            conf_date_real = final_date
+            
+        else:
+            # Cálculo Normal (Matemática Pura)
+            if dias == milestones_config["dia"]: 
+                final_date, log_data = calculate_deadline_rigorous(start_date, dias, suspensions, holidays_set, return_log=True)
+                log_final = log_data
+            else:
+                final_date = calculate_deadline_rigorous(start_date, dias, suspensions, holidays_set)
+            
+            if nome == "Limite Conformidade":
+                conf_date_real = final_date
+            
+        results.append({
+            "Etapa": nome, 
+            "Prazo Legal": f"{dias} dias úteis", 
+            "Data Prevista": final_date
+        })
+
+    # Marcos Complementares
+    complementary = []
+    gantt_data = {}
+    
+    if conf_date_real:
+        cp_duration = milestones_config.get("cp_duration", 30)
+        visit_days = milestones_config.get("visita", 15)
+        sectoral_days = milestones_config.get("setoriais", 75)
+
+        # Cálculos de datas derivadas
+        conf_date_theo = calculate_deadline_rigorous(start_date, milestones_config["conformidade"], [], holidays_set)
+        
+        # Início CP: 5 dias úteis APÓS Conformidade Real
+        cp_start = add_business_days(conf_date_real, 5, holidays_set)
+        
+        # Fim CP
+        cp_end = add_business_days(cp_start, cp_duration, holidays_set)
+        
+        # Pareceres Externos
+        external_ops = add_business_days(cp_start, 23, holidays_set)
+        
+        # Relatório CP
+        cp_report = add_business_days(cp_end, 7, holidays_set)
+        
+        # Visita
+        visit_date = add_business_days(cp_start, visit_days, holidays_set)
+        
+        # Pareceres Setoriais (Conta desde o início, com suspensões)
+        sectoral_date = calculate_deadline_rigorous(start_date, sectoral_days, suspensions, holidays_set)
+        
+        gantt_data = {
+            "cp_start": cp_start,
+            "cp_end": cp_end,
+            "visit": visit_date,
+            "sectoral": sectoral_date
+        }
+        
+        complementary = [
+            {"Etapa": "1. Limite Conformidade (Ref. Teórica)", "Ref": "Sem suspensões", "Data": conf_date_theo},
+            {"Etapa": "1. Limite Conformidade (Real)", "Ref": "Com suspensões", "Data": conf_date_real},
+            {"Etapa": "2. Início Consulta Pública", "Ref": "Conf + 5 dias", "Data": cp_start},
+            {"Etapa": "3. Fim Consulta Pública", "Ref": f"Início CP + {cp_duration} dias", "Data": cp_end},
+            {"Etapa": "4. Data para Pareceres Externos", "Ref": "Início CP + 23 dias", "Data": external_ops},
+            {"Etapa": "5. Envio do Relatório da CP", "Ref": "Fim CP + 7 dias", "Data": cp_report},
+            {"Etapa": "6. Visita Técnica", "Ref": f"Início CP + {visit_days} dias", "Data": visit_date},
+            {"Etapa": "7. Pareceres Setoriais", "Ref": f"Dia {sectoral_days} Global", "Data": sectoral_date},
+        ]
+
+    total_susp = sum([(s['end'] - s['start']).days + 1 for s in suspensions])
+    
+    return results, complementary, total_susp, log_final, gantt_data
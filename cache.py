@@ -0,0 +1,86 @@
+"""Cache de resultados partilhada entre sessões (LRU limitada com TTL)."""
+from collections import OrderedDict
+import hashlib
+import json
+import threading
+import time
+
+from engine import SuspensionSet
+
+
+class TTLCache:
+    """Cache LRU com tamanho máximo e validade (segundos) por entrada.
+
+    Segura para várias threads (o Streamlit serve cada sessão numa thread) e
+    com contadores de acertos/falhas para diagnóstico.
+    """
+
+    def __init__(self, maxsize=256, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """Devolve o valor em cache ou calcula-o (fora do lock) e guarda-o."""
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "size": len(self._data), "maxsize": self.maxsize, "ttl": self.ttl}
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+def workflow_cache_key(start_date, regime, milestones_config, pea_date, suspensions, calendar=None):
+    """Chave de conteúdo (SHA-256) das entradas normalizadas de calculate_workflow.
+
+    As suspensões são ordenadas e fundidas, pelo que listas equivalentes (outra
+    ordem, intervalos sobrepostos) partilham a mesma entrada. ``calendar`` é a
+    chave do calendário (engine.calendar_key); o nacional não altera a chave.
+    """
+    if not isinstance(suspensions, SuspensionSet):
+        suspensions = SuspensionSet(suspensions)
+    payload = {
+        "start": start_date.isoformat(),
+        "regime": regime,
+        "config": sorted(milestones_config.items()),
+        "pea": pea_date.isoformat() if pea_date else None,
+        "susp": [(s["start"].isoformat(), s["end"].isoformat()) for s in suspensions],
+    }
+    if calendar and calendar != (None, ()):
+        payload["calendar"] = [calendar[0], list(calendar[1])]
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
@@ -0,0 +1,87 @@
+"""Cálculo de prazos em lote sem interface: carteira CSV/JSON -> JSON Lines, CSV ou calendário ICS.
+
+As linhas são escritas à medida que cada bloco de processos é calculado
+(motor NumPy de carteira), pelo que a saída pode ser consumida por outro
+programa enquanto o cálculo decorre.
+
+Uso: python cli.py carteira.csv [-o saida.jsonl|saida.csv|saida.ics] [--chunk-size N]
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+from portfolio import PORTFOLIO_COLUMNS, iter_portfolio, iter_results
+
+OUTPUT_FIELDS = ["name"] + PORTFOLIO_COLUMNS + ["total_susp"]
+
+
+def write_rows(rows, fh, fmt="jsonl", flush_every=1000):
+    """Escreve as linhas em JSON Lines ou CSV; devolve quantas foram escritas."""
+    count = 0
+    writer = None
+    if fmt == "csv":
+        writer = csv.DictWriter(fh, fieldnames=OUTPUT_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+    for row in rows:
+        if writer is not None:
+            writer.writerow(row)
+        else:
+            fh.write(json.dumps(row, ensure_ascii=False) + "\n")
+        count += 1
+        if count % flush_every == 0:
+            fh.flush()
+    fh.flush()
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prazos AIA em lote para uma carteira de processos.")
+    parser.add_argument("portfolio", help="Carteira em CSV, JSON ou JSON Lines")
+    parser.add_argument("-o", "--output", default="-",
+                        help="Ficheiro de saída (.jsonl, .csv ou .ics; por defeito, stdout)")
+    parser.add_argument("--format", choices=["jsonl", "csv", "ics"], default=None,
+                        help="Formato de saída (por defeito, pela extensão; stdout usa jsonl)")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Processos calculados de cada vez")
+    args = parser.parse_args(argv)
+
+    fmt = args.format
+    if fmt is None:
+        ext = os.path.splitext(args.output)[1].lower()
+        fmt = ext[1:] if ext in (".csv", ".ics") else "jsonl"
+
+    t_start = time.perf_counter()
+    if fmt == "ics":
+        # Calendário: um evento por marco e por suspensão (ics importado só aqui)
+        from ics import iter_portfolio_ics, write_ics
+        parts = iter_portfolio_ics(iter_portfolio(args.portfolio), chunk_size=args.chunk_size)
+        write = lambda fh: write_ics(parts, fh)
+        unit = "eventos"
+    else:
+        rows = iter_results(iter_portfolio(args.portfolio), args.chunk_size)
+        write = lambda fh: write_rows(rows, fh, fmt, args.chunk_size)
+        unit = "processos"
+    try:
+        if args.output == "-":
+            try:
+                total = write(sys.stdout)
+            except BrokenPipeError:
+                # O leitor fechou a saída (ex.: `| head`): termina sem novo erro ao fechar o stdout
+                os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+                return 1
+        else:
+            with open(args.output, "w", encoding="utf-8", newline="") as fh:
+                total = write(fh)
+    except ValueError as e:
+        # Registo inválido na carteira (ex.: sem data de instrução): erro claro em vez de traceback
+        print(f"Erro: {e}", file=sys.stderr)
+        return 1
+    elapsed = time.perf_counter() - t_start
+    print(f"{total} {unit} em {elapsed:.2f} s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
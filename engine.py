@@ -0,0 +1,1156 @@
+"""Motor de cálculo de prazos AIA: feriados, dias úteis, suspensões e workflow.
+
+Não depende do Streamlit nem de bibliotecas pesadas, pelo que pode ser
+importado por processos batch sem carregar a interface.
+"""
+from datetime import date, timedelta
+from array import array
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+import csv
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import threading
+
+from timing import stage
+
+# ==========================================
+# 1. MOTOR DE FERIADOS (DINÂMICO & ETERNO)
+# ==========================================
+
+@lru_cache(maxsize=None)
+def get_easter_date(year):
+    """Calcula o Domingo de Páscoa para qualquer ano (Algoritmo de Butcher)."""
+    a = year % 19
+    b = year // 100
+    c = year % 100
+    d = b // 4
+    e = b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i = c // 4
+    k = c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month = (h + l - 7 * m + 114) // 31
+    day = ((h + l - 7 * m + 114) % 31) + 1
+    return date(year, month, day)
+
+@lru_cache(maxsize=None)
+def get_holidays_for_year(year):
+    """Gera a lista de Feriados Nacionais para um ano (Sem Carnaval). Memoizado por ano."""
+    holidays = set()
+    
+    # Feriados Fixos (Portugal)
+    fixed_dates = [
+        (1, 1),   # Ano Novo
+        (4, 25),  # Dia da Liberdade
+        (5, 1),   # Dia do Trabalhador
+        (6, 10),  # Dia de Portugal
+        (8, 15),  # Assunção de Nossa Senhora
+        (10, 5),  # Implantação da República
+        (11, 1),  # Dia de Todos os Santos
+        (12, 1),  # Restauração da Independência
+        (12, 8),  # Imaculada Conceição
+        (12, 25)  # Natal
+    ]
+    for m, d in fixed_dates:
+        holidays.add(date(year, m, d))
+        
+    # Feriados Móveis
+    easter = get_easter_date(year)
+    good_friday = easter - timedelta(days=2)     # Sexta-Feira Santa
+    corpus_christi = easter + timedelta(days=60) # Corpo de Deus
+    
+    holidays.add(good_friday)
+    holidays.add(corpus_christi)
+    
+    # NOTA: O Carnaval NÃO é feriado nacional obrigatório e foi removido 
+    # para bater certo com a contagem do Excel da CCDR.
+    
+    return frozenset(holidays)
+
+def get_holidays_range(start_year, end_year):
+    """Gera feriados para um intervalo de anos."""
+    all_holidays = set()
+    with stage("feriados"):
+        for y in range(start_year, end_year + 1):
+            all_holidays.update(get_holidays_for_year(y))
+    return all_holidays
+
+# --- CAMADA MUNICIPAL E TOLERÂNCIAS DE PONTO ---
+
+# Feriado municipal por concelho: (mês, dia) fixo, ou dias a somar ao Domingo de Páscoa.
+# Outros concelhos (ou correções, se a câmara mudar o feriado) com register_municipality().
+MUNICIPAL_HOLIDAYS = {
+    "Abrantes": (6, 14),
+    "Alcobaça": (8, 20),
+    "Aveiro": (5, 12),         # Santa Joana Princesa
+    "Caldas da Rainha": (5, 15),
+    "Castelo Branco": 39,      # Quinta-feira da Ascensão
+    "Coimbra": (7, 4),         # Rainha Santa Isabel
+    "Covilhã": (10, 20),
+    "Figueira da Foz": (6, 24),  # São João
+    "Guarda": (11, 27),
+    "Leiria": (5, 22),
+    "Pombal": (11, 11),
+    "Torres Vedras": (11, 11),  # São Martinho
+    "Viseu": (9, 21),          # São Mateus
+}
+
+# Tolerâncias de ponto habituais (opcionais): nome -> (mês, dia) ou dias face à Páscoa
+TOLERANCE_DAYS = {
+    "Carnaval": -47,
+    "Véspera de Natal": (12, 24),
+    "Véspera de Ano Novo": (12, 31),
+}
+
+def _rule_date(year, rule):
+    if isinstance(rule, int):
+        return get_easter_date(year) + timedelta(days=rule)
+    return date(year, *rule)
+
+def register_municipality(name, rule):
+    """Acrescenta (ou corrige) o feriado municipal de um concelho: (mês, dia) ou dias após a Páscoa."""
+    MUNICIPAL_HOLIDAYS[name] = rule
+    get_local_holidays_for_year.cache_clear()
+    with _CALENDARS_LOCK:
+        for key in [key for key in _CALENDARS if key[0] == name]:
+            del _CALENDARS[key]
+
+@lru_cache(maxsize=None)
+def get_local_holidays_for_year(year, municipality=None, tolerance=()):
+    """Feriados nacionais + feriado municipal + tolerâncias de ponto pedidas, para um ano."""
+    holidays = set(get_holidays_for_year(year))
+    if municipality:
+        if municipality not in MUNICIPAL_HOLIDAYS:
+            raise ValueError(f"Concelho sem feriado municipal registado: {municipality!r}")
+        holidays.add(_rule_date(year, MUNICIPAL_HOLIDAYS[municipality]))
+    for name in tolerance:
+        holidays.add(_rule_date(year, TOLERANCE_DAYS[name]))
+    return frozenset(holidays)
+
+# ==========================================
+# 2. MOTOR DE CÁLCULO
+# ==========================================
+
+# Prazos por defeito (dias úteis) de cada regime
+# 90 dias: Padrões Legais/Excel "Com Suspensão" (20/65/70/60)
+MILESTONES_DEFAULTS = {
+    150: {"reuniao": 9, "conformidade": 30, "ptf": 85, "audiencia": 100, "dia": 150,
+          "visita": 15, "setoriais": 75, "cp_duration": 30},
+    90: {"reuniao": 9, "conformidade": 20, "ptf": 65, "audiencia": 70, "dia": 90,
+         "visita": 15, "setoriais": 60, "cp_duration": 30},
+}
+
+def milestones_for(regime=150, milestones_config=None):
+    """Prazos de um processo: ``milestones_config`` (pode ser parcial) sobre os do regime.
+
+    Cada prazo tem de ser um nº inteiro de dias não negativo e um regime
+    desconhecido só é aceite se o config trouxer todos os prazos (ValueError).
+    """
+    if milestones_config is not None and not isinstance(milestones_config, dict):
+        raise TypeError(f"milestones_config deve ser um objeto {{prazo: dias}}, não {type(milestones_config).__name__}")
+    base = MILESTONES_DEFAULTS.get(regime)
+    config = dict(base or {})
+    config.update(milestones_config or {})
+    if base is None and not config.keys() >= MILESTONES_DEFAULTS[150].keys():
+        raise ValueError(f"Regime desconhecido: {regime}")
+    for key, value in config.items():
+        try:
+            config[key] = int(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Prazo inválido para {key!r}: {value!r}") from None
+        if config[key] < 0:
+            raise ValueError(f"Prazo negativo para {key!r}: {value!r}")
+    return config
+
+class BusinessCalendar:
+    """Índice de dias úteis: contagem acumulada por data (ordinais inteiros).
+
+    Substitui o avanço dia-a-dia por uma consulta à tabela acumulada e uma
+    pesquisa binária. Comporta-se também como conjunto de feriados
+    (``data in calendario``), pelo que pode ser passado onde se espera
+    ``holidays_set``.
+
+    Com um conjunto fixo de ``holidays``, fora dos anos desse conjunto só
+    contam os fins de semana (como no ``holidays_set`` original). Sem ele, os
+    feriados são carregados ano a ano por ``holidays_for_year`` à medida que
+    os cálculos avançam, sem horizonte fixo.
+    """
+
+    def __init__(self, holidays=None, holidays_for_year=get_holidays_for_year):
+        self._lock = threading.RLock()
+        self._years = set()
+        self._frozen = None
+        self._ordinals = None
+        self._mapped = None   # (base, estado por dia, mmap) de um ficheiro de calendário
+        if holidays is not None:
+            self._holidays = set(holidays)
+            self._holidays_for_year = None
+        else:
+            self._holidays = set()
+            self._holidays_for_year = holidays_for_year
+        # _index = (base, cum), com cum[i] = nº de dias úteis em [base, base + i].
+        # Trocado de uma só vez quando o índice recua, para leitores concorrentes.
+        self._index = (None, array('l'))
+        if self._holidays:
+            self._extend_to(date(min(self._holidays).year, 1, 1).toordinal())
+            self._extend_to(date(max(self._holidays).year, 12, 31).toordinal())
+
+    @classmethod
+    def from_mapping(cls, base, cum, status, mapping=None, holidays_for_year=get_holidays_for_year):
+        """Calendário sobre um índice já calculado (ex.: o ficheiro em mmap de load_calendar_file).
+
+        ``cum`` e ``status`` cobrem os mesmos dias a partir do ordinal ``base``
+        (contagem acumulada e bits DAY_* por dia). Fora desse intervalo, o índice
+        cresce como num calendário normal.
+        """
+        calendar = cls(holidays_for_year=holidays_for_year)
+        calendar._index = (base, cum)
+        calendar._mapped = (base, status, mapping)
+        return calendar
+
+    def _load_year(self, year):
+        if self._holidays_for_year is None or year in self._years:
+            return
+        with self._lock:
+            if year not in self._years:
+                with stage("feriados"):
+                    self._holidays.update(self._holidays_for_year(year))
+                self._frozen = self._ordinals = None
+                self._years.add(year)
+
+    def __contains__(self, check_date):
+        if self._mapped is not None:
+            base, status, _ = self._mapped
+            i = check_date.toordinal() - base
+            if 0 <= i < len(status):
+                return bool(status[i] & DAY_HOLIDAY)
+        self._load_year(check_date.year)
+        return check_date in self._holidays
+
+    @property
+    def holidays(self):
+        """Feriados carregados até agora (frozenset)."""
+        if self._frozen is None:
+            self._frozen = frozenset(date.fromordinal(o) for o in self.holiday_ordinals)
+        return self._frozen
+
+    @property
+    def holiday_ordinals(self):
+        """Feriados carregados até agora, como array ordenado de ordinais."""
+        if self._ordinals is None:
+            ordinals = {d.toordinal() for d in self._holidays}
+            if self._mapped is not None:
+                base, status, _ = self._mapped
+                ordinals.update(base + i for i, s in enumerate(status) if s & DAY_HOLIDAY)
+            self._ordinals = array('l', sorted(ordinals))
+        return self._ordinals
+
+    def _is_business_ordinal(self, ordinal):
+        d = date.fromordinal(ordinal)
+        return d.weekday() < 5 and d not in self
+
+    def _extend_to(self, ordinal):
+        """Garante que o índice cobre o ordinal indicado (cresce por anos)."""
+        base, cum = self._index
+        if base is not None and base <= ordinal < base + len(cum):
+            return
+        with self._lock:
+            base, cum = self._index
+            if base is None or ordinal < base:
+                # Reconstrói a partir de 1 de janeiro do ano pedido
+                last = ordinal if base is None else base + len(cum) - 1
+                base = date(date.fromordinal(ordinal).year, 1, 1).toordinal()
+                cum = array('l')
+                self._fill(base, cum, max(ordinal, last))
+                self._index = (base, cum)
+            else:
+                if not isinstance(cum, array):
+                    # Índice só de leitura (ficheiro em mmap): cópia que pode crescer
+                    cum = array('l', cum)
+                self._fill(base, cum, ordinal)
+                self._index = (base, cum)
+
+    def _fill(self, base, cum, ordinal):
+        last = base + len(cum) - 1
+        if ordinal <= last:
+            return
+        end = max(ordinal, date(date.fromordinal(ordinal).year, 12, 31).toordinal())
+        total = cum[-1] if cum else 0
+        for o in range(last + 1, end + 1):
+            if self._is_business_ordinal(o):
+                total += 1
+            cum.append(total)
+
+    def extend_to(self, check_date):
+        """Garante que o índice (e os feriados) cobrem check_date."""
+        self._extend_to(check_date.toordinal())
+
+    def _count_at(self, ordinal):
+        self._extend_to(ordinal)
+        base, cum = self._index
+        return cum[ordinal - base]
+
+    def is_business_day(self, check_date):
+        if self._mapped is not None:
+            base, status, _ = self._mapped
+            i = check_date.toordinal() - base
+            if 0 <= i < len(status):
+                return status[i] == DAY_BUSINESS
+        return check_date.weekday() < 5 and check_date not in self
+
+    def business_days_between(self, start_date, end_date):
+        """Nº de dias úteis em ]start_date, end_date] (0 se o intervalo for vazio)."""
+        if end_date <= start_date:
+            return 0
+        start, end = start_date.toordinal(), end_date.toordinal()
+        # O início primeiro: se o índice recuar, as duas contagens vêm da mesma base
+        self._extend_to(start)
+        self._extend_to(end)
+        base, cum = self._index
+        return cum[end - base] - cum[start - base]
+
+    def add_business_days(self, start_date, num_days):
+        """N-ésimo dia útil após start_date (start_date se num_days <= 0)."""
+        if num_days <= 0:
+            return start_date
+        start = start_date.toordinal()
+        self._extend_to(start)
+        while True:
+            # Contagem e pesquisa sobre o mesmo instantâneo (base, cum): outra thread
+            # pode reconstruir o índice para trás entretanto (e aí a contagem muda)
+            base, cum = self._index
+            target = cum[start - base] + num_days
+            if cum[-1] >= target:
+                break
+            # Garante cobertura suficiente antes da pesquisa binária
+            self._extend_to(base + len(cum) + 365)
+        # O n-ésimo dia útil fica entre n e ~1,4n dias depois: pesquisa só nessa janela
+        # (o índice em mmap cobre três séculos)
+        lo = start - base + num_days
+        hi = min(len(cum), lo + num_days + 30)
+        if cum[hi - 1] < target:
+            hi = len(cum)
+        return date.fromordinal(base + bisect_left(cum, target, lo, hi))
+
+    def subtract_business_days(self, start_date, num_days):
+        """N-ésimo dia útil antes de start_date (start_date se num_days <= 0)."""
+        if num_days <= 0:
+            return start_date
+        end = start_date.toordinal() - 1
+        self._extend_to(end)
+        while True:
+            # Mesmo instantâneo para a contagem e a pesquisa (ver add_business_days)
+            base, cum = self._index
+            # O dia procurado é o primeiro com contagem acumulada igual a target
+            target = cum[end - base] - num_days + 1
+            if target >= 1:
+                break
+            # O índice começa depois do dia procurado: recua (reconstrói desde um ano anterior)
+            self._extend_to(base - num_days * 2 - 30)
+        return date.fromordinal(base + bisect_left(cum, target, 0, end - base + 1))
+
+    def next_business_day(self, check_date):
+        """Ajuste CPA: a própria data se for útil, senão o próximo dia útil."""
+        if self.is_business_day(check_date):
+            return check_date
+        return self.add_business_days(check_date, 1)
+
+# --- CALENDÁRIO EM DISCO (mmap, partilhado entre processos) ---
+
+# Estado de cada dia no ficheiro (bits; um feriado ao fim de semana tem os dois)
+DAY_BUSINESS, DAY_WEEKEND, DAY_HOLIDAY = 0, 1, 2
+
+CALENDAR_FILE_FIRST_YEAR = 1900
+CALENDAR_FILE_LAST_YEAR = 2200
+# Ficheiro do calendário nacional; AIA_CALENDAR_FILE="" desliga-o (índice só em memória)
+DEFAULT_CALENDAR_FILE = os.environ.get(
+    "AIA_CALENDAR_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "calendario_uteis.bin")
+)
+
+# Cabeçalho: assinatura, versão do formato, 1.º ordinal, nº de dias, hash das regras (64 bytes)
+_CALENDAR_MAGIC = b"AIACAL\0\0"
+_CALENDAR_FORMAT = 1
+_CALENDAR_HEADER = struct.Struct("<8sIiI32s12x")
+
+def calendar_rules_hash():
+    """Hash das regras de feriados nacionais (código de get_holidays_for_year e da Páscoa).
+
+    Muda quando as regras mudam (e com a versão do Python ou a ordem dos
+    bytes da máquina), o que obriga a regenerar o ficheiro do calendário.
+    """
+    digest = hashlib.sha256(f"{_CALENDAR_FORMAT}|{sys.byteorder}|{sys.version_info[:2]}".encode())
+    for func in (get_holidays_for_year, get_easter_date):
+        code = func.__wrapped__.__code__
+        digest.update(code.co_code)
+        digest.update(repr((code.co_consts, code.co_names)).encode("utf-8"))
+    return digest.digest()
+
+def build_calendar_file(path=DEFAULT_CALENDAR_FILE, first_year=CALENDAR_FILE_FIRST_YEAR,
+                        last_year=CALENDAR_FILE_LAST_YEAR):
+    """Gera o ficheiro do calendário (escrita atómica: ficheiro temporário + rename).
+
+    Formato: cabeçalho, contagem acumulada de dias úteis por dia (int32,
+    ordem nativa) e o estado de cada dia (bits DAY_*, um byte).
+    """
+    base = date(first_year, 1, 1).toordinal()
+    end = date(last_year, 12, 31).toordinal()
+    status = bytearray(end - base + 1)
+    cum = array('i', bytes(4 * len(status)))
+    total = 0
+    with stage("calendario.gerar"):
+        for year in range(first_year, last_year + 1):
+            for d in get_holidays_for_year(year):
+                status[d.toordinal() - base] = DAY_HOLIDAY
+        for i in range(len(status)):
+            if (base + i) % 7 in (6, 0):   # ordinal % 7: 6 = sábado, 0 = domingo
+                status[i] |= DAY_WEEKEND
+            elif not status[i]:
+                total += 1
+            cum[i] = total
+    header = _CALENDAR_HEADER.pack(_CALENDAR_MAGIC, _CALENDAR_FORMAT, base, len(status), calendar_rules_hash())
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as fh:
+            fh.write(header)
+            fh.write(cum.tobytes())
+            fh.write(status)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return path
+
+def _map_calendar_file(path):
+    """(base, cum, estado, mmap) do ficheiro, ou None se não existir ou estiver desatualizado."""
+    try:
+        with open(path, "rb") as fh:
+            mapping = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        magic, version, base, n_days, rules = _CALENDAR_HEADER.unpack_from(mapping)
+    except struct.error:
+        mapping.close()
+        return None
+    size = _CALENDAR_HEADER.size + 5 * n_days
+    if (magic, version, rules) != (_CALENDAR_MAGIC, _CALENDAR_FORMAT, calendar_rules_hash()) or len(mapping) != size:
+        mapping.close()
+        return None
+    view = memoryview(mapping)
+    cum = view[_CALENDAR_HEADER.size:_CALENDAR_HEADER.size + 4 * n_days].cast('i')
+    status = view[_CALENDAR_HEADER.size + 4 * n_days:]
+    return base, cum, status, mapping
+
+def load_calendar_file(path=DEFAULT_CALENDAR_FILE):
+    """Calendário nacional sobre o ficheiro em mmap (só leitura), gerado se faltar ou estiver desatualizado.
+
+    Todos os processos que abrem o mesmo ficheiro partilham as mesmas páginas
+    de memória. Devolve None se o ficheiro não puder ser lido nem gerado.
+    """
+    with stage("calendario.mmap"):
+        mapped = _map_calendar_file(path)
+        if mapped is None:
+            try:
+                build_calendar_file(path)
+            except OSError:
+                return None
+            mapped = _map_calendar_file(path)
+        if mapped is None:
+            return None
+        return BusinessCalendar.from_mapping(*mapped)
+
+# Calendários partilhados pelo processo, um por (concelho, tolerâncias)
+_CALENDARS = {}
+_CALENDARS_LOCK = threading.Lock()
+
+def calendar_key(municipality=None, tolerance=()):
+    """Chave normalizada de um calendário: (concelho ou None, tolerâncias ordenadas)."""
+    if isinstance(tolerance, str):
+        tolerance = [t.strip() for t in tolerance.split(",")]
+    return (municipality or None, tuple(sorted(set(t for t in tolerance if t))))
+
+def get_business_calendar(municipality=None, tolerance=()):
+    """Calendário partilhado pelo processo (estende-se a pedido).
+
+    Sem argumentos, o calendário nacional. Com concelho e/ou tolerâncias de
+    ponto, um calendário próprio, criado uma vez e partilhado por todos os
+    processos desse concelho.
+    """
+    key = calendar_key(municipality, tolerance)
+    calendar = _CALENDARS.get(key)
+    if calendar is None:
+        municipality, tolerance = key
+        if municipality is not None and municipality not in MUNICIPAL_HOLIDAYS:
+            raise ValueError(f"Concelho sem feriado municipal registado: {municipality!r}")
+        unknown = [t for t in tolerance if t not in TOLERANCE_DAYS]
+        if unknown:
+            raise ValueError(f"Tolerância de ponto desconhecida: {', '.join(unknown)}")
+        with _CALENDARS_LOCK:
+            calendar = _CALENDARS.get(key)
+            if calendar is None:
+                if key != (None, ()):
+                    def holidays_for_year(year):
+                        return get_local_holidays_for_year(year, municipality, tolerance)
+                    calendar = BusinessCalendar(holidays_for_year=holidays_for_year)
+                else:
+                    # Nacional: ficheiro em mmap partilhado entre processos (ou índice em memória)
+                    calendar = (DEFAULT_CALENDAR_FILE and load_calendar_file(DEFAULT_CALENDAR_FILE)) or BusinessCalendar()
+                _CALENDARS[key] = calendar
+    return calendar
+
+def as_business_calendar(holidays_set=None):
+    """BusinessCalendar para um argumento ``holidays_set``: None dá o calendário nacional
+    partilhado; um conjunto de feriados (ex.: de get_holidays_range), mesmo vazio, é
+    embrulhado em BusinessCalendar(holidays=...)."""
+    if holidays_set is None:
+        return get_business_calendar()
+    if isinstance(holidays_set, BusinessCalendar):
+        return holidays_set
+    return BusinessCalendar(holidays=holidays_set)
+
+def is_business_day(check_date, holidays_set):
+    if isinstance(holidays_set, BusinessCalendar):
+        return holidays_set.is_business_day(check_date)
+    if check_date.weekday() >= 5: return False # Sábado=5, Domingo=6
+    if check_date in holidays_set: return False
+    return True
+
+def add_business_days(start_date, num_days, holidays_set):
+    if isinstance(holidays_set, BusinessCalendar):
+        return holidays_set.add_business_days(start_date, num_days)
+    current_date = start_date
+    added_days = 0
+    while added_days < num_days:
+        current_date += timedelta(days=1)
+        if is_business_day(current_date, holidays_set):
+            added_days += 1
+    return current_date
+
+class SuspensionSet:
+    """Suspensões normalizadas: intervalos ordenados e fundidos uma única vez.
+
+    Responde a ``data in suspensoes`` e a "dias suspensos em [a, b]" por
+    pesquisa binária. A iteração devolve dicionários {'start', 'end'}, como a
+    lista original em ``st.session_state``.
+    """
+
+    def __init__(self, suspensions=()):
+        intervals = []
+        for s in suspensions:
+            if s['start'] > s['end']:
+                # Sem significado (o original contava-a com dias negativos): erro em vez de a ignorar
+                raise ValueError(f"Suspensão com fim ({s['end']}) anterior ao início ({s['start']})")
+            intervals.append((s['start'].toordinal(), s['end'].toordinal()))
+        intervals.sort()
+        self._starts = array('l')
+        self._ends = array('l')
+        for s_ord, e_ord in intervals:
+            # Funde intervalos sobrepostos ou contíguos
+            if self._ends and s_ord <= self._ends[-1] + 1:
+                self._ends[-1] = max(self._ends[-1], e_ord)
+            else:
+                self._starts.append(s_ord)
+                self._ends.append(e_ord)
+        # _before[i] = dias suspensos nos blocos anteriores ao bloco i
+        self._before = array('l')
+        total = 0
+        for s_ord, e_ord in zip(self._starts, self._ends):
+            self._before.append(total)
+            total += e_ord - s_ord + 1
+        self.total_days = total
+
+    def __bool__(self):
+        return bool(self._starts)
+
+    def __len__(self):
+        return len(self._starts)
+
+    def __iter__(self):
+        for s_ord, e_ord in zip(self._starts, self._ends):
+            yield {'start': date.fromordinal(s_ord), 'end': date.fromordinal(e_ord)}
+
+    def __contains__(self, check_date):
+        ordinal = check_date.toordinal()
+        i = bisect_right(self._starts, ordinal) - 1
+        return i >= 0 and ordinal <= self._ends[i]
+
+    @property
+    def last_end(self):
+        return date.fromordinal(self._ends[-1]) if self._ends else None
+
+    def _covered_until(self, ordinal):
+        i = bisect_right(self._starts, ordinal) - 1
+        if i < 0:
+            return 0
+        return self._before[i] + min(self._ends[i], ordinal) - self._starts[i] + 1
+
+    def suspended_days(self, start_date, end_date):
+        """Nº de dias suspensos em [start_date, end_date]."""
+        if end_date < start_date:
+            return 0
+        return self._covered_until(end_date.toordinal()) - self._covered_until(start_date.toordinal() - 1)
+
+    def first_difference(self, other):
+        """Primeiro dia suspenso num conjunto e não no outro (None se são iguais)."""
+        # A pertença só muda no início de um bloco ou no dia a seguir ao fim
+        boundaries = sorted(set(self._starts) | set(other._starts)
+                            | {e + 1 for e in self._ends} | {e + 1 for e in other._ends})
+        for ordinal in boundaries:
+            day = date.fromordinal(ordinal)
+            if (day in self) != (day in other):
+                return day
+        return None
+
+    def blocks_after(self, check_date):
+        """Blocos (início, fim) que ainda têm dias depois de check_date."""
+        ordinal = check_date.toordinal()
+        for i in range(bisect_right(self._ends, ordinal), len(self._starts)):
+            yield date.fromordinal(self._starts[i]), date.fromordinal(self._ends[i])
+
+def is_suspended(current_date, suspensions):
+    if isinstance(suspensions, SuspensionSet):
+        return current_date in suspensions
+    for s in suspensions:
+        if s['start'] <= current_date <= s['end']:
+            return True
+    return False
+
+class AuditLog:
+    """Registo diário da contagem de um prazo, guardado em colunas compactas.
+
+    Cada dia ocupa um ordinal (int32), o dia contado (int16, -1 quando não
+    conta) e um código de estado (uint8, índice de STATUSES). Pode ser criado
+    de forma diferida: ``AuditLog(builder)`` só chama ``builder()`` (que devolve
+    outro AuditLog) na primeira consulta. A iteração devolve dicionários
+    {"Data", "Dia Contado", "Status"}, como a lista original.
+    """
+
+    STATUSES = ("Início", "Util", "Suspenso", "Fim de Semana", "Feriado")
+    _CODES = {label: code for code, label in enumerate(STATUSES)}
+
+    def __init__(self, builder=None):
+        self._columns = (array('i'), array('h'), array('B'))
+        self._builder = builder
+
+    def _materialize(self):
+        builder = self._builder
+        if builder is not None:
+            self._columns = builder()._columns
+            self._builder = None
+        return self._columns
+
+    def append(self, check_date, counter, status):
+        dates, counters, statuses = self._materialize()
+        dates.append(check_date.toordinal())
+        counters.append(counter if isinstance(counter, int) else -1)
+        statuses.append(self._CODES[status])
+
+    def __len__(self):
+        return len(self._materialize()[0])
+
+    def _indices(self, status):
+        statuses = self._materialize()[2]
+        if status is None:
+            return range(len(statuses))
+        wanted = {self._CODES[s] for s in ([status] if isinstance(status, str) else status)}
+        return [i for i, code in enumerate(statuses) if code in wanted]
+
+    def _row(self, i):
+        dates, counters, statuses = self._columns
+        return {"Data": date.fromordinal(dates[i]),
+                "Dia Contado": counters[i] if counters[i] >= 0 else "-",
+                "Status": self.STATUSES[statuses[i]]}
+
+    def __iter__(self):
+        return self.rows()
+
+    def rows(self, status=None):
+        """Linhas (dicionários), opcionalmente só com o(s) estado(s) indicado(s)."""
+        for i in self._indices(status):
+            yield self._row(i)
+
+    def status_counts(self):
+        counts = dict.fromkeys(self.STATUSES, 0)
+        for code in self._materialize()[2]:
+            counts[self.STATUSES[code]] += 1
+        return counts
+
+    def page(self, number, size=50, status=None):
+        """Página `number` (a partir de 0) com até `size` linhas filtradas."""
+        indices = self._indices(status)
+        return [self._row(i) for i in indices[number * size:(number + 1) * size]]
+
+    def count(self, status=None):
+        return len(self._indices(status))
+
+    def to_dataframe(self, status=None, page=None, size=50):
+        """DataFrame do registo, filtrado e/ou paginado, construído diretamente das colunas.
+
+        O pandas só é importado aqui; os dias não contados ficam como <NA>.
+        """
+        import numpy as np
+        import pandas as pd
+        dates, counters, statuses = (np.frombuffer(col, dtype=dtype) if len(col) else np.empty(0, dtype)
+                                     for col, dtype in zip(self._materialize(), (np.int32, np.int16, np.uint8)))
+        selected = np.asarray(self._indices(status), dtype=np.int64)
+        if page is not None:
+            selected = selected[page * size:(page + 1) * size]
+        epoch = date(1970, 1, 1).toordinal()
+        counted = counters[selected]
+        return pd.DataFrame({
+            "Data": (dates[selected].astype(np.int64) - epoch).astype("datetime64[D]"),
+            "Dia Contado": pd.arrays.IntegerArray(counted.copy(), counted < 0),
+            "Status": pd.Categorical.from_codes(statuses[selected], categories=list(self.STATUSES)),
+        })
+
+    def to_csv(self, fh, status=None):
+        """Escreve o registo em CSV (linha a linha) para o ficheiro aberto `fh`."""
+        writer = csv.writer(fh)
+        writer.writerow(["Data", "Dia Contado", "Status"])
+        for row in self.rows(status):
+            writer.writerow([row["Data"].isoformat(), row["Dia Contado"], row["Status"]])
+
+def calculate_deadlines(start_date, targets, suspensions, holidays_set, return_log=False, log_until=None):
+    """Resolve vários prazos (em dias úteis) numa única passagem desde start_date.
+
+    Devolve {alvo: data}, com o ajuste CPA aplicado a cada data. Com
+    ``return_log`` devolve também o registo diário (AuditLog) dessa mesma
+    passagem, até ser atingido ``log_until`` (por defeito, o maior alvo).
+    """
+    if not isinstance(suspensions, SuspensionSet):
+        suspensions = SuspensionSet(suspensions)
+    ordered = sorted(set(targets))
+    if log_until is None:
+        log_until = max(ordered, default=0)
+    reached = {}
+
+    # Caminho rápido: o índice de dias úteis salta blocos inteiros de suspensão
+    if isinstance(holidays_set, BusinessCalendar) and not return_log:
+        current_date = start_date
+        days_counted = 0
+        for target in ordered:
+            remaining = target - days_counted
+            for block_start, block_end in suspensions.blocks_after(current_date):
+                if remaining <= 0 or holidays_set.add_business_days(current_date, remaining) < block_start:
+                    break
+                remaining -= holidays_set.business_days_between(current_date, block_start - timedelta(days=1))
+                current_date = max(current_date, block_end)
+            current_date = holidays_set.add_business_days(current_date, remaining)
+            days_counted = max(days_counted, target)
+            reached[target] = current_date
+        return {t: holidays_set.next_business_day(d) for t, d in reached.items()}
+
+    current_date = start_date
+    days_counted = 0
+    log = AuditLog()
+    pending = iter(ordered)
+    next_target = next(pending, None)
+    
+    if return_log:
+        log.append(current_date, 0, "Início")
+
+    while next_target is not None:
+        # Alvos já atingidos (inclui os <= 0, que ficam na data de início)
+        if next_target <= days_counted:
+            reached[next_target] = current_date
+            next_target = next(pending, None)
+            continue
+
+        current_date += timedelta(days=1)
+        
+        status = "Util"
+        # 1. Prioridade: Suspensão
+        if is_suspended(current_date, suspensions):
+            status = "Suspenso"
+        # 2. Fim de Semana
+        elif current_date.weekday() >= 5:
+            status = "Fim de Semana"
+        # 3. Feriado
+        elif current_date in holidays_set:
+            status = "Feriado"
+            
+        if status == "Util":
+            days_counted += 1
+            
+        if return_log and (days_counted < log_until or (status == "Util" and days_counted == log_until)):
+            log.append(current_date, days_counted if status == "Util" else "-", status)
+
+    deadlines = {}
+    for target, final_date in reached.items():
+        # Ajuste CPA: Se terminar em Sábado/Domingo/Feriado, salta para o próximo útil
+        while final_date.weekday() >= 5 or final_date in holidays_set:
+            final_date += timedelta(days=1)
+        deadlines[target] = final_date
+    
+    if return_log:
+        return deadlines, log
+    return deadlines
+
+def calculate_deadline_rigorous(start_date, target_business_days, suspensions, holidays_set, return_log=False):
+    if return_log:
+        deadlines, log = calculate_deadlines(start_date, [target_business_days], suspensions, holidays_set, return_log=True)
+        return deadlines[target_business_days], log
+    return calculate_deadlines(start_date, [target_business_days], suspensions, holidays_set)[target_business_days]
+
+# --- WORKFLOW (GRAFO DE DEPENDÊNCIAS) ---
+
+# Etapas principais: (nó, nome apresentado)
+WORKFLOW_STEPS = (
+    ("reuniao", "Data Reunião"),
+    ("conformidade", "Limite Conformidade"),
+    ("ptf", "Envio PTF à AAIA"),
+    ("audiencia", "Audiência de Interessados"),
+    ("dia", "Emissão da DIA (Decisão Final)"),
+)
+
+# Nós contados desde a instrução, com suspensões (uma só passagem)
+_COUNTED_NODES = ("reuniao", "conformidade", "ptf", "audiencia", "dia", "setoriais")
+
+# Nós derivados: (nó, depende de, chave do prazo em milestones_config ou None, dias úteis por defeito)
+_DERIVED_NODES = (
+    ("cp_start", "conformidade", None, 5),          # Início CP: 5 dias úteis APÓS Conformidade Real
+    ("cp_end", "cp_start", "cp_duration", 30),       # Fim CP
+    ("pareceres_externos", "cp_start", None, 23),   # Pareceres Externos
+    ("relatorio_cp", "cp_end", None, 7),            # Relatório CP
+    ("visita", "cp_start", "visita", 15),           # Visita
+)
+
+WORKFLOW_NODES = _COUNTED_NODES + ("conf_teorica",) + tuple(node for node, _, _, _ in _DERIVED_NODES)
+
+# Tabela de complementares: (nó, designação, referência; "{}" é o prazo do nó em dias úteis)
+COMPLEMENTARY_STEPS = (
+    ("conf_teorica", "1. Limite Conformidade (Ref. Teórica)", "Sem suspensões"),
+    ("conformidade", "1. Limite Conformidade (Real)", "Com suspensões"),
+    ("cp_start", "2. Início Consulta Pública", "Conf + {} dias"),
+    ("cp_end", "3. Fim Consulta Pública", "Início CP + {} dias"),
+    ("pareceres_externos", "4. Data para Pareceres Externos", "Início CP + {} dias"),
+    ("relatorio_cp", "5. Envio do Relatório da CP", "Fim CP + {} dias"),
+    ("visita", "6. Visita Técnica", "Início CP + {} dias"),
+    # Pareceres Setoriais (Conta desde o início, com suspensões)
+    ("setoriais", "7. Pareceres Setoriais", "Dia {} Global"),
+)
+
+_NODE_INDEX = {node: i for i, node in enumerate(WORKFLOW_NODES)}
+
+def _node_days(milestones_config, key, default=None):
+    return milestones_config.get(key, MILESTONES_DEFAULTS[150][key] if default is None else default)
+
+def _uses_pea(suspensions, pea_date):
+    return bool(pea_date and suspensions)
+
+def _workflow_roots(start_date, suspensions, milestones_config, pea_date, holidays_set, nodes):
+    """Datas dos nós pedidos que não dependem de outros nós."""
+    values = {}
+    with_pea = "conformidade" in nodes and _uses_pea(suspensions, pea_date)
+    counted = [node for node in _COUNTED_NODES if node in nodes and not (node == "conformidade" and with_pea)]
+
+    # Uma só passagem resolve todas as etapas (e os setoriais)
+    if counted:
+        days = {node: _node_days(milestones_config, node) for node in counted}
+        with stage("workflow.varrimento"):
+            deadlines = calculate_deadlines(start_date, list(days.values()), suspensions, holidays_set)
+        values.update({node: deadlines[n] for node, n in days.items()})
+
+    # --- LÓGICA ESPECIAL: CONFORMIDADE COM PEA ---
+    # Resolve o problema de ter de alterar manualmente "20" para "28".
+    if with_pea:
+        with stage("workflow.conformidade_pea"):
+            # 1. Contar dias gastos até ao PEA
+            # Começa a contar do dia seguinte à instrução, até ao dia ANTES do PEA
+            days_spent = holidays_set.business_days_between(start_date, pea_date - timedelta(days=1))
+
+            # 2. Dias que sobraram dos 20 (ou do valor configurado)
+            remaining_days = milestones_config["conformidade"] - days_spent
+            if remaining_days < 0: remaining_days = 0
+
+            # 3. Aplicar os dias restantes APÓS o fim da suspensão
+            values["conformidade"] = calculate_deadline_rigorous(suspensions.last_end, remaining_days, [], holidays_set)
+
+    # Referência teórica: conformidade sem suspensões
+    if "conf_teorica" in nodes:
+        values["conf_teorica"] = calculate_deadline_rigorous(start_date, milestones_config["conformidade"], [], holidays_set)
+    return values
+
+def _workflow_derived(values, milestones_config, holidays_set, nodes):
+    """Calcula (por ordem topológica) os nós derivados pedidos a partir de ``values``."""
+    for node, parent, key, default in _DERIVED_NODES:
+        if node in nodes:
+            days = _node_days(milestones_config, key, default) if key else default
+            values[node] = add_business_days(values[parent], days, holidays_set)
+
+def _dia_log(start_date, suspensions, milestones_config, holidays_set):
+    """Registo da contagem da DIA: só é calculado se for consultado."""
+    def build_log():
+        with stage("workflow.registo_dia"):
+            return calculate_deadlines(
+                start_date, [milestones_config["dia"]], suspensions, holidays_set, return_log=True
+            )[1]
+    return AuditLog(build_log)
+
+def _node_offsets(milestones_config):
+    """Prazo (dias úteis) de cada nó de WORKFLOW_NODES, pela mesma ordem."""
+    offsets = {node: _node_days(milestones_config, node) for node in _COUNTED_NODES}
+    offsets["conf_teorica"] = milestones_config["conformidade"]
+    for node, _, key, default in _DERIVED_NODES:
+        offsets[node] = _node_days(milestones_config, key, default) if key else default
+    return [int(offsets[node]) for node in WORKFLOW_NODES]
+
+class WorkflowResult:
+    """Resultado de um workflow em colunas compactas, sem texto.
+
+    Um só array int32 guarda o ordinal da instrução, o ordinal da data de
+    cada nó de WORKFLOW_NODES e o prazo (dias úteis) que o define; ficam ainda
+    o total de dias suspensos e o registo (diferido) da contagem da DIA.
+    Designações, referências ("20 dias úteis", "Início CP + 30 dias") e
+    formatos de data só são resolvidos na apresentação: main_rows() e
+    complementary_rows() para as tabelas, phase_bars() e cp_period() para os
+    Gantt, legacy() para o formato antigo de calculate_workflow.
+    """
+
+    __slots__ = ("_data", "total_susp", "log")
+
+    def __init__(self, start_date, ordinals, offsets, total_susp=0, log=None):
+        self._data = array('i', [start_date.toordinal()])
+        self._data.extend(ordinals)
+        self._data.extend(offsets)
+        self.total_susp = total_susp
+        self.log = log
+
+    def __eq__(self, other):
+        if not isinstance(other, WorkflowResult):
+            return NotImplemented
+        return self.key() == other.key()
+
+    __hash__ = None
+
+    def key(self):
+        """Tuplo de inteiros que identifica o resultado (para caches e comparações)."""
+        return tuple(self._data) + (self.total_susp,)
+
+    @property
+    def start_date(self):
+        return date.fromordinal(self._data[0])
+
+    def ordinal(self, node):
+        return self._data[1 + _NODE_INDEX[node]]
+
+    def date_of(self, node):
+        return date.fromordinal(self._data[1 + _NODE_INDEX[node]])
+
+    def offset(self, node):
+        return self._data[1 + len(WORKFLOW_NODES) + _NODE_INDEX[node]]
+
+    @property
+    def dates(self):
+        """Data de cada nó do grafo (dicionário novo)."""
+        return {node: date.fromordinal(o) for node, o in zip(WORKFLOW_NODES, self._data[1:1 + len(WORKFLOW_NODES)])}
+
+    # --- apresentação ---
+
+    def main_rows(self):
+        """Etapas principais: (nó, designação, prazo legal, data)."""
+        return [(node, label, f"{self.offset(node)} dias úteis", self.date_of(node)) for node, label in WORKFLOW_STEPS]
+
+    def complementary_rows(self):
+        """Marcos complementares: (nó, designação, referência, data)."""
+        return [(node, label, reference.format(self.offset(node)), self.date_of(node))
+                for node, label, reference in COMPLEMENTARY_STEPS]
+
+    def phase_bars(self):
+        """Barras das fases principais do Gantt: (designação, início, fim), cada uma a partir da anterior."""
+        bars = []
+        last = self._data[0]
+        for node, label in WORKFLOW_STEPS:
+            end = self.ordinal(node)
+            bars.append((label, date.fromordinal(min(last, end)), date.fromordinal(end)))
+            last = end
+        return bars
+
+    def cp_period(self):
+        """(início, fim) da consulta pública."""
+        return self.date_of("cp_start"), self.date_of("cp_end")
+
+    def legacy(self):
+        """Tuplo antigo de calculate_workflow: (etapas, complementares, total suspenso, registo, gantt)."""
+        results = [{"Etapa": label, "Prazo Legal": legal, "Data Prevista": day} for _, label, legal, day in self.main_rows()]
+        complementary = [{"Etapa": label, "Ref": ref, "Data": day} for _, label, ref, day in self.complementary_rows()]
+        gantt_data = {
+            "cp_start": self.date_of("cp_start"),
+            "cp_end": self.date_of("cp_end"),
+            "visit": self.date_of("visita"),
+            "sectoral": self.date_of("setoriais"),
+        }
+        return results, complementary, self.total_susp, self.log, gantt_data
+
+def _workflow_result(start_date, milestones_config, suspensions, values, log_final):
+    """WorkflowResult a partir das datas dos nós (dias sobrepostos contam uma só vez no total)."""
+    return WorkflowResult(start_date, [values[node].toordinal() for node in WORKFLOW_NODES],
+                          _node_offsets(milestones_config), suspensions.total_days, log_final)
+
+def compute_workflow(start_date, suspensions, milestones_config, pea_date=None, holidays_set=None):
+    """Datas de todos os nós do workflow, como WorkflowResult."""
+    # Calendário partilhado (nacional, ou o do concelho): feriados carregados a pedido, sem horizonte fixo
+    holidays_set = as_business_calendar(holidays_set)
+    suspensions = SuspensionSet(suspensions)
+
+    values = _workflow_roots(start_date, suspensions, milestones_config, pea_date, holidays_set, WORKFLOW_NODES)
+    _workflow_derived(values, milestones_config, holidays_set, WORKFLOW_NODES)
+    log_final = _dia_log(start_date, suspensions, milestones_config, holidays_set)
+    return _workflow_result(start_date, milestones_config, suspensions, values, log_final)
+
+def calculate_workflow(start_date, suspensions, milestones_config, pea_date=None, holidays_set=None):
+    """Formato antigo (listas de dicionários com texto): compute_workflow(...).legacy()."""
+    return compute_workflow(start_date, suspensions, milestones_config, pea_date, holidays_set).legacy()
+
+class IncrementalWorkflow:
+    """compute_workflow com recálculo incremental entre chamadas sucessivas.
+
+    Guarda as datas de cada nó do grafo (instrução → conformidade → início CP →
+    fim CP → relatório, ...). Quando só mudam as suspensões ou o PEA, um prazo
+    contado desde a instrução mantém-se se a primeira diferença nas suspensões
+    for posterior à sua data; a conformidade com PEA depende apenas do PEA e do
+    fim da última suspensão; os nós derivados só são recalculados se um
+    antecessor mudou de data. Mudar a instrução, os prazos ou o calendário
+    recalcula tudo.
+    Após update(), ``reused`` e ``recomputed`` indicam os nós reaproveitados.
+    """
+
+    def __init__(self, holidays_set=None):
+        self._holidays_set = holidays_set
+        self._calendar = None        # BusinessCalendar do calendário da última chamada
+        self._inputs = None          # (instrução, prazos, calendário) da última chamada
+        self._suspensions = None
+        self._pea_date = None
+        self._values = {}
+        self._log = None
+        self.reused = ()
+        self.recomputed = ()
+
+    @property
+    def dates(self):
+        """Data de cada nó do grafo na última chamada a update() (cópia)."""
+        return dict(self._values)
+
+    def _invalid_roots(self, suspensions, pea_date):
+        first_change = self._suspensions.first_difference(suspensions)
+        old_pea = _uses_pea(self._suspensions, self._pea_date)
+        new_pea = _uses_pea(suspensions, pea_date)
+        invalid = set()
+        for node in _COUNTED_NODES:
+            if node == "conformidade" and (old_pea or new_pea):
+                if not (old_pea and new_pea and pea_date == self._pea_date
+                        and suspensions.last_end == self._suspensions.last_end):
+                    invalid.add(node)
+            elif first_change is not None and first_change <= self._values[node]:
+                invalid.add(node)
+        return invalid
+
+    def compute(self, start_date, suspensions, milestones_config, pea_date=None, holidays_set=None):
+        """Mesmo resultado que compute_workflow, reaproveitando o que não mudou."""
+        if holidays_set is None:
+            holidays_set = self._holidays_set
+        suspensions = SuspensionSet(suspensions)
+        inputs = (start_date, sorted(milestones_config.items()), holidays_set)
+
+        if inputs != self._inputs:
+            invalid = set(WORKFLOW_NODES)
+            # Um conjunto simples de feriados só é embrulhado quando o calendário muda
+            self._calendar = as_business_calendar(holidays_set)
+        else:
+            invalid = self._invalid_roots(suspensions, pea_date)
+        holidays_set = self._calendar
+        values = dict(self._values)
+        values.update(_workflow_roots(start_date, suspensions, milestones_config, pea_date, holidays_set, invalid))
+
+        # Um nó derivado só é recalculado se um antecessor mudou de data
+        changed = {node for node in invalid if node in values and self._values.get(node) != values[node]}
+        for node, parent, _, _ in _DERIVED_NODES:
+            if node in invalid or parent in changed:
+                invalid.add(node)
+                _workflow_derived(values, milestones_config, holidays_set, (node,))
+                if self._values.get(node) != values[node]:
+                    changed.add(node)
+
+        if self._log is None or "dia" in invalid:
+            self._log = _dia_log(start_date, suspensions, milestones_config, holidays_set)
+
+        self._inputs, self._suspensions, self._pea_date, self._values = inputs, suspensions, pea_date, values
+        self.recomputed = tuple(node for node in WORKFLOW_NODES if node in invalid)
+        self.reused = tuple(node for node in WORKFLOW_NODES if node not in invalid)
+        return _workflow_result(start_date, milestones_config, suspensions, values, self._log)
+
+    def update(self, start_date, suspensions, milestones_config, pea_date=None, holidays_set=None):
+        """compute() no formato antigo de calculate_workflow."""
+        return self.compute(start_date, suspensions, milestones_config, pea_date, holidays_set).legacy()
+
+# --- CONSULTAS INVERSAS ---
+
+# Limite das pesquisas exponenciais (dias de calendário, ~200 anos)
+_SEARCH_LIMIT = 366 * 200
+
+def _last_true(lo, hi, predicate):
+    """Maior inteiro em [lo, hi] que satisfaz um predicado monótono (verdadeiro -> falso).
+
+    Assume predicate(lo) verdadeiro; custa ~log2(hi - lo) avaliações.
+    """
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if predicate(mid):
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+def latest_start_date(target_date, business_days, suspensions=(), holidays_set=None):
+    """Data de instrução mais tardia cujo prazo de `business_days` termina até target_date.
+
+    O prazo é monótono na data de início, pelo que basta uma pesquisa binária
+    (algumas dezenas de avaliações do motor). Devolve None se não houver solução.
+    """
+    holidays_set = as_business_calendar(holidays_set)
+    suspensions = SuspensionSet(suspensions)
+
+    def fits(ordinal):
+        deadline = calculate_deadline_rigorous(date.fromordinal(ordinal), business_days, suspensions, holidays_set)
+        return deadline <= target_date
+
+    hi = target_date.toordinal()
+    step = max(business_days, 1) * 2 + 7
+    while not fits(hi - step):
+        step *= 2
+        if step > _SEARCH_LIMIT:
+            return None
+    return date.fromordinal(_last_true(hi - step, hi, fits))
+
+def max_suspension_days(start_date, business_days, target_date, suspension_start, suspensions=(), holidays_set=None):
+    """Maior suspensão (dias de calendário) a partir de suspension_start que ainda
+    cumpre target_date para um prazo de `business_days` contado desde start_date.
+
+    Devolve None se o prazo já falha sem nova suspensão e ``float('inf')`` se a
+    suspensão não tiver efeito (começa depois de o prazo terminar).
+    """
+    holidays_set = as_business_calendar(holidays_set)
+    base = list(SuspensionSet(suspensions))
+
+    def fits(days):
+        extra = [{'start': suspension_start, 'end': suspension_start + timedelta(days=days - 1)}] if days > 0 else []
+        deadline = calculate_deadline_rigorous(start_date, business_days, SuspensionSet(base + extra), holidays_set)
+        return deadline <= target_date
+
+    if not fits(0):
+        return None
+    lo, hi = 0, 32
+    while fits(hi):
+        lo, hi = hi, hi * 2
+        if hi > _SEARCH_LIMIT:
+            return float('inf')
+    return _last_true(lo, hi - 1, fits)
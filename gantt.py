@@ -0,0 +1,180 @@
+"""Gantt de carteira: barras em colunas NumPy e traços Plotly WebGL ou agregados.
+
+As barras de todos os processos ficam em arrays (linha, início, fim, tipo),
+construídos de uma só vez a partir do motor de carteira. A vista recorta uma
+janela de datas e um intervalo de processos antes de gerar o gráfico, pelo
+que só a fatia visível chega ao browser; acima de GANTT_MAX_ROWS processos
+visíveis, a vista passa a um gráfico agregado (processos ativos por semana).
+"""
+import numpy as np
+
+from engine import SuspensionSet
+from portfolio import _EPOCH, calculate_portfolio
+
+# Tipos de barra (por ordem de desenho) e cores, as mesmas do Gantt de um processo
+BAR_KINDS = ("Fase Principal", "Consulta Pública", "Suspensão")
+BAR_COLORS = {"Fase Principal": "#2E86C1", "Consulta Pública": "#27AE60", "Suspensão": "#E74C3C"}
+BAR_WIDTHS = (6, 4, 4)
+
+GANTT_MAX_ROWS = 2000   # processos visíveis a partir dos quais se agrega
+_LABEL_MAX_ROWS = 60    # nomes no eixo vertical só até este nº de linhas
+_DAY_MS = 86400000
+
+
+class PortfolioBars:
+    """Barras de uma carteira em colunas.
+
+    ``row`` (int32, índice do processo em ``names``), ``start``/``end``
+    (datetime64[D], fim inclusive) e ``kind`` (uint8, índice em BAR_KINDS).
+    """
+
+    __slots__ = ("names", "row", "start", "end", "kind")
+
+    def __init__(self, names, row, start, end, kind):
+        self.names = list(names)
+        self.row = np.asarray(row, dtype=np.int32)
+        self.start = np.asarray(start, dtype='datetime64[D]')
+        self.end = np.asarray(end, dtype='datetime64[D]')
+        self.kind = np.asarray(kind, dtype=np.uint8)
+
+    def __len__(self):
+        return len(self.row)
+
+    @property
+    def n_processes(self):
+        return len(self.names)
+
+    def date_range(self):
+        """(primeira, última) data coberta pelas barras, como datetime.date (ou None)."""
+        if not len(self):
+            return None
+        return self.start.min().astype(object), self.end.max().astype(object)
+
+    def window(self, first_row=0, last_row=None, date_from=None, date_to=None):
+        """Fatia visível: processos em [first_row, last_row[ e barras que tocam [date_from, date_to].
+
+        As barras são recortadas à janela de datas; as linhas mantêm o índice
+        original (para o eixo vertical bater certo com ``names``).
+        """
+        last_row = self.n_processes if last_row is None else last_row
+        mask = (self.row >= first_row) & (self.row < last_row)
+        start, end = self.start, self.end
+        if date_from is not None:
+            date_from = np.datetime64(date_from, 'D')
+            mask &= end >= date_from
+            start = np.maximum(start, date_from)
+        if date_to is not None:
+            date_to = np.datetime64(date_to, 'D')
+            mask &= self.start <= date_to
+            end = np.minimum(end, date_to)
+        return PortfolioBars(self.names, self.row[mask], start[mask], end[mask], self.kind[mask])
+
+
+def build_portfolio_bars(processes, names=None):
+    """PortfolioBars de uma lista de processos (formato de calculate_portfolio).
+
+    Cada processo tem uma barra da instrução à DIA, uma da consulta pública e
+    uma por bloco de suspensão (já fundidos).
+    """
+    processes = list(processes)
+    n = len(processes)
+    if names is None:
+        names = [p.get("name") or str(i) for i, p in enumerate(processes)]
+    columns = calculate_portfolio(processes)
+    start = np.array([p["start_date"] for p in processes], dtype='datetime64[D]')
+    rows = np.arange(n, dtype=np.int32)
+
+    # Suspensões: ordinais dos blocos fundidos de todos os processos, concatenados
+    susp_sets = [SuspensionSet(p.get("suspensions") or []) for p in processes]
+    counts = np.array([len(ss) for ss in susp_sets], dtype=np.int64)
+    # (array('l') partilha o buffer com o dtype 'l' do NumPy: C long em qualquer plataforma)
+    susp_starts = np.concatenate([np.frombuffer(ss._starts, dtype='l') for ss in susp_sets] or [np.empty(0, 'l')])
+    susp_ends = np.concatenate([np.frombuffer(ss._ends, dtype='l') for ss in susp_sets] or [np.empty(0, 'l')])
+
+    return PortfolioBars(
+        names,
+        np.concatenate([rows, rows, np.repeat(rows, counts)]),
+        np.concatenate([start, columns["cp_start"], (susp_starts - _EPOCH).astype('datetime64[D]')]),
+        np.concatenate([columns["dia"], columns["cp_end"], (susp_ends - _EPOCH).astype('datetime64[D]')]),
+        np.concatenate([np.zeros(n, np.uint8), np.ones(n, np.uint8), np.full(len(susp_starts), 2, np.uint8)]),
+    )
+
+
+def _segments(bars, mask):
+    """x (ms desde 1970) e y das barras selecionadas, intercalados com NaN (um traço só)."""
+    k = int(mask.sum())
+    x = np.full(3 * k, np.nan)
+    y = np.full(3 * k, np.nan)
+    x[0::3] = bars.start[mask].astype(np.int64) * _DAY_MS
+    x[1::3] = (bars.end[mask].astype(np.int64) + 1) * _DAY_MS   # fim inclusive
+    y[0::3] = y[1::3] = bars.row[mask]
+    return x, y
+
+
+def bars_figure(bars):
+    """Figura Plotly com um traço Scattergl (WebGL) por tipo de barra."""
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+    for code, kind in enumerate(BAR_KINDS):
+        mask = bars.kind == code
+        if not mask.any():
+            continue
+        x, y = _segments(bars, mask)
+        fig.add_trace(go.Scattergl(
+            x=x, y=y, mode="lines", name=kind, hoverinfo="skip",
+            line=dict(color=BAR_COLORS[kind], width=BAR_WIDTHS[code]),
+        ))
+    rows = np.unique(bars.row)
+    fig.update_xaxes(type="date")
+    fig.update_yaxes(autorange="reversed", title=None)
+    if len(rows) <= _LABEL_MAX_ROWS:
+        fig.update_yaxes(tickmode="array", tickvals=rows, ticktext=[bars.names[r] for r in rows])
+    else:
+        fig.update_yaxes(title="Processo (nº)")
+    fig.update_layout(height=max(300, min(900, 18 * len(rows) + 120)), legend=dict(orientation="h"),
+                      margin=dict(l=10, r=10, t=30, b=10))
+    return fig
+
+
+def active_counts(bars, step_days=7):
+    """Nº de processos em cada tipo de barra, por período de ``step_days`` dias.
+
+    Devolve (inícios dos períodos como datetime64[D], matriz tipo x período).
+    """
+    if not len(bars):
+        return np.empty(0, dtype='datetime64[D]'), np.zeros((len(BAR_KINDS), 0), dtype=np.int64)
+    origin = bars.start.min()
+    first = (bars.start - origin).astype(np.int64) // step_days
+    last = (bars.end - origin).astype(np.int64) // step_days
+    n_bins = int(last.max()) + 1
+    # Diferenças (+1 no início, -1 a seguir ao fim) e soma acumulada por tipo
+    delta = np.zeros((len(BAR_KINDS), n_bins + 1), dtype=np.int64)
+    np.add.at(delta, (bars.kind, first), 1)
+    np.add.at(delta, (bars.kind, last + 1), -1)
+    bins = origin + np.arange(n_bins) * np.timedelta64(step_days, 'D')
+    return bins, np.cumsum(delta, axis=1)[:, :n_bins]
+
+
+def aggregated_figure(bars, step_days=7):
+    """Figura agregada: processos em cada fase por período (um traço por tipo)."""
+    import plotly.graph_objects as go
+
+    bins, counts = active_counts(bars, step_days)
+    fig = go.Figure()
+    for code, kind in enumerate(BAR_KINDS):
+        fig.add_trace(go.Scatter(
+            x=bins.astype(np.int64) * _DAY_MS, y=counts[code], name=kind, mode="lines",
+            line=dict(color=BAR_COLORS[kind], shape="hv"),
+        ))
+    fig.update_xaxes(type="date")
+    fig.update_yaxes(title=f"Processos (por {step_days} dias)")
+    fig.update_layout(height=420, legend=dict(orientation="h"), margin=dict(l=10, r=10, t=30, b=10))
+    return fig
+
+
+def portfolio_figure(bars, max_rows=GANTT_MAX_ROWS, aggregate=None):
+    """Barras WebGL até ``max_rows`` processos visíveis; acima disso (ou com aggregate=True), agregado."""
+    if aggregate is None:
+        aggregate = len(np.unique(bars.row)) > max_rows
+    return aggregated_figure(bars) if aggregate else bars_figure(bars)
@@ -0,0 +1,146 @@
+"""Exportação iCalendar (ICS, RFC 5545) dos prazos: um processo ou uma carteira inteira.
+
+Cada marco (principais e complementares, incluindo início/fim da consulta
+pública, visita técnica e pareceres setoriais) é um evento de dia inteiro;
+cada suspensão (já fundida) é um evento de dia inteiro que cobre o período.
+Os UID dependem só do processo e do marco, pelo que importar de novo um
+calendário atualiza os eventos em vez de os duplicar.
+
+O calendário é produzido linha a linha (geradores); numa carteira, os
+processos são calculados por blocos com o motor NumPy, pelo que um feed com
+dezenas de milhares de eventos usa memória constante e pode ser servido à
+medida que é gerado.
+"""
+from datetime import datetime, timedelta, timezone
+import hashlib
+
+from engine import WORKFLOW_STEPS, SuspensionSet
+from portfolio import calculate_portfolio, iter_chunks
+
+PRODID = "-//CCDR Centro//Simulador AIA//PT"
+
+# Designação de cada marco nos eventos, a mesma na exportação de um processo e na da
+# carteira (os UID coincidem; conf_real é a conformidade e não é exportada duas vezes)
+EVENT_LABELS = dict(WORKFLOW_STEPS)
+EVENT_LABELS.update({
+    "conf_teorica": "Limite Conformidade (Ref. Teórica)",
+    "cp_start": "Início Consulta Pública",
+    "cp_end": "Fim Consulta Pública",
+    "pareceres_externos": "Data para Pareceres Externos",
+    "relatorio_cp": "Envio do Relatório da CP",
+    "visita": "Visita Técnica",
+    "setoriais": "Pareceres Setoriais",
+})
+
+MILESTONE_CATEGORY = "Prazo AIA"
+SUSPENSION_CATEGORY = "Suspensão"
+
+
+def _escape(text):
+    return (str(text).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+
+def _fold(line):
+    """Linha de conteúdo dobrada a 75 octetos (sem partir caracteres UTF-8), terminada em CRLF."""
+    data = line.encode("utf-8")
+    if len(data) <= 75:
+        return line + "\r\n"
+    parts = []
+    start, limit = 0, 75
+    while start < len(data):
+        end = min(start + limit, len(data))
+        while end < len(data) and (data[end] & 0xC0) == 0x80:
+            end -= 1
+        parts.append(data[start:end].decode("utf-8"))
+        start, limit = end, 74  # as continuações começam por um espaço
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _uid(*parts):
+    return hashlib.sha1("|".join(map(str, parts)).encode("utf-8")).hexdigest()[:20] + "@simulador-aia"
+
+
+def event(uid, summary, start, end=None, description=None, category=MILESTONE_CATEGORY):
+    """Evento de dia inteiro (``end`` inclusive; por defeito, o próprio dia)."""
+    return {"uid": uid, "summary": summary, "start": start, "end": end or start,
+            "description": description, "category": category}
+
+
+def _ics_date(day):
+    return day.isoformat().replace("-", "")
+
+
+def iter_calendar(events, name="Prazos AIA", stamp=None):
+    """Texto do calendário (CRLF) aos pedaços: o cabeçalho, um pedaço por evento e o fecho."""
+    stamp = (stamp or datetime.now(timezone.utc)).strftime("%Y%m%dT%H%M%SZ")
+    yield ("BEGIN:VCALENDAR\r\nVERSION:2.0\r\n"
+           f"PRODID:{PRODID}\r\nCALSCALE:GREGORIAN\r\nMETHOD:PUBLISH\r\n"
+           + _fold(f"X-WR-CALNAME:{_escape(name)}"))
+    for ev in events:
+        description = _fold(f"DESCRIPTION:{_escape(ev['description'])}") if ev["description"] else ""
+        yield (f"BEGIN:VEVENT\r\nUID:{ev['uid']}\r\nDTSTAMP:{stamp}\r\n"
+               f"DTSTART;VALUE=DATE:{_ics_date(ev['start'])}\r\n"
+               f"DTEND;VALUE=DATE:{_ics_date(ev['end'] + timedelta(days=1))}\r\n"  # fim exclusivo
+               + _fold(f"SUMMARY:{_escape(ev['summary'])}") + description
+               + _fold(f"CATEGORIES:{_escape(ev['category'])}")
+               + "TRANSP:TRANSPARENT\r\nEND:VEVENT\r\n")
+    yield "END:VCALENDAR\r\n"
+
+
+def _suspension_events(name, suspensions):
+    for s in SuspensionSet(suspensions):
+        yield event(_uid(name, "suspensao", s["start"]), f"{name}: Suspensão", s["start"], s["end"],
+                    f"Suspensão de {s['start']:%d-%m-%Y} a {s['end']:%d-%m-%Y}", SUSPENSION_CATEGORY)
+
+
+def process_events(name, result, suspensions=()):
+    """Eventos de um processo a partir do WorkflowResult (marcos e complementares).
+
+    Os UID são os mesmos da exportação da carteira (por nó do workflow); a
+    conformidade real, que também é um marco principal, sai uma só vez.
+    """
+    for key, _, legal, day in result.main_rows():
+        yield event(_uid(name, key), f"{name}: {EVENT_LABELS[key]}", day, description=f"Prazo legal: {legal}")
+    main_keys = {key for key, _ in WORKFLOW_STEPS}
+    for key, _, reference, day in result.complementary_rows():
+        if key not in main_keys:
+            yield event(_uid(name, key), f"{name}: {EVENT_LABELS[key]}", day, description=reference)
+    yield from _suspension_events(name, suspensions)
+
+
+def workflow_ics(name, result, suspensions=()):
+    """Calendário ICS (bytes UTF-8) de um processo, para descarregar."""
+    return "".join(iter_calendar(process_events(name, result, suspensions), name)).encode("utf-8")
+
+
+def portfolio_events(processes, chunk_size=1000, first_index=0):
+    """Eventos de uma carteira, calculada por blocos (só um bloco em memória de cada vez)."""
+    index = first_index
+    for chunk in iter_chunks(processes, chunk_size):
+        columns = calculate_portfolio(chunk)
+        dates = {key: columns[key].astype(object) for key in EVENT_LABELS}
+        for i, process in enumerate(chunk):
+            name = process.get("name") or str(index)
+            for key, label in EVENT_LABELS.items():
+                day = dates[key][i]
+                yield event(_uid(name, key), f"{name}: {label}", day)
+            yield from _suspension_events(name, process.get("suspensions") or ())
+            index += 1
+
+
+def iter_portfolio_ics(processes, name="Carteira AIA", chunk_size=1000):
+    """Calendário de uma carteira inteira, aos pedaços (gerador, memória constante)."""
+    return iter_calendar(portfolio_events(processes, chunk_size), name)
+
+
+def write_ics(parts, fh, flush_every=1000):
+    """Escreve o calendário num ficheiro de texto (aberto com newline=""); devolve quantos eventos escreveu."""
+    count = -2  # cabeçalho e fecho
+    for part in parts:
+        fh.write(part)
+        count += 1
+        if count % flush_every == 0:
+            fh.flush()
+    fh.flush()
+    return max(count, 0)
@@ -0,0 +1,264 @@
+"""Motor de carteira: workflow de muitos processos numa só passagem NumPy."""
+import csv
+import json
+import os
+from datetime import date, datetime
+from itertools import islice
+
+import numpy as np
+
+from engine import MILESTONES_DEFAULTS, SuspensionSet, as_business_calendar, calendar_key, get_business_calendar, milestones_for
+
+# Colunas devolvidas por calculate_portfolio (ordem dos separadores da UI)
+PORTFOLIO_COLUMNS = [
+    "reuniao", "conformidade", "ptf", "audiencia", "dia",
+    "conf_teorica", "conf_real", "cp_start", "cp_end",
+    "pareceres_externos", "relatorio_cp", "visita", "setoriais",
+]
+
+def _np_add_business_days(dates, num_days, calendar):
+    """Versão vetorizada de add_business_days (sem ajuste quando num_days <= 0)."""
+    # roll='backward' + n equivale ao n-ésimo dia útil estritamente após a data
+    shifted = np.busday_offset(dates, np.maximum(num_days, 0), roll='backward', busdaycal=calendar)
+    return np.where(num_days > 0, shifted, dates)
+
+def _np_deadline(start, num_days, susp_starts, susp_ends, calendar):
+    """Versão vetorizada de calculate_deadline_rigorous (uma linha por processo)."""
+    current = start.copy()
+    remaining = np.asarray(num_days, dtype=np.int64).copy()
+    one_day = np.timedelta64(1, 'D')
+    for j in range(susp_starts.shape[1]):
+        block_start, block_end = susp_starts[:, j], susp_ends[:, j]
+        candidate = _np_add_business_days(current, remaining, calendar)
+        jump = (block_end > current) & (remaining > 0) & (candidate >= block_start)
+        before = np.busday_count(current + one_day, np.maximum(block_start, current + one_day), busdaycal=calendar)
+        remaining = np.where(jump, remaining - before, remaining)
+        current = np.where(jump, np.maximum(current, block_end), current)
+    final = _np_add_business_days(current, remaining, calendar)
+    # Ajuste CPA: salta para o próximo útil
+    return np.busday_offset(final, 0, roll='forward', busdaycal=calendar)
+
+_EPOCH = date(1970, 1, 1).toordinal()
+
+def _numpy_calendar(first, last, business_calendar=None):
+    """np.busdaycalendar com os feriados do calendário partilhado entre first e last (até ao fim do ano)."""
+    business_calendar = as_business_calendar(business_calendar)
+    business_calendar.extend_to(first)
+    business_calendar.extend_to(date(last.year, 12, 31))
+    holidays = np.array(business_calendar.holiday_ordinals, dtype=np.int64) - _EPOCH
+    return np.busdaycalendar(holidays=holidays.astype('datetime64[D]'))
+
+def calculate_workflow_arrays(start, days, pea=None, susp_starts=None, susp_ends=None, business_calendar=None):
+    """Núcleo vetorizado de calculate_workflow sobre arrays (uma posição por processo).
+
+    ``start`` e ``pea`` são arrays datetime64[D] (NaT = sem PEA); ``days`` mapeia
+    cada chave de MILESTONES_DEFAULTS para um inteiro ou array de inteiros;
+    ``susp_starts``/``susp_ends`` são matrizes (processo x bloco) datetime64[D],
+    com NaT nos blocos sem uso. Os blocos podem vir desordenados ou sobrepostos.
+    ``business_calendar`` é o calendário comum a todas as linhas (por defeito, o nacional).
+    Devolve um dicionário com as colunas de PORTFOLIO_COLUMNS.
+    """
+    start = np.asarray(start, dtype='datetime64[D]')
+    n = len(start)
+    days = {key: np.broadcast_to(np.asarray(days.get(key, default), dtype=np.int64), (n,))
+            for key, default in MILESTONES_DEFAULTS[150].items()}
+    pea = np.full(n, np.datetime64('NaT'), dtype='datetime64[D]') if pea is None else np.asarray(pea, dtype='datetime64[D]')
+    if susp_starts is None:
+        susp_starts = susp_ends = np.empty((n, 0), dtype='datetime64[D]')
+
+    if not n:
+        return {key: np.empty(0, dtype='datetime64[D]') for key in PORTFOLIO_COLUMNS}
+
+    # Blocos sem uso passam para antes do início mais antigo; ordena por início em cada linha
+    valid = ~np.isnat(susp_starts) & ~np.isnat(susp_ends)
+    past = start.min() - np.timedelta64(1, 'D')
+    susp_starts = np.where(valid, susp_starts, past)
+    susp_ends = np.where(valid, susp_ends, past)
+    # (suspensões podem terminar antes do início: o mínimo é o menor fim, não ``past``)
+    floor = susp_ends.min(initial=past)
+    last_end = np.where(valid.any(axis=1), np.where(valid, susp_ends, floor).max(axis=1, initial=floor),
+                        np.datetime64('NaT'))
+    order = np.argsort(susp_starts, axis=1, kind='stable')
+    susp_starts = np.take_along_axis(susp_starts, order, axis=1)
+    susp_ends = np.take_along_axis(susp_ends, order, axis=1)
+    no_susp = np.empty((n, 0), dtype='datetime64[D]')
+
+    # Um só calendário para toda a carteira: até à última data conhecida (instrução ou fim de
+    # suspensão) mais a maior cadeia de prazos, com folga para fins de semana e feriados
+    known = np.concatenate([start, last_end[~np.isnat(last_end)]])
+    chain = max(max(int(days[key].max()) for key in ("reuniao", "conformidade", "ptf", "audiencia", "dia", "setoriais")),
+                int((days["conformidade"] + 5 + np.maximum(np.maximum(days["cp_duration"] + 7, 23), days["visita"])).max()))
+    horizon = known.max() + np.timedelta64(2 * max(chain, 0) + 60, 'D')
+    calendar = _numpy_calendar(known.min().astype(object), horizon.astype(object), business_calendar)
+
+    columns = {}
+    for key in ("reuniao", "conformidade", "ptf", "audiencia", "dia", "setoriais"):
+        columns[key] = _np_deadline(start, days[key], susp_starts, susp_ends, calendar)
+
+    # Conformidade com PEA: dias restantes aplicados após o fim da última suspensão
+    with_pea = ~np.isnat(pea) & ~np.isnat(last_end)
+    safe_pea = np.where(with_pea, pea, start)
+    day_after = start + np.timedelta64(1, 'D')
+    days_spent = np.busday_count(day_after, np.maximum(safe_pea, day_after), busdaycal=calendar)
+    remaining = np.maximum(days["conformidade"] - days_spent, 0)
+    conf_pea = _np_deadline(np.where(with_pea, last_end, start), remaining, no_susp, no_susp, calendar)
+    columns["conformidade"] = np.where(with_pea, conf_pea, columns["conformidade"])
+
+    columns["conf_teorica"] = _np_deadline(start, days["conformidade"], no_susp, no_susp, calendar)
+    columns["conf_real"] = columns["conformidade"]
+    columns["cp_start"] = _np_add_business_days(columns["conf_real"], np.full(n, 5), calendar)
+    columns["cp_end"] = _np_add_business_days(columns["cp_start"], days["cp_duration"], calendar)
+    columns["pareceres_externos"] = _np_add_business_days(columns["cp_start"], np.full(n, 23), calendar)
+    columns["relatorio_cp"] = _np_add_business_days(columns["cp_end"], np.full(n, 7), calendar)
+    columns["visita"] = _np_add_business_days(columns["cp_start"], days["visita"], calendar)
+
+    return {key: columns[key] for key in PORTFOLIO_COLUMNS}
+
+def calculate_portfolio(processes):
+    """Calcula o workflow de muitos processos de uma só vez (NumPy).
+
+    Cada processo é um dicionário com 'start_date', 'regime' (150 ou 90),
+    'pea_date' (opcional), 'suspensions' (lista de {'start', 'end'}) e,
+    opcionalmente, 'milestones_config', 'municipality' (concelho) e 'tolerance'
+    (tolerâncias de ponto). Devolve um dicionário de colunas (arrays
+    datetime64[D], uma posição por processo) com as chaves de
+    PORTFOLIO_COLUMNS, mais 'total_susp'. Os resultados coincidem com
+    calculate_workflow linha a linha.
+
+    Os processos são agrupados por calendário: cada concelho custa um só
+    calendário (partilhado), não um por processo.
+    """
+    processes = list(processes)
+    n = len(processes)
+    configs = [milestones_for(p.get("regime", 150), p.get("milestones_config")) for p in processes]
+    susp_sets = [SuspensionSet(p.get("suspensions") or []) for p in processes]
+
+    start = np.array([p["start_date"] for p in processes], dtype='datetime64[D]')
+    pea = np.array([p.get("pea_date") or np.datetime64('NaT') for p in processes], dtype='datetime64[D]')
+    days = {key: np.array([c[key] for c in configs], dtype=np.int64)
+            for key in MILESTONES_DEFAULTS[150]}
+
+    # Suspensões fundidas em matriz (processo x bloco); blocos vazios a NaT
+    width = max((len(ss) for ss in susp_sets), default=0)
+    susp_starts = np.full((n, width), _EPOCH, dtype=np.int64)
+    susp_ends = susp_starts.copy()
+    valid = np.zeros((n, width), dtype=bool)
+    for i, ss in enumerate(susp_sets):
+        susp_starts[i, :len(ss)] = ss._starts
+        susp_ends[i, :len(ss)] = ss._ends
+        valid[i, :len(ss)] = True
+    susp_starts = np.where(valid, (susp_starts - _EPOCH).astype('datetime64[D]'), np.datetime64('NaT'))
+    susp_ends = np.where(valid, (susp_ends - _EPOCH).astype('datetime64[D]'), np.datetime64('NaT'))
+
+    groups = {}
+    for i, p in enumerate(processes):
+        groups.setdefault(calendar_key(p.get("municipality"), p.get("tolerance") or ()), []).append(i)
+    if len(groups) <= 1:
+        key = next(iter(groups), (None, ()))
+        result = calculate_workflow_arrays(start, days, pea, susp_starts, susp_ends, get_business_calendar(*key))
+    else:
+        result = {key: np.empty(n, dtype='datetime64[D]') for key in PORTFOLIO_COLUMNS}
+        for key, rows in groups.items():
+            rows = np.array(rows)
+            part = calculate_workflow_arrays(start[rows], {k: v[rows] for k, v in days.items()}, pea[rows],
+                                             susp_starts[rows], susp_ends[rows], get_business_calendar(*key))
+            for column in PORTFOLIO_COLUMNS:
+                result[column][rows] = part[column]
+    result["total_susp"] = np.array([ss.total_days for ss in susp_sets], dtype=np.int64)
+    return result
+
+# --- LEITURA DE CARTEIRAS (CSV / JSON) ---
+
+def parse_date(value):
+    """Data em ISO (AAAA-MM-DD) ou formato português (DD/MM/AAAA); vazio -> None."""
+    if value is None or isinstance(value, date):
+        return value
+    value = str(value).strip()
+    if not value:
+        return None
+    for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y"):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            pass
+    raise ValueError(f"Data inválida: {value!r}")
+
+def parse_suspensions(value):
+    """Suspensões como lista de {'start', 'end'} ou texto 'início:fim;início:fim'."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = [part.split(":") for part in value.split(";") if part.strip()]
+        suspensions = [{'start': parse_date(a), 'end': parse_date(b)} for a, b in value]
+    else:
+        suspensions = [{'start': parse_date(s['start']), 'end': parse_date(s['end'])} for s in value]
+    SuspensionSet(suspensions)  # valida já (fim antes do início -> ValueError)
+    return suspensions
+
+def normalize_process(record):
+    """Converte um registo lido de ficheiro no dicionário de processo do motor."""
+    process = dict(record)
+    process["start_date"] = parse_date(record.get("start_date"))
+    if process["start_date"] is None:
+        raise ValueError(f"Falta a data de instrução (start_date) do processo {record.get('name') or '(sem nome)'}")
+    process["regime"] = int(record.get("regime") or 150)
+    process["pea_date"] = parse_date(record.get("pea_date"))
+    process["suspensions"] = parse_suspensions(record.get("suspensions"))
+    process["municipality"] = record.get("municipality") or None
+    process["tolerance"] = calendar_key(None, record.get("tolerance") or ())[1]
+    return process
+
+def iter_portfolio(path):
+    """Lê uma carteira registo a registo (sem a carregar toda para memória).
+
+    Formatos: CSV (colunas name, start_date, regime, pea_date, suspensions e,
+    opcionalmente, typology, sector, municipality e tolerance), JSON Lines (.jsonl, um objeto por
+    linha) ou JSON (lista de objetos; este é lido de uma só vez).
+    """
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, encoding="utf-8-sig", newline="") as fh:
+        yield from read_portfolio(fh, ext)
+
+def read_portfolio(fh, ext):
+    """Como iter_portfolio, a partir de um ficheiro de texto já aberto (ex.: um upload)."""
+    if ext == ".csv":
+        records = csv.DictReader(fh)
+    elif ext == ".jsonl":
+        records = (json.loads(line) for line in fh if line.strip())
+    elif ext == ".json":
+        records = json.load(fh)
+    else:
+        raise ValueError(f"Formato de carteira não suportado: {ext}")
+    for number, record in enumerate(records, start=1):
+        try:
+            process = normalize_process(record)
+        except (ValueError, KeyError, TypeError) as e:
+            raise ValueError(f"Registo {number}: {e}") from e
+        yield process
+
+def iter_chunks(iterable, size):
+    """Agrupa um iterável em listas de até `size` elementos."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def iter_results(processes, chunk_size=1000, first_index=0):
+    """Calcula uma carteira por blocos e devolve uma linha (dicionário) por processo.
+
+    Cada bloco é calculado de uma só vez com calculate_portfolio, pelo que as
+    linhas vão saindo à medida que os blocos ficam prontos. As datas vêm em
+    ISO; 'name' vem do processo (ou do índice na carteira, a contar de first_index).
+    """
+    index = first_index
+    for chunk in iter_chunks(processes, chunk_size):
+        columns = calculate_portfolio(chunk)
+        as_text = {key: np.datetime_as_string(columns[key], unit='D') for key in PORTFOLIO_COLUMNS}
+        for i, process in enumerate(chunk):
+            row = {"name": process.get("name") or str(index)}
+            row.update((key, str(as_text[key][i])) for key in PORTFOLIO_COLUMNS)
+            row["total_susp"] = int(columns["total_susp"][i])
+            yield row
+            index += 1
@@ -0,0 +1,202 @@
+"""Reconciliação de uma carteira exportada da folha de cálculo da CCDR com o motor.
+
+Lê o ficheiro (CSV ou Excel .xlsx, este em modo só de leitura) linha a
+linha, calcula as datas de cada bloco de linhas com o motor NumPy de
+carteira e escreve, também em fluxo, um relatório CSV com cada marco em que a
+data da folha difere da nossa. A memória usada não depende do tamanho do
+ficheiro: só um bloco de linhas e os contadores do resumo ficam em memória.
+
+Uso: python reconcile.py folha.xlsx -o diferencas.csv [--sheet NOME] [--map "Coluna=chave"]
+"""
+import argparse
+import csv
+from datetime import date, datetime, timedelta
+import os
+import sys
+import time
+import unicodedata
+
+from engine import get_business_calendar
+from portfolio import PORTFOLIO_COLUMNS, calculate_portfolio, iter_chunks, normalize_process, parse_date
+
+# Cabeçalhos habituais da folha (sem acentos, minúsculas) -> chaves do motor.
+# As próprias chaves (start_date, dia, cp_start, ...) também são aceites.
+DEFAULT_COLUMN_MAP = {
+    "processo": "name", "nome": "name", "projeto": "name", "nome do projeto": "name",
+    "data de instrucao": "start_date", "instrucao": "start_date", "dia 0": "start_date",
+    "regime": "regime", "prazo global": "regime",
+    "pea": "pea_date", "data do pea": "pea_date",
+    "suspensoes": "suspensions",
+    "concelho": "municipality", "municipio": "municipality",
+    "tolerancias": "tolerance", "tolerancias de ponto": "tolerance",
+    "reuniao": "reuniao", "data reuniao": "reuniao",
+    "conformidade": "conformidade", "limite conformidade": "conformidade",
+    "ptf": "ptf", "envio ptf": "ptf", "envio ptf a aaia": "ptf",
+    "audiencia": "audiencia", "audiencia de interessados": "audiencia",
+    "dia": "dia", "emissao da dia": "dia", "decisao final": "dia",
+    "conformidade teorica": "conf_teorica",
+    "inicio cp": "cp_start", "inicio consulta publica": "cp_start",
+    "fim cp": "cp_end", "fim consulta publica": "cp_end",
+    "pareceres externos": "pareceres_externos",
+    "relatorio cp": "relatorio_cp", "envio do relatorio da cp": "relatorio_cp",
+    "visita": "visita", "visita tecnica": "visita",
+    "setoriais": "setoriais", "pareceres setoriais": "setoriais",
+}
+
+INPUT_KEYS = ("name", "start_date", "regime", "pea_date", "suspensions", "municipality", "tolerance")
+
+REPORT_FIELDS = ["linha", "processo", "marco", "folha", "motor", "dif_dias", "dif_dias_uteis", "nota"]
+
+# Origem das datas de série do Excel (sistema 1900, com o falso 29/02/1900)
+_EXCEL_EPOCH = date(1899, 12, 30)
+
+
+def _normalize_header(header):
+    text = unicodedata.normalize("NFKD", str(header or "")).encode("ascii", "ignore").decode("ascii")
+    return " ".join(text.lower().replace("_", " ").replace(".", " ").split())
+
+
+def resolve_columns(headers, column_map=None):
+    """Índice da coluna -> chave do motor, para os cabeçalhos reconhecidos."""
+    mapping = {_normalize_header(k): v for k, v in DEFAULT_COLUMN_MAP.items()}
+    mapping.update({_normalize_header(key): key for key in INPUT_KEYS + tuple(PORTFOLIO_COLUMNS)})
+    mapping.update({_normalize_header(k): v for k, v in (column_map or {}).items()})
+    columns = {}
+    for i, header in enumerate(headers):
+        key = mapping.get(_normalize_header(header))
+        if key is not None and key not in columns.values():
+            columns[i] = key
+    return columns
+
+
+def _cell_date(value):
+    """Data de uma célula (date/datetime do Excel, número de série ou texto)."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return _EXCEL_EPOCH + timedelta(days=int(value))
+    return value
+
+
+def iter_sheet_rows(path, sheet=None):
+    """Linhas (listas de valores) do ficheiro, começando pelo cabeçalho.
+
+    CSV com csv.reader; .xlsx/.xlsm com openpyxl em modo só de leitura
+    (importado apenas aqui), sem carregar a folha inteira.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        with open(path, encoding="utf-8-sig", newline="") as fh:
+            sample = fh.read(4096)
+            fh.seek(0)
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t") if sample else csv.excel
+            yield from csv.reader(fh, dialect)
+    elif ext in (".xlsx", ".xlsm"):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise RuntimeError("A leitura de Excel requer a biblioteca 'openpyxl' (pip install openpyxl).")
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            worksheet = workbook[sheet] if sheet else workbook.worksheets[0]
+            for row in worksheet.iter_rows(values_only=True):
+                yield list(row)
+        finally:
+            workbook.close()
+    else:
+        raise ValueError(f"Formato não suportado: {ext}")
+
+
+def iter_records(path, sheet=None, column_map=None):
+    """Registos (nº da linha, {chave: valor}) da folha, com os cabeçalhos já traduzidos."""
+    rows = iter_sheet_rows(path, sheet)
+    headers = next(rows, None)
+    if headers is None:
+        return
+    columns = resolve_columns(headers, column_map)
+    if "start_date" not in columns.values():
+        raise ValueError("A folha não tem coluna de data de instrução (use --map \"Coluna=start_date\").")
+    for line, row in enumerate(rows, start=2):
+        if not any(v not in (None, "") for v in row):
+            continue
+        yield line, {key: row[i] for i, key in columns.items() if i < len(row)}
+
+
+def reconcile(records, report, chunk_size=1000):
+    """Compara as datas da folha com as do motor e escreve as diferenças em ``report``.
+
+    ``records`` são pares (linha, registo) como os de iter_records; ``report``
+    é um csv.writer (ou algo com writerow). Devolve o resumo: linhas lidas,
+    linhas com diferenças, erros de leitura e diferenças por marco.
+    """
+    summary = {"rows": 0, "rows_with_mismatch": 0, "errors": 0, "mismatches": {}}
+    for chunk in iter_chunks(records, chunk_size):
+        parsed = []
+        for line, record in chunk:
+            summary["rows"] += 1
+            try:
+                inputs = {key: record.get(key) for key in INPUT_KEYS}
+                inputs["start_date"] = _cell_date(inputs["start_date"])
+                inputs["pea_date"] = _cell_date(inputs["pea_date"])
+                process = normalize_process(inputs)
+                calendar = get_business_calendar(process["municipality"], process["tolerance"])
+                expected = {key: parse_date(_cell_date(record[key])) for key in PORTFOLIO_COLUMNS
+                            if record.get(key) not in (None, "")}
+            except (ValueError, KeyError, TypeError) as e:
+                summary["errors"] += 1
+                report.writerow([line, record.get("name") or "", "", "", "", "", "", f"Erro de leitura: {e}"])
+                continue
+            parsed.append((line, process, expected, calendar))
+        if not parsed:
+            continue
+
+        columns = calculate_portfolio([process for _, process, _, _ in parsed])
+        for i, (line, process, expected, calendar) in enumerate(parsed):
+            mismatch = False
+            for key, sheet_date in expected.items():
+                ours = columns[key][i].astype(object)
+                if ours == sheet_date:
+                    continue
+                mismatch = True
+                summary["mismatches"][key] = summary["mismatches"].get(key, 0) + 1
+                business = (calendar.business_days_between(sheet_date, ours) if ours >= sheet_date
+                            else -calendar.business_days_between(ours, sheet_date))
+                report.writerow([line, process.get("name") or "", key, sheet_date.isoformat(),
+                                 ours.isoformat(), (ours - sheet_date).days, business, ""])
+            summary["rows_with_mismatch"] += mismatch
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reconciliação das datas da folha da CCDR com o motor de prazos.")
+    parser.add_argument("sheet_file", help="Folha exportada (.xlsx ou .csv)")
+    parser.add_argument("-o", "--output", default="-", help="Relatório CSV das diferenças (por defeito, stdout)")
+    parser.add_argument("--sheet", default=None, help="Nome da folha no Excel (por defeito, a primeira)")
+    parser.add_argument("--map", action="append", default=[], metavar="COLUNA=CHAVE",
+                        help="Associa um cabeçalho da folha a uma chave do motor (repetível)")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    column_map = dict(item.split("=", 1) for item in args.map)
+    t_start = time.perf_counter()
+    records = iter_records(args.sheet_file, args.sheet, column_map)
+    if args.output == "-":
+        writer = csv.writer(sys.stdout)
+        writer.writerow(REPORT_FIELDS)
+        summary = reconcile(records, writer, args.chunk_size)
+    else:
+        with open(args.output, "w", encoding="utf-8", newline="") as fh:
+            writer = csv.writer(fh)
+            writer.writerow(REPORT_FIELDS)
+            summary = reconcile(records, writer, args.chunk_size)
+
+    elapsed = time.perf_counter() - t_start
+    print(f"{summary['rows']} linhas em {elapsed:.2f} s · com diferenças: {summary['rows_with_mismatch']}"
+          f" · erros: {summary['errors']}", file=sys.stderr)
+    for key, count in sorted(summary["mismatches"].items(), key=lambda kv: -kv[1]):
+        print(f"  {key:<20} {count}", file=sys.stderr)
+    return 1 if summary["rows_with_mismatch"] or summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+"""Registo persistente de processos (SQLite): entradas, suspensões e datas dos prazos.
+
+As datas de cada processo são calculadas uma vez (compute_workflow) e
+guardadas numa tabela indexada por data, pelo que "todos os prazos dos
+próximos N dias úteis" é uma única consulta por intervalo. Ao gravar um
+processo, as datas só são recalculadas se as entradas mudaram (hash das
+entradas normalizadas, o mesmo da cache de resultados).
+"""
+from datetime import date
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from cache import workflow_cache_key
+from engine import SuspensionSet, calendar_key, compute_workflow, get_business_calendar, milestones_for
+
+# Por defeito, junto ao código (a app e a CLI usam a mesma base, seja qual for a pasta de arranque)
+DEFAULT_DB_PATH = os.environ.get("AIA_REGISTRY_DB") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "registo_aia.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS processes (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    typology TEXT,
+    sector TEXT,
+    municipality TEXT,
+    tolerance TEXT,
+    regime INTEGER NOT NULL,
+    start_date TEXT NOT NULL,
+    pea_date TEXT,
+    milestones_config TEXT NOT NULL,
+    inputs_hash TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS suspensions (
+    process_id INTEGER NOT NULL REFERENCES processes(id) ON DELETE CASCADE,
+    start_date TEXT NOT NULL,
+    end_date TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_suspensions_process ON suspensions(process_id);
+CREATE TABLE IF NOT EXISTS milestones (
+    process_id INTEGER NOT NULL REFERENCES processes(id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    label TEXT NOT NULL,
+    reference TEXT,
+    due_date TEXT NOT NULL,
+    PRIMARY KEY (process_id, kind, position)
+);
+CREATE INDEX IF NOT EXISTS idx_milestones_due ON milestones(due_date);
+"""
+
+# Colunas acrescentadas depois da primeira versão do esquema (migradas com ALTER TABLE)
+_ADDED_COLUMNS = {"municipality": "TEXT", "tolerance": "TEXT"}
+
+# Tipos de marco guardados na tabela milestones
+MAIN = "principal"
+COMPLEMENTARY = "complementar"
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def _from_iso(value):
+    return date.fromisoformat(value) if value else None
+
+
+class ProcessRegistry:
+    """Registo SQLite de processos AIA (uma ligação partilhada, protegida por lock)."""
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA foreign_keys = ON")
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.executescript(SCHEMA)
+            existing = {r["name"] for r in self._conn.execute("PRAGMA table_info(processes)")}
+            for column, kind in _ADDED_COLUMNS.items():
+                if column not in existing:
+                    self._conn.execute(f"ALTER TABLE processes ADD COLUMN {column} {kind}")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # --- escrita ---
+
+    def save_process(self, name, start_date, regime=150, suspensions=(), milestones_config=None,
+                     pea_date=None, typology=None, sector=None, municipality=None, tolerance=()):
+        """Grava (ou atualiza) o processo ``name``.
+
+        Devolve (id, recalculado): as datas só são recalculadas e regravadas
+        quando as entradas (início, regime, prazos, PEA, suspensões, concelho e
+        tolerâncias de ponto) mudaram.
+        """
+        milestones_config = milestones_for(regime, milestones_config)
+        suspensions = SuspensionSet(suspensions)
+        calendar = calendar_key(municipality, tolerance)
+        inputs_hash = workflow_cache_key(start_date, regime, milestones_config, pea_date, suspensions, calendar)
+        now = time.strftime("%Y-%m-%dT%H:%M:%S")
+
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT id, inputs_hash FROM processes WHERE name = ?", (name,)).fetchone()
+            if row is not None and row["inputs_hash"] == inputs_hash:
+                self._conn.execute("UPDATE processes SET typology = ?, sector = ?, updated_at = ? WHERE id = ?",
+                                   (typology, sector, now, row["id"]))
+                return row["id"], False
+
+            values = (typology, sector, calendar[0], ",".join(calendar[1]), regime, _iso(start_date),
+                      _iso(pea_date), json.dumps(milestones_config, sort_keys=True), inputs_hash, now)
+            if row is None:
+                process_id = self._conn.execute(
+                    "INSERT INTO processes (typology, sector, municipality, tolerance, regime, start_date, pea_date,"
+                    " milestones_config, inputs_hash, updated_at, name) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    values + (name,)
+                ).lastrowid
+            else:
+                process_id = row["id"]
+                self._conn.execute(
+                    "UPDATE processes SET typology = ?, sector = ?, municipality = ?, tolerance = ?, regime = ?,"
+                    " start_date = ?, pea_date = ?, milestones_config = ?, inputs_hash = ?, updated_at = ?"
+                    " WHERE id = ?", values + (process_id,)
+                )
+            self._write_dates(process_id, start_date, suspensions, milestones_config, pea_date, calendar)
+            return process_id, True
+
+    def _write_dates(self, process_id, start_date, suspensions, milestones_config, pea_date, calendar=(None, ())):
+        result = compute_workflow(start_date, suspensions, milestones_config, pea_date, get_business_calendar(*calendar))
+        self._conn.execute("DELETE FROM suspensions WHERE process_id = ?", (process_id,))
+        self._conn.execute("DELETE FROM milestones WHERE process_id = ?", (process_id,))
+        self._conn.executemany(
+            "INSERT INTO suspensions (process_id, start_date, end_date) VALUES (?, ?, ?)",
+            [(process_id, _iso(s["start"]), _iso(s["end"])) for s in suspensions],
+        )
+        rows = [(process_id, MAIN, i, label, legal, _iso(day))
+                for i, (_, label, legal, day) in enumerate(result.main_rows())]
+        rows += [(process_id, COMPLEMENTARY, i, label, reference, _iso(day))
+                 for i, (_, label, reference, day) in enumerate(result.complementary_rows())]
+        self._conn.executemany(
+            "INSERT INTO milestones (process_id, kind, position, label, reference, due_date)"
+            " VALUES (?, ?, ?, ?, ?, ?)", rows,
+        )
+
+    def delete_process(self, name):
+        with self._lock, self._conn:
+            return self._conn.execute("DELETE FROM processes WHERE name = ?", (name,)).rowcount > 0
+
+    def recompute_all(self):
+        """Recalcula as datas de todos os processos (ex.: após mudar as regras de feriados)."""
+        with self._lock, self._conn:
+            processes = self._conn.execute("SELECT * FROM processes").fetchall()
+            for row in processes:
+                suspensions = self._suspensions(row["id"])
+                self._write_dates(row["id"], _from_iso(row["start_date"]), SuspensionSet(suspensions),
+                                  json.loads(row["milestones_config"]), _from_iso(row["pea_date"]),
+                                  calendar_key(row["municipality"], row["tolerance"] or ()))
+        return len(processes)
+
+    # --- leitura ---
+
+    def _suspensions(self, process_id):
+        rows = self._conn.execute("SELECT start_date, end_date FROM suspensions WHERE process_id = ?"
+                                  " ORDER BY start_date", (process_id,)).fetchall()
+        return [{'start': _from_iso(r["start_date"]), 'end': _from_iso(r["end_date"])} for r in rows]
+
+    def _process(self, row, suspensions=None):
+        if suspensions is None:
+            suspensions = self._suspensions(row["id"])
+        return {
+            "id": row["id"], "name": row["name"], "typology": row["typology"], "sector": row["sector"],
+            "municipality": row["municipality"], "tolerance": calendar_key(None, row["tolerance"] or ())[1],
+            "regime": row["regime"], "start_date": _from_iso(row["start_date"]),
+            "pea_date": _from_iso(row["pea_date"]), "milestones_config": json.loads(row["milestones_config"]),
+            "suspensions": suspensions, "updated_at": row["updated_at"],
+        }
+
+    def get_process(self, name):
+        """Processo gravado (dicionário com as entradas e as suspensões) ou None."""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM processes WHERE name = ?", (name,)).fetchone()
+            return self._process(row) if row is not None else None
+
+    def processes(self):
+        """Todos os processos gravados (como get_process), com duas consultas apenas."""
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM processes ORDER BY name").fetchall()
+            suspensions = {}
+            for r in self._conn.execute("SELECT process_id, start_date, end_date FROM suspensions ORDER BY start_date"):
+                suspensions.setdefault(r["process_id"], []).append(
+                    {'start': _from_iso(r["start_date"]), 'end': _from_iso(r["end_date"])})
+            return [self._process(row, suspensions.get(row["id"], [])) for row in rows]
+
+    def version(self):
+        """Muda sempre que o registo é alterado, por esta ou por outra ligação (chave para caches
+        de vistas derivadas): PRAGMA data_version conta os commits das outras ligações ao ficheiro
+        e total_changes as escritas desta."""
+        with self._lock:
+            return self._conn.execute("PRAGMA data_version").fetchone()[0], self._conn.total_changes
+
+    def list_processes(self):
+        """Resumo dos processos: nome, regime, início e data prevista da DIA."""
+        with self._lock:
+            # A DIA é a última etapa principal (posição 4)
+            rows = self._conn.execute(
+                "SELECT p.name, p.regime, p.start_date, p.updated_at, m.due_date AS dia FROM processes p"
+                " LEFT JOIN milestones m ON m.process_id = p.id AND m.kind = ? AND m.position = 4"
+                " ORDER BY p.name", (MAIN,)
+            ).fetchall()
+        return [{"name": r["name"], "regime": r["regime"], "start_date": _from_iso(r["start_date"]),
+                 "dia": _from_iso(r["dia"]), "updated_at": r["updated_at"]} for r in rows]
+
+    def milestones(self, name):
+        """Datas guardadas de um processo, por ordem (principais e depois complementares)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT m.kind, m.label, m.reference, m.due_date FROM milestones m"
+                " JOIN processes p ON p.id = m.process_id WHERE p.name = ?"
+                " ORDER BY m.kind DESC, m.position", (name,)
+            ).fetchall()
+        return [{"kind": r["kind"], "label": r["label"], "reference": r["reference"],
+                 "due_date": _from_iso(r["due_date"])} for r in rows]
+
+    def deadlines_between(self, first, last, kinds=(MAIN, COMPLEMENTARY)):
+        """Prazos de todos os processos com data em [first, last] (consulta pelo índice de datas)."""
+        placeholders = ", ".join("?" for _ in kinds)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT p.name, m.kind, m.label, m.due_date FROM milestones m"
+                " JOIN processes p ON p.id = m.process_id"
+                f" WHERE m.due_date BETWEEN ? AND ? AND m.kind IN ({placeholders})"
+                " ORDER BY m.due_date, p.name, m.kind DESC, m.position",
+                (_iso(first), _iso(last), *kinds),
+            ).fetchall()
+        return [{"process": r["name"], "kind": r["kind"], "label": r["label"],
+                 "due_date": _from_iso(r["due_date"])} for r in rows]
+
+    def upcoming_deadlines(self, business_days=10, today=None, kinds=(MAIN, COMPLEMENTARY)):
+        """Prazos dos próximos ``business_days`` dias úteis (de hoje, inclusive, até ao último)."""
+        today = today or date.today()
+        last = get_business_calendar().add_business_days(today, business_days)
+        return self.deadlines_between(today, last, kinds)
@@ -0,0 +1,252 @@
+"""Geração do relatório PDF (matplotlib e fpdf só são importados a pedido).
+
+Todo o processo decorre em memória: o Gantt é desenhado num canvas Agg e
+embebido no PDF sem ficheiros temporários. Imagens e PDFs ficam em cache
+pelo hash do conteúdo, pelo que repetir o mesmo relatório não custa nada.
+"""
+import hashlib
+import importlib.util
+import json
+import time
+import zlib
+
+import timing
+from cache import TTLCache
+
+# Caches partilhadas pelo processo (imagens do Gantt e PDFs finais)
+_IMAGE_CACHE = TTLCache(maxsize=64, ttl=3600)
+_PDF_CACHE = TTLCache(maxsize=64, ttl=3600)
+
+def fpdf_available():
+    """Indica se a biblioteca 'fpdf' está instalada (sem a importar)."""
+    return importlib.util.find_spec("fpdf") is not None
+
+def _content_hash(*parts):
+    payload = json.dumps(parts, default=str, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+# ==========================================
+# GANTT (MATPLOTLIB, EM MEMÓRIA)
+# ==========================================
+def _draw_gantt(result, suspensions):
+    """Desenha o Gantt num canvas Agg e devolve {'width', 'height', 'data'} (RGB comprimido)."""
+    import numpy as np
+    import matplotlib.dates as mdates
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    tasks = []
+    start_dates = []
+    end_dates = []
+    colors = []
+    
+    for task, start, end in result.phase_bars():
+        tasks.append(task)
+        start_dates.append(start)
+        end_dates.append(end)
+        colors.append('skyblue')
+        
+    for s in suspensions:
+        tasks.append("Suspensão")
+        start_dates.append(s['start'])
+        end_dates.append(s['end'])
+        colors.append('salmon')
+        
+    cp_start, cp_end = result.cp_period()
+    tasks.append("Consulta Pública")
+    start_dates.append(cp_start)
+    end_dates.append(cp_end)
+    colors.append('lightgreen')
+
+    # Figure/canvas próprios (sem pyplot): seguro em threads e sem estado global
+    fig = Figure(figsize=(10, 6), dpi=100)
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.subplots()
+    # Todas as barras numa só chamada (duração mínima de 1 dia)
+    start_num = mdates.date2num(start_dates)
+    duration = np.maximum(mdates.date2num(end_dates) - start_num, 1)
+    ax.barh(tasks, duration, left=start_num, color=colors, align='center', edgecolor='grey')
+        
+    ax.xaxis_date()
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
+    ax.tick_params(axis='x', labelrotation=45)
+    ax.grid(axis='x', linestyle='--', alpha=0.5)
+    fig.tight_layout()
+    canvas.draw()
+
+    rgba = np.asarray(canvas.buffer_rgba())
+    height, width = rgba.shape[:2]
+    return {"width": width, "height": height, "data": zlib.compress(rgba[:, :, :3].tobytes())}
+
+def render_gantt_image(result, suspensions):
+    """Imagem do Gantt (em cache pelo hash das entradas)."""
+    key = _content_hash("gantt", result.key(), list(suspensions))
+    return _IMAGE_CACHE.get_or_compute(key, lambda: _draw_gantt(result, suspensions))
+
+def _place_image(pdf, image, name, x, y, w):
+    """Embebe uma imagem RGB em memória no PDF."""
+    if hasattr(pdf, "_parsepng"):
+        # PyFPDF 1.x só lê ficheiros: regista diretamente o XObject (RGB + FlateDecode)
+        if name not in pdf.images:
+            pdf.images[name] = {
+                "i": len(pdf.images) + 1, "w": image["width"], "h": image["height"],
+                "cs": "DeviceRGB", "bpc": 8, "f": "FlateDecode", "data": image["data"],
+            }
+        pdf.image(name, x=x, y=y, w=w)
+    else:
+        # fpdf2 aceita imagens PIL
+        from PIL import Image
+        raster = Image.frombytes("RGB", (image["width"], image["height"]), zlib.decompress(image["data"]))
+        pdf.image(raster, x=x, y=y, w=w)
+
+# ==========================================
+# GERADOR DE PDF
+# ==========================================
+def create_pdf(project_name, typology, sector, regime, result, suspensions, timings=None):
+    """Relatório PDF (bytes) de um WorkflowResult. Se ``timings`` for um dicionário,
+    recebe os tempos (segundos) das fases 'grafico' e 'pdf' e se o resultado veio da 'cache'."""
+    # Importações diferidas: só carregam quando um PDF é pedido
+    try:
+        from fpdf import FPDF
+    except ImportError:
+        return None
+    if timings is None:
+        timings = {}
+
+    key = _content_hash("pdf", project_name, typology, sector, regime, result.key(), list(suspensions))
+    cached = _PDF_CACHE.get(key)
+    timings.update(grafico=0.0, pdf=0.0, cache=cached is not None)
+    if cached is not None:
+        return cached
+    t_start = time.perf_counter()
+
+    class PDF(FPDF):
+        def header(self):
+            self.set_font('Arial', 'B', 10)
+            self.set_text_color(30, 58, 138)
+            self.cell(0, 10, 'CCDR CENTRO - AUTORIDADE DE AIA', 0, 1, 'C')
+            self.line(10, 20, 200, 20)
+            self.ln(10)
+        def footer(self):
+            self.set_y(-15)
+            self.set_font('Arial', 'I', 8)
+            self.set_text_color(128, 128, 128)
+            self.cell(0, 10, f'Pagina {self.page_no()}', 0, 0, 'C')
+
+    pdf = PDF()
+    pdf.add_page()
+    
+    pdf.set_font("Arial", "B", 16)
+    pdf.set_text_color(15, 23, 42)
+    safe_title = f"Relatorio de Prazos: {project_name}"
+    pdf.multi_cell(0, 10, safe_title.encode('latin-1', 'replace').decode('latin-1'), align='L')
+    pdf.ln(5)
+
+    # 1. Enquadramento
+    pdf.set_fill_color(241, 245, 249)
+    pdf.set_font("Arial", "B", 11)
+    pdf.cell(0, 8, "1. Enquadramento e Legislacao", 0, 1, 'L', 1)
+    pdf.ln(2)
+    
+    pdf.set_font("Arial", "B", 10)
+    pdf.cell(40, 6, "Tipologia:", 0, 0)
+    pdf.set_font("Arial", "", 10)
+    pdf.multi_cell(0, 6, typology.encode('latin-1','replace').decode('latin-1'))
+    pdf.set_font("Arial", "B", 10)
+    pdf.cell(40, 6, "Setor:", 0, 0)
+    pdf.set_font("Arial", "", 10)
+    pdf.cell(0, 6, sector.encode('latin-1','replace').decode('latin-1'), 0, 1)
+    pdf.ln(2)
+    
+    # 2. Resumo
+    pdf.set_font("Arial", "B", 11)
+    pdf.cell(0, 8, "2. Resumo", 0, 1, 'L', 1)
+    pdf.ln(2)
+    pdf.set_font("Arial", "", 10)
+    pdf.cell(50, 6, "Regime:", 0, 0)
+    pdf.cell(0, 6, f"{regime}", 0, 1)
+    pdf.cell(50, 6, "Data de Instrucao:", 0, 0)
+    pdf.cell(0, 6, result.start_date.strftime('%d/%m/%Y'), 0, 1)
+    pdf.cell(50, 6, "Total Suspensao:", 0, 0)
+    pdf.cell(0, 6, f"{result.total_susp} dias", 0, 1)
+    pdf.ln(5)
+
+    # 3. Cronograma Oficial
+    pdf.set_font("Arial", "B", 11)
+    pdf.cell(0, 8, "3. Cronograma Oficial (Fases Principais)", 0, 1, 'L', 1)
+    pdf.ln(2)
+    
+    pdf.set_font("Arial", "B", 9)
+    pdf.set_fill_color(226, 232, 240)
+    pdf.cell(90, 8, "Etapa", 1, 0, 'L', 1)
+    pdf.cell(40, 8, "Prazo Legal", 1, 0, 'C', 1)
+    pdf.cell(40, 8, "Data Prevista", 1, 1, 'C', 1)
+    
+    pdf.set_font("Arial", "", 9)
+    pdf.ln()
+    pdf.cell(90, 8, "Entrada / Instrucao", 1, 0, 'L')
+    pdf.cell(40, 8, "Dia 0", 1, 0, 'C')
+    pdf.cell(40, 8, result.start_date.strftime('%d/%m/%Y'), 1, 1, 'C')
+    pdf.ln()
+    
+    for _, label, legal, day in result.main_rows():
+        pdf.cell(90, 8, label.encode('latin-1','replace').decode('latin-1'), 1)
+        pdf.cell(40, 8, legal, 1, 0, 'C')
+        pdf.cell(40, 8, day.strftime('%d/%m/%Y'), 1, 0, 'C')
+        pdf.ln()
+
+    # 4. Prazos Complementares
+    complementary = result.complementary_rows()
+    if complementary:
+        pdf.ln(5)
+        pdf.set_font("Arial", "B", 11)
+        pdf.cell(0, 8, "4. Prazos Complementares e Setoriais", 0, 1, 'L', 1)
+        pdf.set_font("Arial", "", 9)
+        
+        pdf.set_font("Arial", "B", 9)
+        pdf.cell(90, 8, "Etapa", 1, 0, 'L', 1)
+        pdf.cell(40, 8, "Referencia", 1, 0, 'C', 1)
+        pdf.cell(40, 8, "Data Prevista", 1, 1, 'C', 1)
+        pdf.ln()
+        
+        pdf.set_font("Arial", "", 9)
+        for _, label, reference, day in complementary:
+            pdf.cell(90, 8, label.encode('latin-1','replace').decode('latin-1'), 1)
+            pdf.cell(40, 8, reference.encode('latin-1','replace').decode('latin-1'), 1)
+            pdf.cell(40, 8, day.strftime('%d/%m/%Y'), 1)
+            pdf.ln()
+
+    # 5. Suspensões
+    if suspensions:
+        pdf.ln(5)
+        pdf.set_font("Arial", "B", 11)
+        pdf.cell(0, 8, "Registo de Suspensoes", 0, 1, 'L', 1)
+        pdf.set_font("Arial", "", 9)
+        for s in suspensions:
+            dur = (s['end'] - s['start']).days + 1
+            pdf.cell(0, 6, f"- {s['start'].strftime('%d/%m/%Y')} a {s['end'].strftime('%d/%m/%Y')} ({dur} dias)", 0, 1)
+            pdf.ln()
+
+    # 6. Cronograma Visual
+    pdf.add_page()
+    pdf.set_font("Arial", "B", 12)
+    pdf.cell(0, 10, "5. Cronograma Visual (Gantt)", 0, 1)
+    
+    try:
+        t_chart = time.perf_counter()
+        image = render_gantt_image(result, suspensions)
+        timings["grafico"] = time.perf_counter() - t_chart
+        _place_image(pdf, image, "gantt", x=10, y=30, w=190)
+        
+    except Exception as e:
+        pdf.ln(5)
+        pdf.set_font("Arial", "I", 10)
+        pdf.cell(0, 10, f"Erro no grafico: {str(e)}", 0, 1)
+
+    pdf_bytes = pdf.output(dest='S').encode('latin-1')
+    timings["pdf"] = time.perf_counter() - t_start - timings["grafico"]
+    if timing.enabled():
+        timing.record("pdf.grafico", timings["grafico"])
+        timing.record("pdf.montagem", timings["pdf"])
+    _PDF_CACHE.set(key, pdf_bytes)
+    return pdf_bytes
@@ -0,0 +1,246 @@
+"""Serviço HTTP local (asyncio, só biblioteca padrão) para o motor de prazos.
+
+Endpoints (JSON):
+  GET  /health    -> {"status": "ok"}
+  POST /workflow  -> um processo; devolve marcos, complementares e dias suspensos
+  POST /batch     -> {"processes": [...]}; devolve uma linha por processo
+  POST /ics       -> {"processes": [...]}; calendário iCalendar, enviado por blocos (chunked)
+
+Os processos usam o formato das carteiras (start_date, regime, pea_date,
+suspensions, opcionalmente name, milestones_config, municipality e tolerance). Os lotes são divididos
+em blocos e calculados num conjunto de processos (motor NumPy), onde o
+calendário de feriados é preparado uma vez por processo e por bloco, e não
+por pedido. Funciona sem rede externa.
+
+Uso: python server.py [--host 127.0.0.1] [--port 8765] [--workers N]
+"""
+import argparse
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+import json
+import os
+import signal
+import sys
+
+from engine import compute_workflow, get_business_calendar, milestones_for
+from ics import iter_calendar, portfolio_events
+from portfolio import iter_chunks, iter_results, normalize_process
+
+MAX_BODY = 64 * 1024 * 1024  # bytes
+BATCH_CHUNK = 2000  # processos por tarefa enviada aos workers
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+def _json_default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} não é serializável")
+
+
+def workflow_response(record):
+    """Resposta de /workflow para um processo (já lido do JSON)."""
+    process = _checked_process(record)
+    result = compute_workflow(
+        process["start_date"], process["suspensions"], process["milestones_config"], process["pea_date"],
+        get_business_calendar(process["municipality"], process["tolerance"]),
+    )
+    milestones, complementary, total_susp, _, gantt_data = result.legacy()
+    return {"milestones": milestones, "complementary": complementary, "total_susp": total_susp, "gantt": gantt_data}
+
+
+def _warm_worker():
+    # Carrega feriados de um horizonte largo uma só vez por processo do pool
+    today = date.today()
+    get_business_calendar().extend_to(date(today.year + 5, 12, 31))
+
+
+def batch_rows(records, first_index=0):
+    """Linhas calculadas para um bloco de processos (corre num worker)."""
+    return list(iter_results((_checked_process(r) for r in records), len(records) or 1, first_index))
+
+
+def _checked_process(record):
+    """Processo normalizado e validado, igual para /workflow, /batch e /ics (datas, regime,
+    prazos completados com os do regime, calendário); erros como ValueError/KeyError/TypeError."""
+    process = normalize_process(record)
+    process["milestones_config"] = milestones_for(process["regime"], process.get("milestones_config"))
+    get_business_calendar(process["municipality"], process["tolerance"])
+    return process
+
+
+def batch_ics(processes, first_index=0):
+    """Eventos ICS (texto) de um bloco de processos já validados (corre num worker)."""
+    events = portfolio_events(processes, len(processes) or 1, first_index)
+    parts = iter_calendar(events)
+    next(parts)  # cabeçalho
+    return "".join(part for part in parts if part != "END:VCALENDAR\r\n").encode("utf-8")
+
+
+class DeadlineService:
+    """Servidor HTTP/1.1 mínimo (keep-alive) com os lotes num ProcessPoolExecutor."""
+
+    def __init__(self, workers=None):
+        self.executor = ProcessPoolExecutor(max_workers=workers, initializer=_warm_worker)
+        _warm_worker()
+
+    async def handle(self, method, path, body):
+        """Devolve (estado, objeto JSON) para um pedido."""
+        path = path.split("?", 1)[0]
+        if path == "/health":
+            return 200, {"status": "ok"}
+        if path not in ("/workflow", "/batch"):
+            return 404, {"error": f"Endpoint desconhecido: {path}"}
+        if method != "POST":
+            return 405, {"error": "Use POST"}
+        try:
+            payload = json.loads(body or b"null")
+            if path == "/workflow":
+                # Um processo custa microssegundos: calcula no próprio ciclo de eventos
+                return 200, workflow_response(payload)
+            records = payload["processes"] if isinstance(payload, dict) else payload
+            loop = asyncio.get_running_loop()
+            parts = await asyncio.gather(*(loop.run_in_executor(self.executor, batch_rows, chunk, i * BATCH_CHUNK)
+                                           for i, chunk in enumerate(iter_chunks(records, BATCH_CHUNK))))
+            return 200, {"results": [row for part in parts for row in part]}
+        except (ValueError, KeyError, TypeError) as e:
+            return 400, {"error": f"{type(e).__name__}: {e}"}
+
+    async def serve_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self._send(writer, 400, {"error": "Pedido inválido"}, close=True)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._send(writer, 400, {"error": "Content-Length inválido"}, close=True)
+                    break
+                if length > MAX_BODY:
+                    await self._send(writer, 413, {"error": "Pedido demasiado grande"}, close=True)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                close = (headers.get("connection", "").lower() == "close"
+                         or (version == "HTTP/1.0" and headers.get("connection", "").lower() != "keep-alive"))
+                if method == "POST" and path.split("?", 1)[0] == "/ics":
+                    await self.stream_ics(writer, body, close)
+                    if close:
+                        break
+                    continue
+                try:
+                    status, payload = await self.handle(method, path, body)
+                except Exception as e:  # erro inesperado: responde em vez de fechar a ligação
+                    status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+                await self._send(writer, status, payload, close)
+                if close:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def stream_ics(self, writer, body, close=False):
+        """Calendário de uma carteira, calculado por blocos nos workers e enviado à medida (chunked)."""
+        try:
+            payload = json.loads(body or b"null")
+            records = payload["processes"] if isinstance(payload, dict) else payload
+            if not isinstance(records, list):
+                raise TypeError("Esperada uma lista de processos")
+            # Valida tudo antes do cabeçalho: depois do estado 200 já não é possível responder 400
+            processes = [_checked_process(r) for r in records]
+        except (ValueError, KeyError, TypeError) as e:
+            await self._send(writer, 400, {"error": f"{type(e).__name__}: {e}"}, close)
+            return
+        head = ("HTTP/1.1 200 OK\r\nContent-Type: text/calendar; charset=utf-8\r\n"
+                "Content-Disposition: attachment; filename=\"carteira_aia.ics\"\r\n"
+                f"Transfer-Encoding: chunked\r\nConnection: {'close' if close else 'keep-alive'}\r\n\r\n")
+        writer.write(head.encode("latin-1"))
+        header, footer = list(iter_calendar((), "Carteira AIA"))
+        loop = asyncio.get_running_loop()
+        chunks = enumerate(iter_chunks(processes, BATCH_CHUNK))
+
+        def submit():
+            item = next(chunks, None)
+            if item is not None:
+                return loop.run_in_executor(self.executor, batch_ics, item[1], item[0] * BATCH_CHUNK)
+
+        # Um bloco à frente: o seguinte já está a ser calculado enquanto o atual é enviado
+        self._write_chunk(writer, header.encode("utf-8"))
+        future = submit()
+        while future is not None:
+            try:
+                data = await future
+            except Exception as e:
+                # Falha inesperada de um worker (as entradas já foram validadas): o estado 200
+                # já seguiu, pelo que fecha o calendário com o que foi possível e regista o erro
+                print(f"/ics: {type(e).__name__}: {e}", file=sys.stderr)
+                break
+            future = submit()
+            self._write_chunk(writer, data)
+            await writer.drain()
+        self._write_chunk(writer, footer.encode("utf-8"))
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    @staticmethod
+    def _write_chunk(writer, data):
+        if data:
+            writer.write(f"{len(data):x}\r\n".encode("latin-1") + data + b"\r\n")
+
+    @staticmethod
+    async def _send(writer, status, payload, close=False):
+        body = json.dumps(payload, default=_json_default, ensure_ascii=False).encode("utf-8")
+        head = (f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                "Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def serve(self, host="127.0.0.1", port=8765):
+        server = await asyncio.start_server(self.serve_connection, host, port)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serviço HTTP local de prazos AIA.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("AIA_API_PORT", 8765)))
+    parser.add_argument("--workers", type=int, default=None, help="Processos para os lotes (por defeito, nº de CPUs)")
+    args = parser.parse_args(argv)
+
+    service = DeadlineService(args.workers)
+    # SIGTERM também fecha o pool (sem deixar workers órfãos)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"A servir em http://{args.host}:{args.port}", file=sys.stderr, flush=True)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Simulação de Monte Carlo ("what-if") das datas da DIA e da consulta pública.
+
+As suspensões e o PEA são amostrados a partir de distribuições simples e
+todos os cenários são calculados de uma vez pelo motor vetorizado
+(calculate_workflow_arrays), sem um ciclo Python por cenário.
+"""
+import numpy as np
+
+from portfolio import calculate_workflow_arrays
+
+# Modelos por defeito (dias de calendário contados desde a instrução)
+DEFAULT_SUSPENSION_MODEL = {
+    "count": 2,          # nº máximo de suspensões por cenário
+    "probability": 0.5,  # probabilidade de cada uma ocorrer
+    "start_min": 10, "start_max": 150,
+    "dur_min": 10, "dur_mode": 30, "dur_max": 90,
+}
+DEFAULT_PEA_MODEL = {
+    "probability": 0.3,
+    "day_min": 5, "day_max": 25,
+    "dur_min": 15, "dur_mode": 45, "dur_max": 120,
+}
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def _durations(rng, model, size):
+    """Durações (dias, >= 1) de uma distribuição triangular."""
+    low, mode, high = model["dur_min"], model["dur_mode"], model["dur_max"]
+    if high <= low:
+        return np.full(size, max(low, 1), dtype=np.int64)
+    mode = min(max(mode, low), high)
+    return np.maximum(np.rint(rng.triangular(low, mode, high, size)).astype(np.int64), 1)
+
+
+def sample_scenarios(start_date, n_scenarios, suspension_model=None, pea_model=None, seed=None):
+    """Amostra suspensões e PEA para `n_scenarios` cenários.
+
+    Devolve (pea, susp_starts, susp_ends) no formato de calculate_workflow_arrays.
+    Um PEA suspende o prazo desde a sua data, durante a duração amostrada.
+    """
+    suspension_model = suspension_model or DEFAULT_SUSPENSION_MODEL
+    pea_model = pea_model or DEFAULT_PEA_MODEL
+    rng = np.random.default_rng(seed)
+    start = np.datetime64(start_date, 'D')
+    nat = np.datetime64('NaT')
+
+    count = suspension_model["count"]
+    shape = (n_scenarios, count)
+    occurs = rng.random(shape) < suspension_model["probability"]
+    offsets = rng.integers(suspension_model["start_min"], suspension_model["start_max"] + 1, shape)
+    durations = _durations(rng, suspension_model, shape)
+    susp_starts = np.where(occurs, start + offsets.astype('timedelta64[D]'), nat)
+    susp_ends = np.where(occurs, susp_starts + (durations - 1).astype('timedelta64[D]'), nat)
+
+    has_pea = rng.random(n_scenarios) < pea_model["probability"]
+    pea_offsets = rng.integers(pea_model["day_min"], pea_model["day_max"] + 1, n_scenarios)
+    pea = np.where(has_pea, start + pea_offsets.astype('timedelta64[D]'), nat)
+    pea_end = pea + (_durations(rng, pea_model, n_scenarios) - 1).astype('timedelta64[D]')
+
+    susp_starts = np.column_stack([susp_starts, pea])
+    susp_ends = np.column_stack([susp_ends, np.where(has_pea, pea_end, nat)])
+    return pea, susp_starts, susp_ends
+
+
+def simulate_workflow(start_date, milestones_config, n_scenarios=10000, suspension_model=None, pea_model=None, seed=None,
+                      business_calendar=None):
+    """Calcula todos os cenários de uma vez. Devolve as colunas de calculate_workflow_arrays."""
+    pea, susp_starts, susp_ends = sample_scenarios(start_date, n_scenarios, suspension_model, pea_model, seed)
+    start = np.full(n_scenarios, np.datetime64(start_date, 'D'))
+    return calculate_workflow_arrays(start, milestones_config, pea, susp_starts, susp_ends, business_calendar)
+
+
+def summarize_dates(dates, percentiles=PERCENTILES):
+    """Percentis de um array datetime64[D] (arredondados ao dia) como {p: date}."""
+    days = dates.astype(np.int64)
+    values = np.percentile(days, percentiles, method="nearest")
+    return {p: np.datetime64(int(v), 'D').astype(object) for p, v in zip(percentiles, values)}
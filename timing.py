@@ -0,0 +1,141 @@
+"""Instrumentação de tempos por etapa (desligada por defeito, custo quase nulo).
+
+Cada etapa é medida com ``with stage("nome"):``. Com a medição ligada
+(variável de ambiente AIA_TIMING=1 ou set_enabled(True)), os tempos são
+agregados por etapa, emitidos como linhas de log JSON (logger "aia.timing",
+nível INFO) e expostos em formato de texto Prometheus (render_prometheus ou
+start_metrics_server).
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger("aia.timing")
+
+_enabled = os.environ.get("AIA_TIMING", "").lower() not in ("", "0", "false", "no")
+_lock = threading.Lock()
+_stats = {}  # etapa -> [contagem, total (s), máximo (s), último (s)]
+
+
+def enabled():
+    return _enabled
+
+
+def set_enabled(flag):
+    """Liga ou desliga a medição (para todo o processo)."""
+    global _enabled
+    _enabled = bool(flag)
+
+
+class _Stage:
+    __slots__ = ("name", "t_start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.t_start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.t_start)
+        return False
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+def stage(name):
+    """Mede o bloco ``with stage(name):`` (com a medição desligada não faz nada)."""
+    return _Stage(name) if _enabled else _NULL_STAGE
+
+
+def record(name, seconds):
+    """Regista uma medição já feita (por exemplo, vinda de outro processo)."""
+    with _lock:
+        entry = _stats.get(name)
+        if entry is None:
+            _stats[name] = [1, seconds, seconds, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+            entry[3] = seconds
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({"event": "stage", "stage": name, "ms": round(seconds * 1000, 3),
+                                "thread": threading.current_thread().name}))
+
+
+def snapshot():
+    """Estado atual: {etapa: {'count', 'total_s', 'max_s', 'last_s'}} ordenado por etapa."""
+    with _lock:
+        items = sorted((name, list(entry)) for name, entry in _stats.items())
+    return {name: {"count": c, "total_s": total, "max_s": peak, "last_s": last}
+            for name, (c, total, peak, last) in items}
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+
+def render_prometheus():
+    """Métricas em formato de texto Prometheus (resumo por etapa + máximo)."""
+    lines = [
+        "# HELP aia_stage_seconds Tempo gasto por etapa do cálculo.",
+        "# TYPE aia_stage_seconds summary",
+    ]
+    stats = snapshot()
+    for name, s in stats.items():
+        label = name.replace("\\", "\\\\").replace('"', '\\"')
+        lines.append(f'aia_stage_seconds_count{{stage="{label}"}} {s["count"]}')
+        lines.append(f'aia_stage_seconds_sum{{stage="{label}"}} {s["total_s"]:.9f}')
+    lines += [
+        "# HELP aia_stage_seconds_max Maior tempo observado por etapa.",
+        "# TYPE aia_stage_seconds_max gauge",
+    ]
+    for name, s in stats.items():
+        label = name.replace("\\", "\\\\").replace('"', '\\"')
+        lines.append(f'aia_stage_seconds_max{{stage="{label}"}} {s["max_s"]:.9f}')
+    return "\n".join(lines) + "\n"
+
+
+def start_metrics_server(port, host="127.0.0.1"):
+    """Serve /metrics numa thread de fundo; devolve o servidor (server.shutdown() para parar).
+
+    Por defeito só na interface local; expor noutras (ex.: host="0.0.0.0") é uma escolha explícita.
+    """
+    # http.server só aqui: `import engine` (que importa este módulo) continua leve
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name="aia-metrics", daemon=True)
+    thread.start()
+    return server